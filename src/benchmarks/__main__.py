@@ -0,0 +1,140 @@
+# Benchmark de la API en el mismo proceso contra una base de datos local.
+# Uso: python -m benchmarks [escenario ...] [--database URL] [--output resultados.json]
+# Con los umbrales (--max-...) termina con código 1 si algún escenario ejecutado los supera.
+import argparse
+import asyncio
+import json
+import sys
+import time
+from datetime import datetime, timezone
+from typing import List
+
+from benchmarks.environment import configure_database, copy_sqlite_replica, git_commit, running_app
+
+
+def parse_mix(value: str) -> dict:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmark the API in-process.")
+    parser.add_argument("scenarios", nargs="*", default=["mix"], help="scenarios to run (default: mix)")
+    parser.add_argument("--list", action="store_true", help="list the available scenarios and exit")
+    parser.add_argument("--database", help="database URL (default: a temporary SQLite file via aiosqlite)")
+    parser.add_argument("--no-seed", action="store_true", help="use the data already in --database")
+    parser.add_argument("--replica", help="read replica URL, or 'copy' to read from a copy of the SQLite database")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--operations", type=int, default=1000)
+    parser.add_argument("--bids", type=int, default=100_000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000, help="requests per measured run")
+    parser.add_argument("--duration", type=float, help="seconds per measured run (overrides --requests)")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("login=1,operations=4,operation=10,bid=5"))
+    parser.add_argument("--page-size", type=int, default=100, help="limit for GET /operations (0 = full list)")
+    parser.add_argument("--contention-bids", type=int, default=500)
+    parser.add_argument("--batch-bids", type=int, default=1000)
+    parser.add_argument("--summary-bids", type=lambda value: [int(bids) for bids in value.split(",")], default=[1_000, 10_000, 100_000], help="bids on each operation of the bid_summary scenario")
+    parser.add_argument("--allocation-bids", type=int, default=100_000, help="bids settled in the database by the allocation scenario")
+    parser.add_argument("--serialization-sizes", type=lambda value: [int(size) for size in value.split(",")], default=[10_000, 100_000])
+    parser.add_argument("--idempotency-keys", type=int, default=50, help="distinct keys in the idempotency scenario")
+    parser.add_argument("--idempotency-retries", type=int, default=10, help="concurrent requests per key in the idempotency scenario")
+    parser.add_argument("--ingestion-clients", type=lambda value: [int(clients) for clients in value.split(",")], default=[1, 10, 100])
+    parser.add_argument("--ingestion-seconds", type=float, default=3.0, help="seconds per run of the group_commit scenario")
+    parser.add_argument("--portfolio-sizes", type=lambda value: [int(size) for size in value.split(",")], default=[0, 10, 100, 1000, 10_000])
+    parser.add_argument("--dashboard-operations", type=int, default=10_000, help="operations of the operator in the operator_dashboard scenario")
+    parser.add_argument("--dashboard-bids", type=int, default=5, help="bids per operation in the operator_dashboard scenario")
+    parser.add_argument("--archive-history", type=int, default=5000, help="closed operations of history in the first step of the archival scenario (the second has 10x)")
+    parser.add_argument("--archive-bids", type=int, default=5, help="bids per history operation in the archival scenario")
+    parser.add_argument("--archive-batch-size", type=int, default=200)
+    parser.add_argument("--archive-samples", type=int, default=50, help="timed runs of each hot query in the archival scenario")
+    parser.add_argument("--storm-seconds", type=float, default=5.0)
+    parser.add_argument("--storm-concurrency", type=int, default=128, help="clients sending bids in the bid_storm scenario")
+    parser.add_argument("--max-read-p99-ratio", type=float, help="login_storm: fail if the GET /operations p99 during the storm exceeds the baseline p99 by this factor")
+    parser.add_argument("--max-summary-growth", type=float, help="bid_summary: fail if the summary p50 at the most bids exceeds the p50 at the fewest by this factor, or the stats disagree with the bids")
+    parser.add_argument("--output", help="write the JSON results to this file instead of stdout")
+    return parser.parse_args(argv)
+
+
+# Umbrales de los escenarios ejecutados; devuelve una línea por cada uno que no se cumple
+def failed_checks(args: argparse.Namespace, scenarios: dict) -> List[str]:
+    failures = []
+    storm = scenarios.get("login_storm")
+    if storm is not None and args.max_read_p99_ratio is not None and storm["read_p99_ratio"] > args.max_read_p99_ratio:
+        failures.append(
+            f"login_storm: GET /operations p99 grew {storm['read_p99_ratio']:.2f}x during the storm "
+            f"(limit {args.max_read_p99_ratio:.2f}x)"
+        )
+    summary = scenarios.get("bid_summary")
+    if summary is not None and args.max_summary_growth is not None:
+        if summary["summary_p50_growth"] > args.max_summary_growth:
+            failures.append(
+                f"bid_summary: summary p50 grew {summary['summary_p50_growth']:.2f}x from {min(summary['sizes'], key=int)} "
+                f"to {max(summary['sizes'], key=int)} bids (limit {args.max_summary_growth:.2f}x)"
+            )
+        if not summary["consistent"]:
+            failures.append("bid_summary: the maintained stats do not match the bids")
+    return failures
+
+
+async def run(args: argparse.Namespace) -> dict:
+    from benchmarks.scenarios import SCENARIOS, BenchContext
+    from benchmarks.seed import SeedInfo, seed
+    from database.database import engine, replica_connection_string
+
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(unknown)}. Available: {', '.join(SCENARIOS)}")
+
+    async with running_app() as client:
+        started = time.perf_counter()
+        info = SeedInfo() if args.no_seed else await seed(engine, args.users, args.operations, args.bids)
+        seed_seconds = time.perf_counter() - started
+        if args.replica == "copy":
+            await copy_sqlite_replica(engine, replica_connection_string)
+
+        context = BenchContext(client=client, info=info, args=args)
+        results = {}
+        for name in args.scenarios:
+            print(f"running {name}...", file=sys.stderr)
+            results[name] = await SCENARIOS[name](context)
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "database": engine.dialect.name,
+        "replica": bool(replica_connection_string),
+        "dataset": {"users": args.users, "operations": args.operations, "bids": args.bids, "seed_s": seed_seconds},
+        "scenarios": results,
+    }
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    if args.list:
+        configure_database(args.database, args.replica)
+        from benchmarks.scenarios import SCENARIOS
+        print("\n".join(SCENARIOS))
+        return
+
+    configure_database(args.database, args.replica)
+    results = asyncio.run(run(args))
+    output = json.dumps(results, indent=2, default=str)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+    failures = failed_checks(args, results["scenarios"])
+    for line in failures:
+        print(f"FAIL: {line}", file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
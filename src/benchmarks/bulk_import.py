@@ -0,0 +1,182 @@
+# Importación masiva de usuarios y operaciones con `database.bulk_import`, frente al alta de uno
+# en uno de POST /user (comprobación del nombre, bcrypt y commit por usuario).
+# Mide por separado el throughput de bcrypt en el pool de procesos (sobre una muestra) y la
+# importación completa con un hash ya calculado, y proyecta el total de la importación real
+# (importación + filas / hashes por segundo). Con --full-hash se hashea cada fila de verdad.
+# Los archivos incluyen filas duplicadas e inválidas para comprobar el informe de errores.
+# Uso: python -m benchmarks.bulk_import [--database URL] [--users 100000] [--operations 10000]
+#                                       [--hash-sample 200] [--full-hash] [--max-minutes 15]
+# Con --max-minutes termina con código 1 si la proyección supera el umbral o el informe de
+# errores no es el esperado.
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from benchmarks.environment import BENCHMARK_PASSWORD, configure_database
+from benchmarks.startup import prepare_database
+
+# Cada INVALID_EVERY filas se repite el usuario anterior y se escribe una fila sin contraseña
+INVALID_EVERY = 1000
+
+
+# CSV de usuarios (un 10 % operadores). Devuelve los operadores y las filas inválidas escritas.
+def write_users(path: str, users: int):
+    operators = []
+    invalid = 0
+    with open(path, "w") as file:
+        file.write("username,password,role\n")
+        for index in range(users):
+            is_operator = index % 10 == 0
+            username = f"partner-{index}"
+            file.write(f"{username},{BENCHMARK_PASSWORD}-{index},{'operador' if is_operator else 'inversor'}\n")
+            if is_operator:
+                operators.append(username)
+            if index and index % INVALID_EVERY == 0:
+                file.write(f"{username},{BENCHMARK_PASSWORD},inversor\n")
+                file.write(f"partner-missing-{index},,inversor\n")
+                invalid += 2
+    return operators, invalid
+
+
+# JSONL de operaciones de los operadores importados, más una con un operador inexistente
+def write_operations(path: str, operations: int, operators) -> int:
+    rng = random.Random(operations)
+    with open(path, "w") as file:
+        for _ in range(operations):
+            file.write(json.dumps({
+                "operator": rng.choice(operators),
+                "amount_required": rng.randint(1, 1000) * 1000,
+                "interest_rate": round(rng.uniform(1, 20), 2),
+                "deadline": str(date.today() + timedelta(days=rng.randint(1, 365))),
+            }) + "\n")
+        file.write(json.dumps({"operator": "partner-unknown", "amount_required": 1, "interest_rate": 1, "deadline": str(date.today())}) + "\n")
+    return 1
+
+
+async def run(args) -> dict:
+    from sqlalchemy import func, select
+    import database.crud as crud
+    import database.sql_models as sql_models
+    import models.py_schemas as py_schemas
+    from database.bulk_import import import_records, read_records
+    from database.database import SessionLocal, engine
+    from services.hashing import bulk_password_hasher, password_hasher
+
+    directory = tempfile.mkdtemp(prefix="klimb-import-")
+    users_path = os.path.join(directory, "users.csv")
+    operations_path = os.path.join(directory, "operations.jsonl")
+    operators, invalid_users = write_users(users_path, args.users)
+    invalid_operations = write_operations(operations_path, args.operations, operators)
+
+    # Throughput de bcrypt: pool de procesos frente a un hash tras otro
+    passwords = [f"{BENCHMARK_PASSWORD}-{index}" for index in range(args.hash_sample)]
+    await bulk_password_hasher.hash_many(passwords[:bulk_password_hasher.workers])  # arranque de los workers
+    began = time.perf_counter()
+    await bulk_password_hasher.hash_many(passwords)
+    pool_rate = len(passwords) / (time.perf_counter() - began)
+    serial = passwords[:max(1, min(20, args.hash_sample))]
+    began = time.perf_counter()
+    for password in serial:
+        crud.get_password_hash(password)
+    serial_rate = len(serial) / (time.perf_counter() - began)
+
+    # Importación completa; sin --full-hash todas las filas reciben el mismo hash ya calculado
+    hash_passwords = None
+    if not args.full_hash:
+        password_hash = crud.get_password_hash(BENCHMARK_PASSWORD)
+
+        async def hash_passwords(batch):
+            return [password_hash] * len(batch)
+
+    async with SessionLocal() as db:
+        began = time.perf_counter()
+        with open(users_path, newline="") as file:
+            users_report = await import_records(db, "users", read_records(file, "csv"), args.batch_size, hash_passwords)
+        users_s = time.perf_counter() - began
+        began = time.perf_counter()
+        with open(operations_path, newline="") as file:
+            operations_report = await import_records(db, "operations", read_records(file, "jsonl"), args.batch_size)
+        operations_s = time.perf_counter() - began
+
+    # Alta de uno en uno como POST /user, sobre una muestra
+    began = time.perf_counter()
+    for index in range(args.baseline_sample):
+        async with SessionLocal() as db:
+            username = f"one-by-one-{index}"
+            if await crud.get_user_by_username(db, username) is None:
+                await crud.create_user(db, py_schemas.UserCreate(username=username, password=BENCHMARK_PASSWORD, role="inversor"))
+    baseline_per_user_s = (time.perf_counter() - began) / max(args.baseline_sample, 1)
+
+    async with SessionLocal() as db:
+        stored_users = (await db.execute(select(func.count()).select_from(sql_models.User))).scalar()
+    bulk_password_hasher.shutdown()
+    password_hasher.shutdown()
+    await engine.dispose()
+
+    projected_s = users_s if args.full_hash else users_s + users_report.imported / pool_rate
+    return {
+        "users": args.users,
+        "operations": args.operations,
+        "hash_workers": bulk_password_hasher.workers,
+        "bcrypt_pool_hashes_per_s": pool_rate,
+        "bcrypt_serial_hashes_per_s": serial_rate,
+        "full_hash": args.full_hash,
+        "users_import_s": users_s,
+        "users_imported": users_report.imported,
+        "users_errors": len(users_report.errors),
+        "operations_import_s": operations_s,
+        "operations_imported": operations_report.imported,
+        "operations_errors": len(operations_report.errors),
+        "errors_match": (
+            len(users_report.errors) == invalid_users
+            and users_report.imported == args.users
+            and len(operations_report.errors) == invalid_operations
+            and operations_report.imported == args.operations
+            and stored_users == args.users + args.baseline_sample
+        ),
+        "projected_users_import_min": projected_s / 60,
+        "baseline_per_user_ms": baseline_per_user_s * 1000,
+        "projected_one_by_one_min": baseline_per_user_s * args.users / 60,
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bulk_import", description="Bulk import throughput report.")
+    parser.add_argument("--database", help="database URL (default: a temporary SQLite file via aiosqlite)")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--operations", type=int, default=10_000)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--hash-sample", type=int, default=200, help="passwords hashed to measure the process pool throughput")
+    parser.add_argument("--baseline-sample", type=int, default=10, help="users created one by one for the baseline")
+    parser.add_argument("--full-hash", action="store_true", help="hash every imported password instead of projecting")
+    parser.add_argument("--max-minutes", type=float, help="fail if the projected users import takes longer")
+    parser.add_argument("--output", help="write the JSON results to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    configure_database(args.database)
+    prepare_database()
+    report = asyncio.run(run(args))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+    if args.max_minutes is not None:
+        minutes = report["projected_users_import_min"]
+        if minutes > args.max_minutes or not report["errors_match"]:
+            print(f"FAIL: {args.users} users in {minutes:.1f} min (limit {args.max_minutes:.1f} min)", file=sys.stderr)
+            sys.exit(1)
+        print(f"OK: {args.users} users in {minutes:.1f} min (limit {args.max_minutes:.1f} min)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
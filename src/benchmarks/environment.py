@@ -0,0 +1,64 @@
+import os
+import shutil
+import subprocess
+import tempfile
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+BENCHMARK_PASSWORD = "benchmark"
+
+
+# Configura la base de datos de pruebas. Debe llamarse antes de importar database.database,
+# que lee DB_INSTANCE_KLIMB_MYSQL al importarse. Por defecto usa un archivo SQLite temporal.
+# Con replica="copy" (solo SQLite) la réplica es una copia del archivo hecha tras sembrar.
+def configure_database(url: str = None, replica: str = None) -> str:
+    if url is None:
+        path = os.path.join(tempfile.mkdtemp(prefix="klimb-bench-"), "bench.sqlite")
+        url = f"sqlite+aiosqlite:///{path}"
+    os.environ["DB_INSTANCE_KLIMB_MYSQL"] = url
+    if replica == "copy":
+        replica = url + ".replica"
+    if replica:
+        os.environ["DB_INSTANCE_KLIMB_MYSQL_REPLICA"] = replica
+    # El barrido de vencimientos en segundo plano distorsiona las mediciones
+    os.environ.setdefault("EXPIRY_SCHEDULER_ENABLED", "0")
+    # Los escenarios de rendimiento miden la app sin descartar carga; bid_storm la activa
+    os.environ.setdefault("ADMISSION_ENABLED", "0")
+    return url
+
+
+# Copia el archivo SQLite primario sobre la réplica (después de volcar el WAL)
+async def copy_sqlite_replica(engine, replica_url: str) -> None:
+    from sqlalchemy import text
+
+    async with engine.begin() as conn:
+        await conn.execute(text("PRAGMA wal_checkpoint(TRUNCATE)"))
+    shutil.copyfile(engine.url.database, replica_url.split("///", 1)[1])
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+# Arranca main.app en el mismo proceso y entrega un cliente HTTP conectado por ASGI
+@asynccontextmanager
+async def running_app() -> AsyncIterator["httpx.AsyncClient"]:
+    import httpx
+    import main
+
+    await main.app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            yield client
+    finally:
+        await main.app.router.shutdown()
+
+
+async def login(client, username: str, password: str = BENCHMARK_PASSWORD) -> dict:
+    response = await client.post("/login", data={"username": username, "password": password})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
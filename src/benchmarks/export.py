@@ -0,0 +1,166 @@
+# Memoria de la exportación masiva: siembra ofertas sintéticas y exporta la tabla bids a CSV y
+# Parquet con `python -m database.export`, cada exportación en un intérprete nuevo del que se
+# mide el pico de memoria residente (RSS). Con una exportación por bloques el pico no debe
+# crecer con el número de filas.
+# Uso: python -m benchmarks.export [--database URL] [--sizes 500000,5000000] [--max-rss-mb 300]
+# Con --max-rss-mb termina con código 1 si alguna exportación supera el umbral.
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import List
+
+from benchmarks.environment import configure_database
+from benchmarks.startup import SOURCE_DIR, prepare_database
+
+SEED_CHUNK_SIZE = 10000
+FORMATS = ("csv", "parquet")
+
+
+# Añade ofertas hasta llegar a `total`, generadas por bloques para no tenerlas en memoria
+async def seed_bids(total: int) -> int:
+    import uuid
+    from sqlalchemy import func, insert, select
+    import database.sql_models as sql_models
+    from database.database import engine
+
+    async with engine.begin() as conn:
+        existing = (await conn.execute(select(func.count()).select_from(sql_models.Bid))).scalar()
+        operation_ids = (await conn.execute(select(sql_models.Operation.id))).scalars().all()
+        if not operation_ids:
+            now = datetime.now(timezone.utc)
+            user_ids = [str(uuid.uuid4()) for _ in range(101)]
+            await conn.execute(insert(sql_models.User), [
+                {"id": user_id, "username": f"export-{user_id}", "password_hash": "-", "role": "inversor", "created_at": now}
+                for user_id in user_ids
+            ])
+            await conn.execute(insert(sql_models.Operation), [{
+                "operator_id": user_ids[0], "amount_required": Decimal(10**9), "interest_rate": 10.0,
+                "deadline": now.date() + timedelta(days=30), "amount_collected": Decimal(0), "is_closed": False,
+                "created_at": now,
+            } for _ in range(1000)])
+            operation_ids = (await conn.execute(select(sql_models.Operation.id))).scalars().all()
+            investor_ids = user_ids[1:]
+        else:
+            investor_ids = (await conn.execute(select(sql_models.User.id).limit(100))).scalars().all()
+
+    rng = random.Random(existing)
+    start = datetime(2026, 1, 1)
+    for offset in range(existing, total, SEED_CHUNK_SIZE):
+        async with engine.begin() as conn:
+            await conn.execute(insert(sql_models.Bid), [{
+                "operation_id": rng.choice(operation_ids),
+                "investor_id": rng.choice(investor_ids),
+                "amount": Decimal(rng.randint(100, 100_000)).scaleb(-2),
+                "interest_rate": round(rng.uniform(1, 20), 2),
+                "bid_date": start + timedelta(seconds=index),
+            } for index in range(offset, min(offset + SEED_CHUNK_SIZE, total))])
+    await engine.dispose()
+    return max(total - existing, 0)
+
+
+# Pico de memoria residente del proceso actual en MB. VmHWM es propio de la imagen en curso;
+# ru_maxrss (el respaldo fuera de Linux) incluye la memoria del padre heredada en el fork.
+def _peak_rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as file:
+            for line in file:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# Se ejecuta en el proceso hijo: exporta con la CLI y escribe su pico de RSS
+def _child(export_format: str, path: str, chunk_size: int) -> None:
+    from database.export import main as export_main
+
+    export_main(["bids", "--format", export_format, "--chunk-size", str(chunk_size), "--output", path])
+    print(json.dumps({"peak_rss_mb": _peak_rss_mb()}))
+
+
+def export_in_child(export_format: str, path: str, chunk_size: int) -> dict:
+    began = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.export", "--child", export_format, path, str(chunk_size)],
+        cwd=SOURCE_DIR, env=os.environ.copy(), capture_output=True, text=True, check=True,
+    ).stdout
+    sample = json.loads(output.strip().splitlines()[-1])
+    return {
+        "elapsed_s": time.perf_counter() - began,
+        "peak_rss_mb": sample["peak_rss_mb"],
+        "bytes": os.path.getsize(path),
+        "rows": _count_rows(export_format, path),
+    }
+
+
+def _count_rows(export_format: str, path: str) -> int:
+    if export_format == "parquet":
+        import pyarrow.parquet as pq
+        return pq.read_metadata(path).num_rows
+    with open(path, "rb") as file:
+        return sum(1 for _ in file) - 1
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.export", description="Bulk export memory report.")
+    parser.add_argument("--database", help="database URL (default: a temporary SQLite file via aiosqlite)")
+    parser.add_argument("--sizes", type=lambda value: [int(size) for size in value.split(",")], default=[500_000, 5_000_000], help="bids in the table for each measurement")
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--max-rss-mb", type=float, help="fail if any export peaks above this resident memory")
+    parser.add_argument("--output", help="write the JSON results to this file instead of stdout")
+    parser.add_argument("--child", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        export_format, path, chunk_size = args.child
+        _child(export_format, path, int(chunk_size))
+        return
+
+    configure_database(args.database)
+    prepare_database()
+    directory = tempfile.mkdtemp(prefix="klimb-export-")
+
+    results = {}
+    for size in sorted(args.sizes):
+        began = time.perf_counter()
+        asyncio.run(seed_bids(size))
+        entry = {"seed_s": time.perf_counter() - began}
+        for export_format in FORMATS:
+            path = os.path.join(directory, f"bids-{size}.{export_format}")
+            entry[export_format] = export_in_child(export_format, path, args.chunk_size)
+            os.remove(path)
+        results[str(size)] = entry
+
+    peaks: List[float] = [entry[export_format]["peak_rss_mb"] for entry in results.values() for export_format in FORMATS]
+    report = {
+        "sizes": results,
+        "rows_match": all(entry[export_format]["rows"] == int(size) for size, entry in results.items() for export_format in FORMATS),
+        "max_peak_rss_mb": max(peaks),
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+    if args.max_rss_mb is not None:
+        if report["max_peak_rss_mb"] > args.max_rss_mb or not report["rows_match"]:
+            print(f"FAIL: export peak RSS {report['max_peak_rss_mb']:.0f} MB (limit {args.max_rss_mb:.0f} MB)", file=sys.stderr)
+            sys.exit(1)
+        print(f"OK: export peak RSS {report['max_peak_rss_mb']:.0f} MB (limit {args.max_rss_mb:.0f} MB)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
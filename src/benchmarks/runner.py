@@ -0,0 +1,91 @@
+import asyncio
+import random
+import time
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+# Acción del benchmark: recibe el generador aleatorio y devuelve el código HTTP de la respuesta
+Action = Callable[[random.Random], Awaitable[int]]
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+# Resume latencias (en segundos) como throughput y percentiles en milisegundos
+def summarize(latencies: List[float], errors: int, elapsed: float) -> dict:
+    ordered = sorted(latencies)
+    return {
+        "requests": len(ordered),
+        "errors": errors,
+        "throughput_rps": len(ordered) / elapsed if elapsed > 0 else 0.0,
+        "p50_ms": percentile(ordered, 0.50) * 1000,
+        "p95_ms": percentile(ordered, 0.95) * 1000,
+        "p99_ms": percentile(ordered, 0.99) * 1000,
+        "max_ms": (ordered[-1] if ordered else 0.0) * 1000,
+    }
+
+
+# Ejecuta una mezcla ponderada de acciones con `concurrency` clientes simultáneos hasta
+# completar `total_requests` peticiones o agotar `duration` segundos.
+async def drive(
+    mix: Dict[str, Tuple[float, Action]],
+    concurrency: int,
+    total_requests: int = None,
+    duration: float = None,
+    seed_value: int = 7,
+) -> dict:
+    names = list(mix)
+    weights = [mix[name][0] for name in names]
+    latencies: Dict[str, List[float]] = {name: [] for name in names}
+    errors: Dict[str, int] = {name: 0 for name in names}
+    remaining = [total_requests if total_requests is not None else float("inf")]
+    start = time.perf_counter()
+    deadline = start + duration if duration is not None else float("inf")
+
+    async def client(worker: int) -> None:
+        rng = random.Random(seed_value + worker)
+        while remaining[0] > 0 and time.perf_counter() < deadline:
+            remaining[0] -= 1
+            name = rng.choices(names, weights)[0]
+            began = time.perf_counter()
+            try:
+                status_code = await mix[name][1](rng)
+            except Exception:
+                status_code = 599
+            latencies[name].append(time.perf_counter() - began)
+            if status_code >= 400:
+                errors[name] += 1
+
+    await asyncio.gather(*(client(worker) for worker in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    routes = {name: summarize(latencies[name], errors[name], elapsed) for name in names if latencies[name]}
+    everything = [value for values in latencies.values() for value in values]
+    return {
+        "elapsed_s": elapsed,
+        "concurrency": concurrency,
+        "total": summarize(everything, sum(errors.values()), elapsed),
+        "routes": routes,
+    }
+
+
+# Cuenta las sentencias SQL ejecutadas por un motor mientras está activo
+class QueryCounter:
+    def __init__(self, engine):
+        self.engine = engine.sync_engine
+        self.count = 0
+
+    def _on_execute(self, *args) -> None:
+        self.count += 1
+
+    def __enter__(self) -> "QueryCounter":
+        from sqlalchemy import event
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        from sqlalchemy import event
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
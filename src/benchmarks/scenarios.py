@@ -0,0 +1,1032 @@
+import asyncio
+import json
+import random
+import time
+import tracemalloc
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Awaitable, Callable, Dict, List, Tuple
+from sqlalchemy import func, select, update
+import numpy as np
+
+import database.crud as crud
+import database.sql_models as sql_models
+import models.py_schemas as py_schemas
+from benchmarks.environment import BENCHMARK_PASSWORD, login
+from benchmarks.runner import QueryCounter, drive, summarize
+from benchmarks.seed import SeedInfo, insert_chunks
+from database.database import SessionLocal, engine, read_engine
+from services.admission import admission
+from services.allocation import allocate
+from services.bid_writer import bid_writer
+from services.idempotency import REPLAYED_HEADER, idempotency_store
+from services.operation_cache import operation_cache
+from services.principal_cache import principal_cache
+
+
+@dataclass
+class BenchContext:
+    client: "httpx.AsyncClient"
+    info: SeedInfo
+    args: "argparse.Namespace"
+
+
+Scenario = Callable[[BenchContext], Awaitable[dict]]
+SCENARIOS: Dict[str, Scenario] = {}
+
+def scenario(name: str):
+    def register(function: Scenario) -> Scenario:
+        SCENARIOS[name] = function
+        return function
+    return register
+
+
+async def _investor_tokens(ctx: BenchContext, count: int) -> List[dict]:
+    return [await login(ctx.client, username) for username in ctx.info.investors[:count]]
+
+async def _operator_token(ctx: BenchContext) -> dict:
+    return await login(ctx.client, ctx.info.operators[0])
+
+async def _operation_owner(ctx: BenchContext) -> str:
+    async with SessionLocal() as db:
+        return (await crud.get_user_by_username(db, ctx.info.operators[0])).id
+
+async def _new_operation(ctx: BenchContext, headers: dict, amount_required: float) -> int:
+    response = await ctx.client.post("/operation", headers=headers, json={
+        "amount_required": amount_required,
+        "interest_rate": 10.0,
+        "deadline": str(date.today() + timedelta(days=30)),
+    })
+    response.raise_for_status()
+    return response.json()["id"]
+
+async def _operation_totals(operation_id: int) -> dict:
+    async with SessionLocal() as db:
+        operation = await crud.get_operation_by_id(db, operation_id)
+        bids_total = (await db.execute(
+            select(func.coalesce(func.sum(sql_models.Bid.amount), 0)).where(sql_models.Bid.operation_id == operation_id)
+        )).scalar_one()
+    return {
+        "amount_required": float(operation.amount_required),
+        "amount_collected": float(operation.amount_collected),
+        "bids_total": float(bids_total),
+        "over_funded": float(operation.amount_collected) > float(operation.amount_required)
+        or float(bids_total) > float(operation.amount_required),
+    }
+
+
+# --- Mezcla realista de rutas a concurrencia fija ---
+@scenario("mix")
+async def mix(ctx: BenchContext) -> dict:
+    client, info, args = ctx.client, ctx.info, ctx.args
+    tokens = await _investor_tokens(ctx, 20)
+    params = {"limit": args.page_size} if args.page_size else {}
+
+    async def do_login(rng) -> int:
+        response = await client.post("/login", data={"username": rng.choice(info.investors), "password": BENCHMARK_PASSWORD})
+        return response.status_code
+
+    async def do_operations(rng) -> int:
+        return (await client.get("/operations", params=params)).status_code
+
+    async def do_operation(rng) -> int:
+        return (await client.get(f"/operation/{rng.choice(info.operation_ids)}")).status_code
+
+    async def do_bid(rng) -> int:
+        response = await client.post("/bid", headers=rng.choice(tokens), json={
+            "operation_id": rng.choice(info.operation_ids), "amount": rng.randint(1, 100), "interest_rate": 5.0,
+        })
+        return response.status_code
+
+    weights = args.mix
+    return await drive({
+        "POST /login": (weights.get("login", 0), do_login),
+        "GET /operations": (weights.get("operations", 0), do_operations),
+        "GET /operation/{id}": (weights.get("operation", 0), do_operation),
+        "POST /bid": (weights.get("bid", 0), do_bid),
+    }, args.concurrency, total_requests=args.requests, duration=args.duration)
+
+
+# --- Ofertas simultáneas sobre una misma operación ---
+# Compara la aceptación atómica (POST /bid) con el camino anterior de leer, validar y escribir
+async def _legacy_bid(data: py_schemas.BidCreate, user: py_schemas.User) -> bool:
+    async with SessionLocal() as db:
+        operation = await crud.get_operation_by_id(db, data.operation_id)
+        if Decimal(operation.amount_required) < Decimal(str(data.amount)) + Decimal(operation.amount_collected):
+            return False
+        await crud.create_bid(db, data, user)
+        await crud.update_operation_amount_collected(db, data.operation_id, Decimal(str(data.amount)))
+        return True
+
+@scenario("bid_contention")
+async def bid_contention(ctx: BenchContext) -> dict:
+    bids, amount = ctx.args.contention_bids, 10.0
+    operator = await _operator_token(ctx)
+    tokens = await _investor_tokens(ctx, 10)
+    # La operación admite la mitad de las ofertas: el resto debe rechazarse
+    capacity = bids * amount / 2
+
+    operation_id = await _new_operation(ctx, operator, capacity)
+    start = time.perf_counter()
+    responses = await asyncio.gather(*(
+        ctx.client.post("/bid", headers=tokens[index % len(tokens)], json={
+            "operation_id": operation_id, "amount": amount, "interest_rate": 5.0,
+        }) for index in range(bids)
+    ))
+    atomic_elapsed = time.perf_counter() - start
+    atomic = {
+        "elapsed_s": atomic_elapsed,
+        "bids_per_s": bids / atomic_elapsed,
+        "accepted": sum(1 for response in responses if response.status_code == 201),
+        **await _operation_totals(operation_id),
+    }
+
+    legacy_id = await _new_operation(ctx, operator, capacity)
+    async with SessionLocal() as db:
+        investor = py_schemas.User.model_validate(await crud.get_user_by_username(db, ctx.info.investors[0]))
+    data = py_schemas.BidCreate(operation_id=legacy_id, amount=amount, interest_rate=5.0)
+    start = time.perf_counter()
+    outcomes = await asyncio.gather(*(_legacy_bid(data, investor) for _ in range(bids)), return_exceptions=True)
+    legacy_elapsed = time.perf_counter() - start
+    legacy = {
+        "elapsed_s": legacy_elapsed,
+        "bids_per_s": bids / legacy_elapsed,
+        "accepted": sum(1 for outcome in outcomes if outcome is True),
+        "errors": sum(1 for outcome in outcomes if isinstance(outcome, BaseException)),
+        **await _operation_totals(legacy_id),
+    }
+    return {"bids": bids, "capacity": capacity, "atomic": atomic, "legacy": legacy}
+
+
+# --- Ofertas individuales frente a una ofertas en lote ---
+@scenario("batch_vs_single")
+async def batch_vs_single(ctx: BenchContext) -> dict:
+    bids = ctx.args.batch_bids
+    operator = await _operator_token(ctx)
+    investor = (await _investor_tokens(ctx, 1))[0]
+    operation_id = await _new_operation(ctx, operator, bids * 100.0)
+    payload = {"operation_id": operation_id, "amount": 10.0, "interest_rate": 5.0}
+
+    start = time.perf_counter()
+    for _ in range(bids):
+        (await ctx.client.post("/bid", headers=investor, json=payload)).raise_for_status()
+    single = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for offset in range(0, bids, 1000):
+        batch = [payload] * min(1000, bids - offset)
+        (await ctx.client.post("/bids/batch", headers=investor, json=batch)).raise_for_status()
+    batched = time.perf_counter() - start
+
+    return {
+        "bids": bids,
+        "single_s": single,
+        "batch_s": batched,
+        "single_bids_per_s": bids / single,
+        "batch_bids_per_s": bids / batched,
+        "speedup": single / batched,
+    }
+
+
+# --- Latencia de GET /operations durante una avalancha de logins ---
+@scenario("login_storm")
+async def login_storm(ctx: BenchContext) -> dict:
+    client, info, args = ctx.client, ctx.info, ctx.args
+
+    async def do_operations(rng) -> int:
+        return (await client.get("/operations", params={"limit": 20})).status_code
+
+    async def do_login(rng) -> int:
+        response = await client.post("/login", data={"username": rng.choice(info.investors), "password": BENCHMARK_PASSWORD})
+        return response.status_code
+
+    reads = {"GET /operations": (1, do_operations)}
+    baseline = await drive(reads, 4, duration=args.storm_seconds)
+    under_load, storm = await asyncio.gather(
+        drive(reads, 4, duration=args.storm_seconds),
+        drive({"POST /login": (1, do_login)}, args.concurrency, duration=args.storm_seconds),
+    )
+    before, during = baseline["routes"]["GET /operations"], under_load["routes"]["GET /operations"]
+    return {
+        "baseline": before,
+        "during_login_storm": during,
+        "logins": storm["routes"].get("POST /login"),
+        "read_p99_ratio": during["p99_ms"] / before["p99_ms"] if before["p99_ms"] else 0.0,
+    }
+
+
+# --- Consultas por petición autenticada con y sin caché de usuarios ---
+# Cuenta por separado las consultas de get_current_user (la autenticación) y las de un POST /bid completo
+@scenario("auth_queries")
+async def auth_queries(ctx: BenchContext) -> dict:
+    from dependencies import get_current_user
+
+    investor = (await _investor_tokens(ctx, 1))[0]
+    operator = await _operator_token(ctx)
+    operation_id = await _new_operation(ctx, operator, 1_000_000.0)
+    payload = {"operation_id": operation_id, "amount": 1.0, "interest_rate": 5.0}
+    token = investor["Authorization"].split(" ", 1)[1]
+    requests = 200
+
+    async def measure_auth(clear_cache: bool) -> float:
+        async with SessionLocal() as db:
+            with QueryCounter(engine) as counter:
+                for _ in range(requests):
+                    if clear_cache:
+                        principal_cache.clear()
+                    await get_current_user(token, db)
+        return counter.count / requests
+
+    async def measure_bid(clear_cache: bool) -> float:
+        with QueryCounter(engine) as counter:
+            for _ in range(requests):
+                if clear_cache:
+                    principal_cache.clear()
+                (await ctx.client.post("/bid", headers=investor, json=payload)).raise_for_status()
+        return counter.count / requests
+
+    return {
+        "auth_queries_uncached": await measure_auth(True),
+        "auth_queries_cached": await measure_auth(False),
+        "bid_queries_uncached": await measure_bid(True),
+        "bid_queries_cached": await measure_bid(False),
+        "principal_cache": principal_cache.stats(),
+    }
+
+
+# --- Peticiones por segundo de las lecturas con y sin caché ---
+@scenario("operations_cache")
+async def operations_cache(ctx: BenchContext) -> dict:
+    client, info, args = ctx.client, ctx.info, ctx.args
+
+    async def do_operations(rng) -> int:
+        return (await client.get("/operations", params={"limit": args.page_size or 100})).status_code
+
+    async def do_operation(rng) -> int:
+        return (await client.get(f"/operation/{rng.choice(info.operation_ids[:100])}")).status_code
+
+    mix = {"GET /operations": (1, do_operations), "GET /operation/{id}": (3, do_operation)}
+    enabled = operation_cache.enabled
+    try:
+        operation_cache.enabled = False
+        operation_cache.clear()
+        uncached = await drive(mix, args.concurrency, total_requests=args.requests)
+        operation_cache.enabled = True
+        operation_cache.hits = operation_cache.misses = 0
+        cached = await drive(mix, args.concurrency, total_requests=args.requests)
+    finally:
+        operation_cache.enabled = enabled
+
+    response = await client.get(f"/operation/{info.operation_ids[0]}")
+    not_modified = await client.get(f"/operation/{info.operation_ids[0]}", headers={"If-None-Match": response.headers["etag"]})
+    return {
+        "uncached_rps": uncached["total"]["throughput_rps"],
+        "cached_rps": cached["total"]["throughput_rps"],
+        "uncached": uncached["routes"],
+        "cached": cached["routes"],
+        "hit_ratio": operation_cache.stats()["hit_ratio"],
+        "conditional_status": not_modified.status_code,
+    }
+
+
+# --- Memoria del listado completo frente al listado en streaming ---
+@scenario("listing_memory")
+async def listing_memory(ctx: BenchContext) -> dict:
+    results = {}
+    enabled = operation_cache.enabled
+    operation_cache.enabled = False
+    try:
+        for name, headers in (("json", {}), ("ndjson", {"Accept": "application/x-ndjson"})):
+            tracemalloc.start()
+            start = time.perf_counter()
+            received = 0
+            async with ctx.client.stream("GET", "/operations", headers=headers) as response:
+                async for chunk in response.aiter_bytes():
+                    received += len(chunk)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            results[name] = {"elapsed_s": time.perf_counter() - start, "bytes": received, "peak_mib": peak / 2**20}
+    finally:
+        operation_cache.enabled = enabled
+    return {"operations": len(ctx.info.operation_ids), **results}
+
+
+# --- Lecturas y escrituras mezcladas (ejecutar con y sin --replica para comparar) ---
+@scenario("read_write")
+async def read_write(ctx: BenchContext) -> dict:
+    client, info, args = ctx.client, ctx.info, ctx.args
+    tokens = await _investor_tokens(ctx, 20)
+
+    async def do_operations(rng) -> int:
+        return (await client.get("/operations", params={"limit": args.page_size or 100})).status_code
+
+    async def do_operation(rng) -> int:
+        return (await client.get(f"/operation/{rng.choice(info.operation_ids)}")).status_code
+
+    async def do_user(rng) -> int:
+        return (await client.get(f"/user/{rng.choice(info.investor_ids)}")).status_code
+
+    async def do_bid(rng) -> int:
+        response = await client.post("/bid", headers=rng.choice(tokens), json={
+            "operation_id": rng.choice(info.operation_ids), "amount": rng.randint(1, 100), "interest_rate": 5.0,
+        })
+        return response.status_code
+
+    # Sin caché de operaciones para que todas las lecturas lleguen a la base de datos
+    enabled = operation_cache.enabled
+    operation_cache.enabled = False
+    try:
+        return await drive({
+            "GET /operations": (2, do_operations),
+            "GET /operation/{id}": (5, do_operation),
+            "GET /user/{id}": (2, do_user),
+            "POST /bid": (3, do_bid),
+        }, args.concurrency, total_requests=args.requests, duration=args.duration)
+    finally:
+        operation_cache.enabled = enabled
+
+
+
+# --- Resumen de ofertas mantenido en cada oferta frente a agregar en cada lectura ---
+def _bids_aggregate_query(operation_id: int):
+    return select(
+        func.count(sql_models.Bid.id),
+        func.sum(sql_models.Bid.amount),
+        func.sum(sql_models.Bid.amount * sql_models.Bid.interest_rate) / func.sum(sql_models.Bid.amount),
+        func.min(sql_models.Bid.interest_rate),
+        func.count(sql_models.Bid.investor_id.distinct()),
+    ).where(sql_models.Bid.operation_id == operation_id)
+
+# El resumen se mide con la misma concurrencia sobre operaciones con cada vez más ofertas: al
+# leer una sola fila, la latencia no debería crecer con el número de ofertas (summary_p50_growth)
+@scenario("bid_summary")
+async def bid_summary(ctx: BenchContext) -> dict:
+    client, info, args = ctx.client, ctx.info, ctx.args
+    operator = await _operator_token(ctx)
+    investors = await _investor_tokens(ctx, 5)
+    rng = random.Random(13)
+    now = datetime.now(timezone.utc)
+    results = {}
+
+    for bids in args.summary_bids:
+        operation_id = await _new_operation(ctx, operator, 1000.0 * bids + 1_000_000)
+
+        # Cargar las ofertas directamente y recalcular las estadísticas una sola vez
+        await insert_chunks(engine, sql_models.Bid.__table__, [{
+            "operation_id": operation_id,
+            "investor_id": rng.choice(info.investor_ids),
+            "amount": Decimal(rng.randint(1, 1000)),
+            "interest_rate": round(rng.uniform(1, 20), 2),
+            "bid_date": now,
+        } for _ in range(bids)])
+        async with SessionLocal() as db:
+            await crud.rebuild_operation_bid_stats(db, [operation_id])
+
+        # Unas ofertas por la API para comprobar el mantenimiento incremental
+        for index in range(20):
+            (await client.post("/bid", headers=investors[index % len(investors)], json={
+                "operation_id": operation_id, "amount": rng.randint(1, 100), "interest_rate": round(rng.uniform(1, 20), 2),
+            })).raise_for_status()
+
+        async def do_summary(rng) -> int:
+            return (await client.get(f"/operation/{operation_id}/bids/summary")).status_code
+
+        async def do_first_page(rng) -> int:
+            return (await client.get(f"/operation/{operation_id}/bids", params={"limit": 50})).status_code
+
+        summary = await drive({"GET /operation/{id}/bids/summary": (1, do_summary)}, args.concurrency, total_requests=args.requests)
+        first_page = await drive({"GET /operation/{id}/bids": (1, do_first_page)}, args.concurrency, total_requests=args.requests)
+
+        # Lo que costaría calcular el resumen en cada lectura
+        latencies = []
+        async with SessionLocal() as db:
+            for _ in range(20):
+                start = time.perf_counter()
+                aggregate = (await db.execute(_bids_aggregate_query(operation_id))).one()
+                latencies.append(time.perf_counter() - start)
+
+        maintained = (await client.get(f"/operation/{operation_id}/bids/summary")).json()
+        expected = {
+            "bid_count": aggregate[0],
+            "total_amount": float(aggregate[1]),
+            "average_interest_rate": float(aggregate[2]),
+            "best_interest_rate": aggregate[3],
+            "distinct_investors": aggregate[4],
+        }
+        results[str(bids + 20)] = {
+            "summary": summary["routes"]["GET /operation/{id}/bids/summary"],
+            "first_page": first_page["routes"]["GET /operation/{id}/bids"],
+            "aggregate_on_read": summarize(latencies, 0, sum(latencies)),
+            "consistent": all(
+                abs(maintained[key] - value) < 1e-6 if isinstance(value, float) else maintained[key] == value
+                for key, value in expected.items()
+            ),
+        }
+
+    smallest, largest = results[min(results, key=int)], results[max(results, key=int)]
+    return {
+        "sizes": results,
+        "concurrency": args.concurrency,
+        "summary_p50_growth": largest["summary"]["p50_ms"] / smallest["summary"]["p50_ms"],
+        "aggregate_p50_growth": largest["aggregate_on_read"]["p50_ms"] / smallest["aggregate_on_read"]["p50_ms"],
+        "consistent": all(entry["consistent"] for entry in results.values()),
+    }
+
+
+
+# --- Motor de asignación: comparación con una implementación directa y rendimiento ---
+# Implementación de referencia, oferta por oferta, con la misma regla que services.allocation
+def _naive_allocation(bid_ids: List[int], amounts: List[int], rates: List[float], capacity: int) -> List[int]:
+    allocated = {bid_id: 0 for bid_id in bid_ids}
+    bids = sorted(zip(rates, bid_ids, amounts))
+    remaining = max(capacity, 0)
+    index = 0
+    while index < len(bids) and remaining > 0:
+        rate = bids[index][0]
+        tier = []
+        while index < len(bids) and bids[index][0] == rate:
+            tier.append(bids[index])
+            index += 1
+        total = sum(amount for _, _, amount in tier)
+        if total <= remaining:
+            for _, bid_id, amount in tier:
+                allocated[bid_id] = amount
+            remaining -= total
+            continue
+        remainders = []
+        for _, bid_id, amount in tier:
+            allocated[bid_id] = amount * remaining // total
+            remainders.append((-(amount * remaining % total), bid_id))
+        leftover = remaining - sum(allocated[bid_id] for _, bid_id, _ in tier)
+        for _, bid_id in sorted(remainders)[:leftover]:
+            allocated[bid_id] += 1
+        remaining = 0
+    return [allocated[bid_id] for bid_id in bid_ids]
+
+def _random_bids(rng: np.random.Generator, count: int, max_amount: int = 100_000, rate_levels: int = 50):
+    bid_ids = rng.permutation(count).astype(np.int64) + 1
+    amounts = rng.integers(1, max_amount, count, dtype=np.int64)
+    rates = np.round(rng.integers(100, 100 + rate_levels, count) / 10, 1)
+    return bid_ids, amounts, rates
+
+@scenario("allocation")
+async def allocation(ctx: BenchContext) -> dict:
+    rng = np.random.default_rng(21)
+
+    # Casos aleatorios pequeños, con muchas tasas repetidas y montos que desbordan int64
+    mismatches = 0
+    cases = 500
+    for case in range(cases):
+        count = int(rng.integers(1, 200))
+        max_amount = 10**15 if case % 50 == 0 else 100_000
+        bid_ids, amounts, rates = _random_bids(rng, count, max_amount, rate_levels=int(rng.integers(1, 10)))
+        capacity = int(rng.integers(0, max(int(amounts.sum()) * 6 // 5, 1)))
+        engine_result = allocate(bid_ids, amounts, rates, capacity).tolist()
+        if engine_result != _naive_allocation(bid_ids.tolist(), amounts.tolist(), rates.tolist(), capacity):
+            mismatches += 1
+
+    # Rendimiento del motor con un millón de ofertas
+    bid_ids, amounts, rates = _random_bids(rng, 1_000_000)
+    capacity = int(amounts.sum()) // 2
+    timings = []
+    for _ in range(5):
+        start = time.perf_counter()
+        result = allocate(bid_ids, amounts, rates, capacity)
+        timings.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    _naive_allocation(bid_ids.tolist(), amounts.tolist(), rates.tolist(), capacity)
+    naive_seconds = time.perf_counter() - start
+
+    # Cierre de una operación con ofertas en la base de datos, de extremo a extremo
+    bids = ctx.args.allocation_bids
+    db_ids, db_amounts, db_rates = _random_bids(rng, bids)
+    operator = await _operator_token(ctx)
+    operation_id = await _new_operation(ctx, operator, float(db_amounts.sum()) / 200)
+    await insert_chunks(engine, sql_models.Bid.__table__, [{
+        "operation_id": operation_id,
+        "investor_id": ctx.info.investor_ids[index % len(ctx.info.investor_ids)],
+        "amount": Decimal(int(amount)).scaleb(-2),
+        "interest_rate": float(rate),
+        "bid_date": datetime.now(timezone.utc),
+    } for index, (amount, rate) in enumerate(zip(db_amounts.tolist(), db_rates.tolist()))])
+
+    async with SessionLocal() as db:
+        await db.execute(
+            update(sql_models.Operation)
+            .where(sql_models.Operation.id == operation_id)
+            .values(deadline=date.today() - timedelta(days=1))
+        )
+        await db.commit()
+        start = time.perf_counter()
+        await crud.update_expired_operations(db, settle=True)
+        settle_seconds = time.perf_counter() - start
+        allocated_total, winners = (await db.execute(
+            select(func.sum(sql_models.Allocation.amount_allocated), func.count())
+            .where(sql_models.Allocation.operation_id == operation_id)
+        )).one()
+        operation = await crud.get_operation_by_id(db, operation_id)
+
+    return {
+        "random_cases": cases,
+        "mismatches": mismatches,
+        "engine_1m_bids": {
+            "best_s": min(timings),
+            "mean_s": sum(timings) / len(timings),
+            "allocated_exactly": int(result.sum()) == capacity,
+            "naive_s": naive_seconds,
+        },
+        "settle_in_database": {
+            "bids": bids,
+            "winners": winners,
+            "close_and_settle_s": settle_seconds,
+            "allocated_matches_required": Decimal(allocated_total) == Decimal(operation.amount_required),
+        },
+    }
+
+
+
+# --- Serialización del listado: entidades ORM frente a filas con TypeAdapter ---
+async def _measure_listing(size: int, columns_only: bool, trace: bool) -> Tuple[dict, bytes]:
+    from routers.operations import _render_operation_rows, _render_operations
+
+    if trace:
+        tracemalloc.start()
+    cpu = time.process_time()
+    async with SessionLocal() as db:
+        operations, _ = await crud.get_active_operations_page(db, size, columns_only=columns_only)
+        fetched = time.process_time()
+        body = _render_operation_rows(operations) if columns_only else _render_operations(operations)
+    done = time.process_time()
+    result = {"cpu_s": done - cpu, "fetch_cpu_s": fetched - cpu, "serialize_cpu_s": done - fetched}
+    if trace:
+        result = {"peak_mib": tracemalloc.get_traced_memory()[1] / 2**20}
+        tracemalloc.stop()
+    return result, body
+
+@scenario("serialization")
+async def serialization(ctx: BenchContext) -> dict:
+    sizes = ctx.args.serialization_sizes
+    operator_id = await _operation_owner(ctx)
+
+    # Operaciones activas suficientes para la página más grande
+    now = datetime.now(timezone.utc)
+    await insert_chunks(engine, sql_models.Operation.__table__, [{
+        "operator_id": operator_id,
+        "amount_required": Decimal(100_000),
+        "interest_rate": 10.0,
+        "deadline": date.today() + timedelta(days=400 + index % 365),
+        "amount_collected": Decimal(index % 1000),
+        "is_closed": False,
+        "created_at": now,
+    } for index in range(max(sizes))])
+
+    results = {}
+    for size in sizes:
+        entry = {}
+        bodies = {}
+        for name, columns_only in (("orm_entities", False), ("rows_type_adapter", True)):
+            # Una pasada de calentamiento, luego CPU sin trazar y memoria trazada por separado
+            await _measure_listing(size, columns_only, trace=False)
+            cpu, bodies[name] = await _measure_listing(size, columns_only, trace=False)
+            memory, _ = await _measure_listing(size, columns_only, trace=True)
+            entry[name] = {**cpu, **memory, "bytes": len(bodies[name])}
+        entry["speedup_serialize"] = entry["orm_entities"]["serialize_cpu_s"] / entry["rows_type_adapter"]["serialize_cpu_s"]
+        entry["speedup_total"] = entry["orm_entities"]["cpu_s"] / entry["rows_type_adapter"]["cpu_s"]
+        entry["same_content"] = json.loads(bodies["orm_entities"]) == json.loads(bodies["rows_type_adapter"])
+        results[str(size)] = entry
+    return results
+
+
+# --- Latencia de GET /operation/{id} durante una avalancha de ofertas, con y sin control de admisión ---
+@scenario("bid_storm")
+async def bid_storm(ctx: BenchContext) -> dict:
+    client, info, args = ctx.client, ctx.info, ctx.args
+    tokens = await _investor_tokens(ctx, 50)
+    operation_id = await _new_operation(ctx, await _operator_token(ctx), 1e12)
+    statuses: Dict[int, int] = {}
+    latencies: Dict[str, List[float]] = {"accepted": [], "rejected": []}
+
+    async def do_operation(rng) -> int:
+        return (await client.get(f"/operation/{rng.choice(info.operation_ids)}")).status_code
+
+    async def do_bid(rng) -> int:
+        began = time.perf_counter()
+        response = await client.post("/bid", headers=rng.choice(tokens), json={
+            "operation_id": operation_id, "amount": rng.randint(1, 100), "interest_rate": 5.0,
+        })
+        latencies["accepted" if response.status_code == 201 else "rejected"].append(time.perf_counter() - began)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        # Los clientes respetan Retry-After, como se espera de un cliente bien portado
+        if "retry-after" in response.headers:
+            await asyncio.sleep(int(response.headers["retry-after"]))
+        return response.status_code
+
+    async def storm(enabled: bool) -> dict:
+        admission.enabled = enabled
+        statuses.clear()
+        for values in latencies.values():
+            values.clear()
+        reads, _ = await asyncio.gather(
+            drive({"GET /operation/{id}": (1, do_operation)}, 4, duration=args.storm_seconds),
+            drive({"POST /bid": (1, do_bid)}, args.storm_concurrency, duration=args.storm_seconds),
+        )
+        return {
+            "reads": reads["routes"]["GET /operation/{id}"],
+            "bids_accepted": summarize(latencies["accepted"], 0, args.storm_seconds),
+            "bids_rejected": summarize(latencies["rejected"], len(latencies["rejected"]), args.storm_seconds),
+            "bid_statuses": {str(code): count for code, count in sorted(statuses.items())},
+        }
+
+    # Sin caché de operaciones para que las lecturas compitan por la base de datos
+    enabled, cache_enabled = admission.enabled, operation_cache.enabled
+    operation_cache.enabled = False
+    try:
+        baseline = await drive({"GET /operation/{id}": (1, do_operation)}, 4, duration=args.storm_seconds)
+        without_admission = await storm(False)
+        with_admission = await storm(True)
+    finally:
+        admission.enabled, operation_cache.enabled = enabled, cache_enabled
+
+    return {
+        "storm_clients": args.storm_concurrency,
+        "baseline_reads": baseline["routes"]["GET /operation/{id}"],
+        "without_admission": without_admission,
+        "with_admission": with_admission,
+        "admission": admission.stats(),
+    }
+
+
+# --- Reintentos simultáneos con la misma Idempotency-Key: solo debe escribirse una oferta por clave ---
+@scenario("idempotency")
+async def idempotency(ctx: BenchContext) -> dict:
+    keys, retries = ctx.args.idempotency_keys, ctx.args.idempotency_retries
+    tokens = await _investor_tokens(ctx, 10)
+    operation_id = await _new_operation(ctx, await _operator_token(ctx), 1e9)
+    run_id = random.getrandbits(32)
+
+    async def post(index: int) -> Tuple[int, float, dict]:
+        headers = {**tokens[index % len(tokens)], "Idempotency-Key": f"bench-{run_id}-{index}"}
+        began = time.perf_counter()
+        response = await ctx.client.post("/bid", headers=headers, json={
+            "operation_id": operation_id, "amount": 1 + index % 100, "interest_rate": 5.0,
+        })
+        return response, time.perf_counter() - began
+
+    # Cada clave se envía `retries` veces a la vez, como un cliente que reintenta por timeout
+    start = time.perf_counter()
+    concurrent = await asyncio.gather(*(post(index) for index in range(keys) for _ in range(retries)))
+    elapsed = time.perf_counter() - start
+
+    # Reintentos posteriores: desde la caché del worker y, vaciándola, desde la tabla
+    cached = [await post(index) for index in range(keys)]
+    idempotency_store.clear()
+    from_database = [await post(index) for index in range(keys)]
+
+    async with SessionLocal() as db:
+        bids_written = (await db.execute(
+            select(func.count(sql_models.Bid.id)).where(sql_models.Bid.operation_id == operation_id)
+        )).scalar_one()
+    totals = await _operation_totals(operation_id)
+
+    bid_ids: Dict[int, set] = {}
+    for position, (response, _) in enumerate(concurrent):
+        bid_ids.setdefault(position // retries, set()).add(response.json().get("id"))
+    return {
+        "keys": keys,
+        "retries_per_key": retries,
+        "elapsed_s": elapsed,
+        "statuses": sorted({response.status_code for response, _ in concurrent + cached + from_database}),
+        "replayed": sum(1 for response, _ in concurrent if response.headers.get(REPLAYED_HEADER)),
+        "bids_written": bids_written,
+        "one_bid_per_key": bids_written == keys and all(len(ids) == 1 for ids in bid_ids.values()),
+        "amount_collected_matches": totals["amount_collected"] == totals["bids_total"],
+        "concurrent": summarize([latency for _, latency in concurrent], 0, elapsed),
+        "replay_cached_p50_ms": summarize([latency for _, latency in cached], 0, 1)["p50_ms"],
+        "replay_database_p50_ms": summarize([latency for _, latency in from_database], 0, 1)["p50_ms"],
+    }
+
+
+# --- Ofertas por segundo con una transacción por oferta frente a group commit ---
+@scenario("group_commit")
+async def group_commit(ctx: BenchContext) -> dict:
+    args = ctx.args
+    tokens = await _investor_tokens(ctx, 20)
+    operator = await _operator_token(ctx)
+
+    async def measure(clients: int) -> dict:
+        operation_id = await _new_operation(ctx, operator, 1e12)
+
+        async def do_bid(rng) -> int:
+            response = await ctx.client.post("/bid", headers=rng.choice(tokens), json={
+                "operation_id": operation_id, "amount": rng.randint(1, 100), "interest_rate": rng.choice((4.0, 5.0, 6.0)),
+            })
+            return response.status_code
+
+        result = await drive({"POST /bid": (1, do_bid)}, clients, duration=args.ingestion_seconds)
+        totals = await _operation_totals(operation_id)
+        route = result["routes"]["POST /bid"]
+        async with SessionLocal() as db:
+            stats = await crud.get_operation_bid_stats(db, operation_id)
+        return {
+            "bids_per_s": (route["requests"] - route["errors"]) / result["elapsed_s"],
+            "errors": route["errors"],
+            "p50_ms": route["p50_ms"],
+            "p99_ms": route["p99_ms"],
+            "consistent": totals["amount_collected"] == totals["bids_total"]
+            and float(stats.total_amount) == totals["bids_total"],
+        }
+
+    results = {}
+    enabled = bid_writer.enabled
+    try:
+        for mode in ("direct", "group"):
+            bid_writer.enabled = mode == "group"
+            if bid_writer.enabled:
+                bid_writer.start()
+            batches, bids = bid_writer.batches, bid_writer.bids
+            results[mode] = {str(clients): await measure(clients) for clients in args.ingestion_clients}
+            if bid_writer.enabled:
+                results[mode]["average_batch"] = (bid_writer.bids - bids) / max(bid_writer.batches - batches, 1)
+    finally:
+        bid_writer.enabled = enabled
+    results["speedup"] = {
+        str(clients): results["group"][str(clients)]["bids_per_s"] / results["direct"][str(clients)]["bids_per_s"]
+        for clients in args.ingestion_clients
+    }
+    return results
+
+
+# --- Consultas por petición de GET /user/{id}/portfolio según el tamaño de la cartera ---
+# Compara con el camino ingenuo que carga la operación de cada oferta por separado (N+1)
+async def _naive_portfolio(investor_id: str, limit: int) -> int:
+    async with SessionLocal() as db:
+        result = await db.execute(
+            select(sql_models.Bid).where(sql_models.Bid.investor_id == investor_id)
+            .order_by(sql_models.Bid.bid_date.desc(), sql_models.Bid.id.desc()).limit(limit)
+        )
+        bids = result.scalars().all()
+        operations = [await crud.get_operation_by_id(db, bid.operation_id) for bid in bids]
+    return len(operations)
+
+@scenario("portfolio")
+async def portfolio(ctx: BenchContext) -> dict:
+    client, info, args = ctx.client, ctx.info, ctx.args
+    now = datetime.now(timezone.utc)
+    run_id = random.getrandbits(32)
+    results = {}
+
+    for size in args.portfolio_sizes:
+        # Un inversor nuevo por tamaño, con `size` ofertas repartidas entre las operaciones
+        username = f"portfolio-{run_id}-{size}"
+        created = await client.post("/user", json={"username": username, "password": BENCHMARK_PASSWORD, "role": "inversor"})
+        created.raise_for_status()
+        investor_id = created.json()["id"]
+        headers = await login(client, username)
+        await insert_chunks(engine, sql_models.Bid.__table__, [{
+            "operation_id": info.operation_ids[index % len(info.operation_ids)],
+            "investor_id": investor_id,
+            "amount": Decimal(1 + index % 100),
+            "interest_rate": 5.0 + index % 10,
+            "bid_date": now - timedelta(seconds=index),
+        } for index in range(size)])
+
+        # Primera petición fuera de la medición (carga el usuario en la caché de autenticación)
+        (await client.get(f"/user/{investor_id}/portfolio", headers=headers)).raise_for_status()
+        with QueryCounter(read_engine) as counter:
+            start = time.perf_counter()
+            response = await client.get(f"/user/{investor_id}/portfolio", params={"limit": args.page_size or 100}, headers=headers)
+            elapsed = time.perf_counter() - start
+        response.raise_for_status()
+        body = response.json()
+
+        with QueryCounter(engine) as naive_counter:
+            start = time.perf_counter()
+            await _naive_portfolio(investor_id, args.page_size or 100)
+            naive_elapsed = time.perf_counter() - start
+
+        results[str(size)] = {
+            "queries": counter.count,
+            "elapsed_ms": elapsed * 1000,
+            "positions": len(body["positions"]),
+            "bid_count": body["totals"]["bid_count"],
+            "naive_queries": naive_counter.count,
+            "naive_elapsed_ms": naive_elapsed * 1000,
+        }
+
+    counts = {entry["queries"] for entry in results.values()}
+    return {
+        "sizes": results,
+        "constant_query_count": len(counts) == 1,
+        "totals_match": all(entry["bid_count"] == int(size) for size, entry in results.items()),
+    }
+
+
+
+# --- Panel del operador: resumen mantenido frente a agregar en cada lectura ---
+@scenario("operator_dashboard")
+async def operator_dashboard(ctx: BenchContext) -> dict:
+    from database.summaries import find_mismatches
+
+    client, info, args = ctx.client, ctx.info, ctx.args
+    operations, bids_per_operation = args.dashboard_operations, args.dashboard_bids
+    now = datetime.now(timezone.utc)
+    rng = random.Random(22)
+
+    # Un operador nuevo con sus operaciones y ofertas cargadas directamente; una de cada diez
+    # ya venció y la cierra el barrido más abajo
+    username = f"dashboard-{random.getrandbits(32)}"
+    created = await client.post("/user", json={"username": username, "password": BENCHMARK_PASSWORD, "role": "operador"})
+    created.raise_for_status()
+    operator_id = created.json()["id"]
+    headers = await login(client, username)
+    await insert_chunks(engine, sql_models.Operation.__table__, [{
+        "operator_id": operator_id,
+        "amount_required": Decimal(1_000_000),
+        "interest_rate": 10.0,
+        "deadline": date.today() + (timedelta(days=-1) if index % 10 == 0 else timedelta(days=30 + index % 365)),
+        "amount_collected": Decimal(0),
+        "is_closed": index % 20 == 1,
+        "created_at": now,
+    } for index in range(operations)])
+    async with SessionLocal() as db:
+        operation_ids = (await db.execute(
+            select(sql_models.Operation.id).where(sql_models.Operation.operator_id == operator_id)
+        )).scalars().all()
+    await insert_chunks(engine, sql_models.Bid.__table__, [{
+        "operation_id": operation_id,
+        "investor_id": rng.choice(info.investor_ids),
+        "amount": Decimal(rng.randint(1, 1000)),
+        "interest_rate": round(rng.uniform(1, 20), 2),
+        "bid_date": now,
+    } for operation_id in operation_ids for _ in range(bids_per_operation)])
+
+    # Reconstrucción completa, como tras una carga masiva
+    async with SessionLocal() as db:
+        await crud.rebuild_operation_bid_stats(db, operation_ids)
+        start = time.perf_counter()
+        await crud.rebuild_operator_summaries(db, [operator_id])
+        rebuild_elapsed = time.perf_counter() - start
+
+    # Cambios por la API y el barrido de vencimientos: el resumen se mantiene en cada uno
+    investors = await _investor_tokens(ctx, 5)
+    new_ids = [await _new_operation(ctx, headers, 100_000.0) for _ in range(10)]
+    bid_ids = []
+    for index in range(50):
+        response = await client.post("/bid", headers=investors[index % len(investors)], json={
+            "operation_id": new_ids[index % len(new_ids)], "amount": rng.randint(1, 100), "interest_rate": round(rng.uniform(1, 20), 2),
+        })
+        response.raise_for_status()
+        bid_ids.append((index % len(investors), response.json()["id"]))
+    investor, bid_id = bid_ids[0]
+    (await client.patch(f"/bid/{bid_id}", headers=investors[investor], json={"amount": 7, "interest_rate": 3.5})).raise_for_status()
+    (await client.patch(f"/operation/{new_ids[0]}", headers=headers, json={"amount_required": 200_000.0})).raise_for_status()
+    deleted_id = await _new_operation(ctx, headers, 100_000.0)
+    (await client.delete(f"/operation/{deleted_id}", headers=headers)).raise_for_status()
+    async with SessionLocal() as db:
+        closed = await crud.update_expired_operations(db)
+        mismatches = await find_mismatches(db, [operator_id])
+
+    # Primera petición fuera de la medición (carga el usuario en la caché de autenticación)
+    path = f"/operator/{operator_id}/operations"
+    (await client.get(path, headers=headers)).raise_for_status()
+    with QueryCounter(read_engine) as counter:
+        response = await client.get(path, params={"limit": args.page_size or 100}, headers=headers)
+    response.raise_for_status()
+    summary = response.json()["summary"]
+
+    async def do_dashboard(rng) -> int:
+        return (await client.get(path, params={"limit": args.page_size or 100}, headers=headers)).status_code
+
+    dashboard = await drive({"GET /operator/{id}/operations": (1, do_dashboard)}, args.concurrency, total_requests=args.requests)
+
+    # Lo que costaría calcular los totales desde operations y bids en cada lectura
+    latencies = []
+    async with SessionLocal() as db:
+        for _ in range(20):
+            start = time.perf_counter()
+            (await db.execute(crud._operator_summary_query([operator_id]))).one()
+            latencies.append(time.perf_counter() - start)
+
+    return {
+        "operations": summary["operation_count"],
+        "bids": summary["bid_count"],
+        "closed_by_sweep": closed,
+        "rebuild_ms": rebuild_elapsed * 1000,
+        "queries_per_request": counter.count,
+        "dashboard": dashboard["routes"]["GET /operator/{id}/operations"],
+        "aggregate_on_read": summarize(latencies, 0, sum(latencies)),
+        "consistent": not mismatches,
+        "mismatches": mismatches[:10],
+    }
+
+
+
+# --- Archivo de operaciones cerradas: consultas calientes con el historial creciendo 10x ---
+@scenario("archival")
+async def archival(ctx: BenchContext) -> dict:
+    client, info, args = ctx.client, ctx.info, ctx.args
+    operator_id = await _operation_owner(ctx)
+    # El historial tiene ofertas de los diez primeros inversores; la cartera se mide con uno sin
+    # historial y, aparte, con uno que lo tiene (sus totales suman también sus ofertas archivadas)
+    investor_id = info.investor_ids[-1]
+    history_investor_id = info.investor_ids[0]
+    hot_operation_id = info.operation_ids[0]
+    closed_at = datetime.now(timezone.utc) - timedelta(days=730)
+    rng = random.Random(23)
+    today = date.today()
+
+    # Consultas del camino caliente: listado de activas, barrido de vencidas, libro de ofertas
+    # de una operación y cartera (página y totales) de un inversor
+    hot_queries = {
+        "active_operations_page": lambda db: db.execute(crud._active_operations_query().limit(100)),
+        "expired_sweep": lambda db: db.execute(select(sql_models.Operation.id).where(
+            sql_models.Operation.is_closed == False, crud._expired(today),
+        ).limit(500)),
+        "operation_bids_page": lambda db: crud.get_operation_bids_page(db, hot_operation_id, 100),
+        "portfolio_page": lambda db: crud.get_investor_positions_page(db, investor_id, 100),
+        "portfolio_totals": lambda db: crud.get_investor_portfolio_totals(db, investor_id),
+        "history_portfolio_totals": lambda db: crud.get_investor_portfolio_totals(db, history_investor_id),
+    }
+
+    async def measure() -> dict:
+        results = {}
+        async with SessionLocal() as db:
+            status = await crud.get_archive_status(db)
+            for name, query in hot_queries.items():
+                await query(db)
+                latencies = []
+                for _ in range(args.archive_samples):
+                    start = time.perf_counter()
+                    await query(db)
+                    latencies.append(time.perf_counter() - start)
+                results[name] = summarize(latencies, 0, sum(latencies))["p50_ms"]
+        return {"hot_operations": status["operations"], "hot_bids": status["bids"], "p50_ms": results}
+
+    async def add_history(operations: int) -> int:
+        async with SessionLocal() as db:
+            # Los ids siguen al mayor entregado, también si está en el archivo
+            first_id = 1
+            for model in (sql_models.Operation, sql_models.ArchivedOperation):
+                first_id = max(first_id, ((await db.execute(select(func.max(model.id)))).scalar() or 0) + 1)
+        await insert_chunks(engine, sql_models.Operation.__table__, [{
+            "id": first_id + index,
+            "operator_id": operator_id,
+            "amount_required": Decimal(10_000),
+            "interest_rate": 10.0,
+            "deadline": closed_at.date(),
+            "amount_collected": Decimal(0),
+            "is_closed": True,
+            "created_at": closed_at,
+            "closed_at": closed_at,
+        } for index in range(operations)])
+        await insert_chunks(engine, sql_models.Bid.__table__, [{
+            "operation_id": first_id + index,
+            "investor_id": rng.choice(info.investor_ids[:10]),
+            "amount": Decimal(rng.randint(1, 1000)),
+            "interest_rate": round(rng.uniform(1, 20), 2),
+            "bid_date": closed_at,
+        } for index in range(operations) for _ in range(args.archive_bids)])
+        # Como tras una carga masiva: el resumen del operador se recalcula una vez
+        async with SessionLocal() as db:
+            await crud.rebuild_operator_summaries(db, [operator_id])
+        return first_id
+
+    # Historial 1x y luego 10x: cada paso se mide con el historial en las tablas calientes y
+    # después de archivarlo
+    steps = {}
+    history = 0
+    archived_id = None
+    for target in (args.archive_history, args.archive_history * 10):
+        first_id = await add_history(target - history)
+        history = target
+        archived_id = archived_id or first_id
+        in_hot = await measure()
+
+        async with SessionLocal() as db:
+            start = time.perf_counter()
+            archived = await crud.archive_closed_operations(db, timedelta(days=365), args.archive_batch_size)
+            archive_elapsed = time.perf_counter() - start
+        steps[f"{target // args.archive_history}x"] = {
+            "history_operations": target,
+            "history_in_hot_tables": in_hot,
+            "archived_operations": archived,
+            "archive_s": archive_elapsed,
+            "after_archive": await measure(),
+        }
+
+    # Las lecturas por id siguen encontrando las operaciones archivadas
+    response = await client.get(f"/operation/{archived_id}")
+    bids = await client.get(f"/operation/{archived_id}/bids")
+    async with SessionLocal() as db:
+        from database.summaries import find_mismatches
+        mismatches = await find_mismatches(db, [operator_id])
+
+    first, last = steps["1x"]["after_archive"]["p50_ms"], steps["10x"]["after_archive"]["p50_ms"]
+    return {
+        "steps": steps,
+        "archived_ratio_10x_vs_1x": {name: last[name] / first[name] if first[name] else None for name in first},
+        "archived_operation_readable": response.status_code == 200 and response.json()["is_closed"],
+        "archived_bids_readable": bids.status_code == 200 and len(bids.json()) == args.archive_bids,
+        "operator_summary_consistent": not mismatches,
+    }
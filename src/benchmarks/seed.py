@@ -0,0 +1,110 @@
+import random
+import uuid
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from typing import List
+from sqlalchemy import bindparam, insert, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+import database.sql_models as sql_models
+from benchmarks.environment import BENCHMARK_PASSWORD
+from database.crud import get_password_hash, rebuild_operation_bid_stats, rebuild_operator_summaries
+
+SEED_CHUNK_SIZE = 10000
+
+
+@dataclass
+class SeedInfo:
+    operators: List[str] = field(default_factory=list)
+    investors: List[str] = field(default_factory=list)
+    investor_ids: List[str] = field(default_factory=list)
+    operation_ids: List[int] = field(default_factory=list)
+    bids: int = 0
+
+
+async def insert_chunks(engine: AsyncEngine, table, rows: List[dict]) -> None:
+    for start in range(0, len(rows), SEED_CHUNK_SIZE):
+        async with engine.begin() as conn:
+            await conn.execute(insert(table), rows[start:start + SEED_CHUNK_SIZE])
+
+
+# Genera un conjunto sintético de usuarios, operaciones y ofertas con inserciones masivas.
+# Todas las contraseñas comparten un único hash para no pagar bcrypt por usuario.
+async def seed(engine: AsyncEngine, users: int, operations: int, bids: int, seed_value: int = 42) -> SeedInfo:
+    rng = random.Random(seed_value)
+    now = datetime.now(timezone.utc)
+    password_hash = get_password_hash(BENCHMARK_PASSWORD)
+    info = SeedInfo()
+
+    if engine.dialect.name == "sqlite":
+        async with engine.begin() as conn:
+            await conn.execute(text("PRAGMA journal_mode=WAL"))
+
+    operators = max(1, users // 10)
+    user_rows = []
+    operator_ids = []
+    for index in range(users):
+        is_operator = index < operators
+        user_id = str(uuid.uuid4())
+        username = f"{'operator' if is_operator else 'investor'}-{index}"
+        user_rows.append({
+            "id": user_id,
+            "username": username,
+            "password_hash": password_hash,
+            "role": "operador" if is_operator else "inversor",
+            "created_at": now,
+        })
+        if is_operator:
+            operator_ids.append(user_id)
+            info.operators.append(username)
+        else:
+            info.investor_ids.append(user_id)
+            info.investors.append(username)
+    await insert_chunks(engine, sql_models.User.__table__, user_rows)
+
+    # Montos requeridos holgados para que las ofertas del benchmark no agoten el cupo
+    bids_per_operation = bids // max(operations, 1) + 1
+    operation_rows = [{
+        "id": index + 1,
+        "operator_id": rng.choice(operator_ids),
+        "amount_required": Decimal(1000 * bids_per_operation + 10_000_000),
+        "interest_rate": round(rng.uniform(1, 20), 2),
+        "deadline": date.today() + timedelta(days=rng.randint(1, 365)),
+        "amount_collected": Decimal(0),
+        "is_closed": False,
+        "created_at": now,
+    } for index in range(operations)]
+    await insert_chunks(engine, sql_models.Operation.__table__, operation_rows)
+    info.operation_ids = [row["id"] for row in operation_rows]
+
+    collected = {}
+    for start in range(0, bids, SEED_CHUNK_SIZE):
+        bid_rows = []
+        for _ in range(min(SEED_CHUNK_SIZE, bids - start)):
+            operation_id = rng.choice(info.operation_ids)
+            amount = Decimal(rng.randint(1, 1000))
+            collected[operation_id] = collected.get(operation_id, 0) + amount
+            bid_rows.append({
+                "operation_id": operation_id,
+                "investor_id": rng.choice(info.investor_ids),
+                "amount": amount,
+                "interest_rate": round(rng.uniform(1, 20), 2),
+                "bid_date": now,
+            })
+        await insert_chunks(engine, sql_models.Bid.__table__, bid_rows)
+    info.bids = bids
+
+    # Mantener amount_collected coherente con las ofertas sembradas
+    async with engine.begin() as conn:
+        table = sql_models.Operation.__table__
+        await conn.execute(
+            table.update().where(table.c.id == bindparam("b_id")).values(amount_collected=bindparam("b_amount")),
+            [{"b_id": key, "b_amount": value} for key, value in collected.items()],
+        )
+
+    # Las ofertas sembradas no pasan por crud: recalcular sus estadísticas y los resúmenes de una vez
+    async with AsyncSession(engine) as db:
+        await rebuild_operation_bid_stats(db)
+        await rebuild_operator_summaries(db)
+    return info
@@ -0,0 +1,141 @@
+# Informe de arranque en frío: tiempos de importación (python -X importtime) y tiempo hasta la
+# primera respuesta de la app, cada medición en un intérprete nuevo.
+# Uso: python -m benchmarks.startup [--database URL] [--runs 5] [--max-first-request-ms 2000]
+# Con --max-first-request-ms termina con código 1 si la mediana supera el umbral.
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import List
+
+from benchmarks.environment import configure_database
+
+SOURCE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Módulos que el arranque no debería cargar: se importan con el primer uso
+DEFERRED_MODULES = ("alembic", "passlib", "jose", "jwt", "numpy", "pyarrow")
+
+
+def _python(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *args], cwd=SOURCE_DIR, env=os.environ.copy(), capture_output=True, text=True, check=True
+    )
+
+
+# Lleva el esquema a la última revisión antes de medir, como en un despliegue ya migrado
+def prepare_database() -> None:
+    _python("-c", "import asyncio, main; asyncio.run(main.upgrade_database(main.engine, 'upgrade'))")
+
+
+# Ejecuta `import main` con -X importtime y agrupa los tiempos (en ms) por paquete raíz
+def import_report(top: int) -> dict:
+    stderr = _python("-X", "importtime", "-c", "import main").stderr
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append((name.rstrip(), int(self_us), int(cumulative_us)))
+
+    packages = {}
+    for name, self_us, _ in modules:
+        root = name.strip().split(".")[0]
+        packages[root] = packages.get(root, 0) + self_us
+    # Los módulos sin sangría son los importados directamente por `import main`
+    total_us = sum(cumulative_us for name, _, cumulative_us in modules if not name.startswith(" "))
+    loaded = {name.strip().split(".")[0] for name, _, _ in modules}
+
+    return {
+        "total_ms": total_us / 1000,
+        "modules": len(modules),
+        "top_packages_ms": {
+            name: us / 1000 for name, us in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+        },
+        "top_modules_cumulative_ms": {
+            name.strip(): us / 1000 for name, _, us in sorted(modules, key=lambda item: item[2], reverse=True)[:top]
+        },
+        "deferred_modules_loaded": sorted(loaded.intersection(DEFERRED_MODULES)),
+    }
+
+
+# Se ejecuta en el proceso hijo: importa la app, corre el arranque y hace la primera petición
+def _child() -> None:
+    start = time.perf_counter()
+    import httpx
+    import main
+
+    async def first_request() -> dict:
+        imported = time.perf_counter()
+        await main.app.router.startup()
+        started = time.perf_counter()
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench") as client:
+            response = await client.get("/operations")
+        answered = time.perf_counter()
+        await main.app.router.shutdown()
+        return {
+            "status": response.status_code,
+            "import_ms": (imported - start) * 1000,
+            "startup_ms": (started - imported) * 1000,
+            "request_ms": (answered - started) * 1000,
+            "first_request_ms": (answered - start) * 1000,
+        }
+
+    print(json.dumps(asyncio.run(first_request())))
+
+
+def first_request_report(runs: int) -> dict:
+    samples: List[dict] = []
+    for _ in range(runs):
+        began = time.perf_counter()
+        output = _python("-m", "benchmarks.startup", "--child").stdout
+        sample = json.loads(output.strip().splitlines()[-1])
+        sample["process_ms"] = (time.perf_counter() - began) * 1000
+        samples.append(sample)
+    keys = ("import_ms", "startup_ms", "request_ms", "first_request_ms", "process_ms")
+    return {
+        "runs": runs,
+        "status": sorted({sample["status"] for sample in samples}),
+        "median": {key: statistics.median(sample[key] for sample in samples) for key in keys},
+        "max": {key: max(sample[key] for sample in samples) for key in keys},
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.startup", description="Cold-start report.")
+    parser.add_argument("--database", help="database URL (default: a temporary SQLite file via aiosqlite)")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters for time-to-first-request")
+    parser.add_argument("--top", type=int, default=15, help="packages and modules listed in the import report")
+    parser.add_argument("--max-first-request-ms", type=float, help="fail if the median time-to-first-request is higher")
+    parser.add_argument("--output", help="write the JSON results to this file instead of stdout")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        _child()
+        return
+
+    configure_database(args.database)
+    prepare_database()
+    results = {"imports": import_report(args.top), "first_request": first_request_report(args.runs)}
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+    if args.max_first_request_ms is not None:
+        median = results["first_request"]["median"]["first_request_ms"]
+        if median > args.max_first_request_ms or results["first_request"]["status"] != [200]:
+            print(f"FAIL: time to first request {median:.0f} ms (limit {args.max_first_request_ms:.0f} ms)", file=sys.stderr)
+            sys.exit(1)
+        print(f"OK: time to first request {median:.0f} ms (limit {args.max_first_request_ms:.0f} ms)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
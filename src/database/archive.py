@@ -0,0 +1,40 @@
+# Archivo de operaciones cerradas: mueve a operations_archive y bids_archive las operaciones
+# cerradas hace más del periodo de retención, con sus ofertas, por lotes.
+# Uso: python -m database.archive run [--retention-days 365] [--batch-size 200] [--max-batches N]
+#      python -m database.archive status
+# Una ejecución interrumpida se retoma volviendo a lanzarla: cada lote es su propia transacción.
+import argparse
+import asyncio
+import json
+from datetime import timedelta
+
+import database.crud as crud
+from database.database import SessionLocal, engine
+from services.expiry_scheduler import ARCHIVE_BATCH_SIZE, ARCHIVE_RETENTION_DAYS
+
+
+async def run(args: argparse.Namespace) -> None:
+    try:
+        async with SessionLocal() as db:
+            if args.command == "run":
+                archived = await crud.archive_closed_operations(
+                    db, timedelta(days=args.retention_days), args.batch_size, args.max_batches
+                )
+                print(f"Archived {archived} operations.")
+            else:
+                print(json.dumps(await crud.get_archive_status(db), indent=2))
+    finally:
+        await engine.dispose()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m database.archive", description="Closed operations archive.")
+    parser.add_argument("command", choices=("run", "status"))
+    parser.add_argument("--retention-days", type=float, default=ARCHIVE_RETENTION_DAYS, help="archive operations closed longer ago than this")
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE, help="operations moved per transaction")
+    parser.add_argument("--max-batches", type=int, help="stop after this many batches (default: until done)")
+    asyncio.run(run(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+# Importación masiva de usuarios y operaciones desde CSV o JSONL.
+# El archivo se procesa por lotes: cada lote se valida fila a fila, se comprueba con una sola
+# consulta qué nombres de usuario (u operadores) existen, las contraseñas se hashean en el pool de
+# procesos y las filas válidas se insertan con un único executemany y un commit. Las filas
+# inválidas se reportan con su línea sin detener la importación.
+# Uso: python -m database.bulk_import users usuarios.csv [--format csv|jsonl] [--batch-size 5000]
+#      python -m database.bulk_import operations operaciones.jsonl
+# Columnas de users: username, password, role (operador o inversor).
+# Columnas de operations: operator (nombre de usuario del operador), amount_required,
+# interest_rate, deadline (AAAA-MM-DD).
+import argparse
+import asyncio
+import csv
+import json
+import sys
+import time
+import uuid
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import database.crud as crud
+import database.sql_models as sql_models
+import models.py_schemas as py_schemas
+from services.operation_cache import operation_cache
+
+IMPORT_BATCH_SIZE = 5000
+IMPORT_KINDS = ("users", "operations")
+IMPORT_FORMATS = ("csv", "jsonl")
+# El rol de administrador tampoco se puede importar
+IMPORT_ROLES = ("operador", "inversor")
+USERNAME_MAX_LENGTH = 100
+
+# Línea del archivo y el registro leído, o el error de lectura de esa línea
+Record = Tuple[int, Optional[Dict[str, Any]], Optional[str]]
+
+
+def detect_format(filename: Optional[str]) -> str:
+    extension = (filename or "").rsplit(".", 1)[-1].lower()
+    if extension == "csv":
+        return "csv"
+    if extension in ("jsonl", "ndjson"):
+        return "jsonl"
+    raise ValueError(f"Cannot infer the format from the file name; use one of: {', '.join(IMPORT_FORMATS)}.")
+
+
+# --- Lectura --- #
+# CSV con cabecera (la línea reportada es la del registro, contando la cabecera) o JSONL con un
+# objeto por línea. Las líneas se leen de una en una: el archivo nunca se carga entero.
+def read_records(lines: Iterable[str], import_format: str) -> Iterator[Record]:
+    if import_format == "csv":
+        reader = csv.DictReader(lines)
+        for record in reader:
+            if None in record:
+                yield reader.line_num, None, "Too many columns."
+            else:
+                yield reader.line_num, record, None
+        return
+    if import_format != "jsonl":
+        raise ValueError(f"Unknown format: {import_format}. Use one of: {', '.join(IMPORT_FORMATS)}.")
+
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_number, None, f"Invalid JSON: {e.msg}."
+            continue
+        if isinstance(record, dict):
+            yield line_number, record, None
+        else:
+            yield line_number, None, "Each line must be a JSON object."
+
+
+# Mensaje de una línea a partir de los errores de validación de pydantic
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}" for item in error.errors())
+
+
+def _user_data(record: Dict[str, Any]) -> py_schemas.UserCreate:
+    try:
+        data = py_schemas.UserCreate.model_validate(record)
+    except ValidationError as e:
+        raise ValueError(_validation_message(e))
+    data.username = data.username.strip()
+    if not data.username or len(data.username) > USERNAME_MAX_LENGTH:
+        raise ValueError(f"username: must have between 1 and {USERNAME_MAX_LENGTH} characters")
+    if not data.password:
+        raise ValueError("password: must not be empty")
+    if data.role not in IMPORT_ROLES:
+        raise ValueError(f"role: must be one of: {', '.join(IMPORT_ROLES)}")
+    return data
+
+
+def _operation_data(record: Dict[str, Any]) -> Tuple[str, py_schemas.OperationCreate]:
+    operator = str(record.get("operator") or "").strip()
+    if not operator:
+        raise ValueError("operator: Field required")
+    try:
+        return operator, py_schemas.OperationCreate.model_validate(record)
+    except ValidationError as e:
+        raise ValueError(_validation_message(e))
+
+
+# --- Lotes --- #
+# Nombres de usuario ya registrados, con una sola consulta por lote
+async def _existing_usernames(db: AsyncSession, usernames: List[str]) -> Set[str]:
+    if not usernames:
+        return set()
+    result = await db.execute(select(sql_models.User.username).where(sql_models.User.username.in_(usernames)))
+    return set(result.scalars().all())
+
+
+async def _import_users(
+    db: AsyncSession,
+    batch: List[Tuple[int, Dict[str, Any]]],
+    report: py_schemas.ImportReport,
+    seen: Set[str],
+    hash_passwords: Callable[[List[str]], Awaitable[List[str]]],
+) -> None:
+    valid: List[Tuple[int, py_schemas.UserCreate]] = []
+    for line, record in batch:
+        try:
+            data = _user_data(record)
+        except ValueError as e:
+            report.errors.append(py_schemas.ImportRowError(line=line, error=str(e)))
+            continue
+        if data.username in seen:
+            report.errors.append(py_schemas.ImportRowError(line=line, error="Duplicate username in the file."))
+            continue
+        seen.add(data.username)
+        valid.append((line, data))
+
+    registered = await _existing_usernames(db, [data.username for _, data in valid])
+    pending = []
+    for line, data in valid:
+        if data.username in registered:
+            report.errors.append(py_schemas.ImportRowError(line=line, error="This username is already registered."))
+        else:
+            pending.append((line, data))
+    if not pending:
+        return
+
+    hashes = await hash_passwords([data.password for _, data in pending])
+    now = datetime.now(timezone.utc)
+    rows = [
+        {"id": str(uuid.uuid4()), "username": data.username, "password_hash": password_hash, "role": data.role, "created_at": now}
+        for (_, data), password_hash in zip(pending, hashes)
+    ]
+    try:
+        await db.execute(insert(sql_models.User), rows)
+        await db.commit()
+        report.imported += len(rows)
+        return
+    except IntegrityError:
+        await db.rollback()
+
+    # Otro registro tomó alguno de los nombres entre la comprobación y el INSERT (o la base de
+    # datos los compara sin distinguir mayúsculas): el lote se inserta fila a fila
+    for (line, _), row in zip(pending, rows):
+        try:
+            async with db.begin_nested():
+                await db.execute(insert(sql_models.User).values(**row))
+            report.imported += 1
+        except IntegrityError:
+            report.errors.append(py_schemas.ImportRowError(line=line, error="This username is already registered."))
+    await db.commit()
+
+
+async def _import_operations(
+    db: AsyncSession,
+    batch: List[Tuple[int, Dict[str, Any]]],
+    report: py_schemas.ImportReport,
+    on_deadline: Optional[Callable[[date], None]],
+) -> None:
+    valid: List[Tuple[int, str, py_schemas.OperationCreate]] = []
+    for line, record in batch:
+        try:
+            operator, data = _operation_data(record)
+        except ValueError as e:
+            report.errors.append(py_schemas.ImportRowError(line=line, error=str(e)))
+            continue
+        valid.append((line, operator, data))
+    if not valid:
+        return
+
+    # Operadores del lote con una sola consulta
+    result = await db.execute(
+        select(sql_models.User.username, sql_models.User.id, sql_models.User.role)
+        .where(sql_models.User.username.in_({operator for _, operator, _ in valid}))
+    )
+    operators = {username: (user_id, role) for username, user_id, role in result.all()}
+
+    now = datetime.now(timezone.utc)
+    rows = []
+    for line, operator, data in valid:
+        if operator not in operators:
+            report.errors.append(py_schemas.ImportRowError(line=line, error="Operator not found."))
+            continue
+        operator_id, role = operators[operator]
+        if role != "operador":
+            report.errors.append(py_schemas.ImportRowError(line=line, error="User is not an operator."))
+            continue
+        rows.append({
+            "operator_id": operator_id,
+            "amount_required": Decimal(str(data.amount_required)),
+            "interest_rate": data.interest_rate,
+            "deadline": data.deadline,
+            "amount_collected": Decimal(0),
+            "is_closed": False,
+            "created_at": now,
+        })
+    if not rows:
+        return
+
+    operator_ids = list({row["operator_id"] for row in rows})
+    operation = sql_models.Operation
+    stats = sql_models.OperationBidStats
+    await db.execute(insert(operation), rows)
+    # Estadísticas vacías para las operaciones nuevas (las de esos operadores que aún no tienen)
+    await db.execute(insert(stats).from_select(
+        ["operation_id"],
+        select(operation.id)
+        .outerjoin(stats, stats.operation_id == operation.id)
+        .where(operation.operator_id.in_(operator_ids), stats.operation_id.is_(None)),
+    ))
+    await crud._rebuild_operator_summaries(db, operator_ids)
+    await db.commit()
+    report.imported += len(rows)
+
+    operation_cache.invalidate_listings()
+    if on_deadline is not None:
+        for deadline in {row["deadline"] for row in rows}:
+            on_deadline(deadline)
+
+
+# Importa los registros por lotes de batch_size. hash_passwords recibe las contraseñas de un lote
+# y devuelve sus hashes (por defecto, el pool de procesos); on_deadline recibe las fechas límite
+# de las operaciones importadas para programar su cierre.
+async def import_records(
+    db: AsyncSession,
+    kind: str,
+    records: Iterable[Record],
+    batch_size: int = IMPORT_BATCH_SIZE,
+    hash_passwords: Optional[Callable[[List[str]], Awaitable[List[str]]]] = None,
+    on_deadline: Optional[Callable[[date], None]] = None,
+) -> py_schemas.ImportReport:
+    if kind not in IMPORT_KINDS:
+        raise ValueError(f"Unknown import: {kind}. Use one of: {', '.join(IMPORT_KINDS)}.")
+    if hash_passwords is None:
+        from services.hashing import bulk_password_hasher
+        hash_passwords = bulk_password_hasher.hash_many
+
+    report = py_schemas.ImportReport(kind=kind)
+    seen: Set[str] = set()
+    batch: List[Tuple[int, Dict[str, Any]]] = []
+
+    async def flush() -> None:
+        if kind == "users":
+            await _import_users(db, batch, report, seen, hash_passwords)
+        else:
+            await _import_operations(db, batch, report, on_deadline)
+        batch.clear()
+
+    for line, record, error in records:
+        report.rows += 1
+        if error is not None:
+            report.errors.append(py_schemas.ImportRowError(line=line, error=error))
+            continue
+        batch.append((line, record))
+        if len(batch) >= batch_size:
+            await flush()
+    if batch:
+        await flush()
+
+    report.errors.sort(key=lambda item: item.line)
+    return report
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m database.bulk_import", description="Import users or operations from CSV or JSONL.")
+    parser.add_argument("kind", choices=IMPORT_KINDS)
+    parser.add_argument("path", help="CSV (with header) or JSONL file")
+    parser.add_argument("--format", choices=IMPORT_FORMATS, help="default: inferred from the file extension")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE, help="rows validated and inserted per transaction")
+    args = parser.parse_args(argv)
+
+    async def run() -> py_schemas.ImportReport:
+        from database.database import SessionLocal, engine
+        from services.hashing import bulk_password_hasher
+        import_format = args.format or detect_format(args.path)
+        try:
+            with open(args.path, encoding="utf-8-sig", newline="") as file:
+                async with SessionLocal() as db:
+                    return await import_records(db, args.kind, read_records(file, import_format), args.batch_size)
+        finally:
+            bulk_password_hasher.shutdown()
+            await engine.dispose()
+
+    start = time.perf_counter()
+    try:
+        report = asyncio.run(run())
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(2)
+
+    for item in report.errors:
+        print(f"[line {item.line}] {item.error}")
+    print(
+        f"Imported {report.imported} of {report.rows} {args.kind} "
+        f"({len(report.errors)} errors) in {time.perf_counter() - start:.1f} s."
+    )
+    sys.exit(1 if report.errors else 0)
+
+
+if __name__ == "__main__":
+    main()
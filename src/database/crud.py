@@ -1,25 +1,38 @@
-from datetime import datetime, timezone
-from sqlalchemy import select, update
+from datetime import date, datetime, timedelta, timezone
+from sqlalchemy import select, update, insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List, Optional
-from sqlalchemy import String, and_
+from typing import AsyncIterator, List, Optional, Tuple
+from sqlalchemy import BigInteger, String, and_, or_, case, cast, delete, exists, tuple_, union_all
 from sqlalchemy.sql import func
 import uuid
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from fastapi import HTTPException, status
 from decimal import Decimal
 
 import database.sql_models as sql_models
 import models.py_schemas as py_schemas
+from services.hashing import get_pwd_context, password_hasher
+from services.principal_cache import principal_cache
+from services.operation_cache import operation_cache
+from services.operation_events import operation_events, EXPIRED
 
 
-# hash
-from passlib.context import CryptContext
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 # Function to generate a hash of a password
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
+
+
+# --- Fechas límite --- #
+# Una operación admite ofertas hasta el final del día (UTC) de su fecha límite y vence al
+# comenzar el día siguiente. Todas las consultas comparan la columna Date con la fecha de hoy.
+def utc_today() -> date:
+    return datetime.now(timezone.utc).date()
+
+def _not_expired(today: Optional[date] = None):
+    return sql_models.Operation.deadline >= (today or utc_today())
+
+def _expired(today: Optional[date] = None):
+    return sql_models.Operation.deadline < (today or utc_today())
 
 
 
@@ -30,7 +43,7 @@ async def create_user(db: AsyncSession, data: py_schemas.UserCreate) -> py_schem
         new_user = sql_models.User(
             id=str(uuid.uuid4()),
             username=data.username,
-            password_hash=get_password_hash(data.password),
+            password_hash=await password_hasher.hash(data.password),
             role=data.role,
             created_at=datetime.now(timezone.utc),
         )
@@ -47,7 +60,7 @@ async def create_operation(db: AsyncSession, data: py_schemas.OperationCreate, c
     try:
         # Asignar correctamente los datos de la operación
         new_operation = sql_models.Operation(
-            operator_id=current_user.id,  # El ID del operador que está creando la operación
+            operator_id=str(current_user.id),  # El ID del operador que está creando la operación
             amount_required=data.amount_required,  # Monto necesario
             interest_rate=data.interest_rate,  # Tasa de interés
             deadline=data.deadline,  # Fecha límite
@@ -56,31 +69,462 @@ async def create_operation(db: AsyncSession, data: py_schemas.OperationCreate, c
             created_at=datetime.now(timezone.utc),  # Fecha de creación
         )
         db.add(new_operation)
+        await db.flush()
+        # Estadísticas de ofertas vacías, que luego se actualizan con cada oferta
+        db.add(sql_models.OperationBidStats(operation_id=new_operation.id))
+        await _add_operation_to_summary(db, new_operation.operator_id, Decimal(str(data.amount_required)))
         await db.commit()
         await db.refresh(new_operation)
+        operation_cache.invalidate_listings()
         return new_operation
     except SQLAlchemyError as e:
         print(f"Error creating the operation: {str(e)}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}.")
 
 # Tabla de ofertas
-async def create_bid(db: AsyncSession, data: py_schemas.BidCreate, current_user: py_schemas.User) -> py_schemas.Bid:
+# Valores de una nueva oferta, compartidos por la creación individual y en lote
+def _bid_values(data: py_schemas.BidCreate, investor_id: str, bid_date: datetime) -> dict:
+    return {
+        "operation_id": data.operation_id,
+        "investor_id": str(investor_id),
+        "amount": Decimal(str(data.amount)),
+        "interest_rate": data.interest_rate,
+        "bid_date": bid_date,
+    }
+
+# --- Estadísticas de ofertas por operación --- #
+# Suma las ofertas de un inversor a las estadísticas de su operación. Debe llamarse en la misma
+# transacción y antes de insertar las ofertas: el UPDATE bloquea la fila de estadísticas, así que
+# la comprobación de si el inversor ya había ofertado queda serializada por operación.
+async def _add_bids_to_stats(db: AsyncSession, operation_id: int, investor_id: str, bids: List[Tuple[Decimal, float]]) -> None:
+    stats = sql_models.OperationBidStats
+    total = sum((amount for amount, _ in bids), Decimal(0))
+    weighted = sum((amount * Decimal(str(rate)) for amount, rate in bids), Decimal(0))
+    best = min(rate for _, rate in bids)
+
+    result = await db.execute(
+        update(stats)
+        .where(stats.operation_id == operation_id)
+        .values(
+            bid_count=stats.bid_count + len(bids),
+            total_amount=stats.total_amount + total,
+            weighted_rate_sum=stats.weighted_rate_sum + weighted,
+            best_rate=case((or_(stats.best_rate.is_(None), stats.best_rate > best), best), else_=stats.best_rate),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    await _add_to_operator_summary(
+        db, _operation_operator(operation_id), bid_count=len(bids), total_amount=total, weighted_rate_sum=weighted
+    )
+
+    # Lectura con bloqueo compartido para ver las ofertas confirmadas por otras transacciones
+    previous = await db.execute(
+        select(exists().where(
+            sql_models.Bid.operation_id == operation_id,
+            sql_models.Bid.investor_id == str(investor_id),
+        )).with_for_update(read=True)
+    )
+    new_investor = not previous.scalar()
+
+    if result.rowcount == 0:
+        await db.execute(insert(stats).values(
+            operation_id=operation_id,
+            bid_count=len(bids),
+            total_amount=total,
+            weighted_rate_sum=weighted,
+            best_rate=best,
+            distinct_investors=int(new_investor),
+        ))
+    elif new_investor:
+        await db.execute(
+            update(stats)
+            .where(stats.operation_id == operation_id)
+            .values(distinct_investors=stats.distinct_investors + 1)
+            .execution_options(synchronize_session=False)
+        )
+
+# La mejor tasa se recalcula con el índice (operation_id, interest_rate): es una sola búsqueda
+def _best_rate_query(operation_id: int):
+    return select(func.min(sql_models.Bid.interest_rate)).where(sql_models.Bid.operation_id == operation_id)
+
+# Resta una oferta de las estadísticas de su operación. Debe llamarse antes de eliminarla; las
+# comprobaciones que dependen de las ofertas restantes se hacen después de un flush.
+async def _remove_bid_from_stats(db: AsyncSession, bid: sql_models.Bid) -> None:
+    stats = sql_models.OperationBidStats
+    amount = Decimal(bid.amount)
+    weighted = amount * Decimal(str(bid.interest_rate))
+    await db.execute(
+        update(stats)
+        .where(stats.operation_id == bid.operation_id)
+        .values(
+            bid_count=stats.bid_count - 1,
+            total_amount=stats.total_amount - amount,
+            weighted_rate_sum=stats.weighted_rate_sum - weighted,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    await _add_to_operator_summary(
+        db, _operation_operator(bid.operation_id), bid_count=-1, total_amount=-amount, weighted_rate_sum=-weighted
+    )
+    await db.delete(bid)
+    await db.flush()
+
+    remaining = await db.execute(
+        select(exists().where(
+            sql_models.Bid.operation_id == bid.operation_id,
+            sql_models.Bid.investor_id == bid.investor_id,
+        ))
+    )
+    values = {"best_rate": _best_rate_query(bid.operation_id).scalar_subquery()}
+    if not remaining.scalar():
+        values["distinct_investors"] = stats.distinct_investors - 1
+    await db.execute(
+        update(stats)
+        .where(stats.operation_id == bid.operation_id)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+
+# Aplica a las estadísticas el cambio de monto o tasa de una oferta ya actualizada (tras un flush)
+async def _change_bid_in_stats(
+    db: AsyncSession, operation_id: int, old_amount: Decimal, old_rate: float, new_amount: Decimal, new_rate: float
+) -> None:
+    stats = sql_models.OperationBidStats
+    amount_delta = new_amount - old_amount
+    weighted_delta = new_amount * Decimal(str(new_rate)) - old_amount * Decimal(str(old_rate))
+    await db.execute(
+        update(stats)
+        .where(stats.operation_id == operation_id)
+        .values(
+            total_amount=stats.total_amount + amount_delta,
+            weighted_rate_sum=stats.weighted_rate_sum + weighted_delta,
+            best_rate=_best_rate_query(operation_id).scalar_subquery(),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    await _add_to_operator_summary(
+        db, _operation_operator(operation_id), total_amount=amount_delta, weighted_rate_sum=weighted_delta
+    )
+
+# Recalcula desde la tabla bids las estadísticas de las operaciones indicadas (o de todas).
+# Se usa tras cargas masivas que no pasan por las funciones de creación de ofertas.
+async def rebuild_operation_bid_stats(db: AsyncSession, operation_ids: Optional[List[int]] = None) -> None:
     try:
-        new_bid = sql_models.Bid(
-            operation_id =data.operation_id,
-            investor_id=current_user.id,
-            amount=data.amount,
-            interest_rate=data.interest_rate,
-            bid_date=datetime.now(timezone.utc),
+        stats = sql_models.OperationBidStats
+        query = (
+            select(
+                sql_models.Operation.id,
+                func.count(sql_models.Bid.id),
+                func.coalesce(func.sum(sql_models.Bid.amount), 0),
+                func.coalesce(func.sum(sql_models.Bid.amount * sql_models.Bid.interest_rate), 0),
+                func.min(sql_models.Bid.interest_rate),
+                func.count(sql_models.Bid.investor_id.distinct()),
+            )
+            .select_from(sql_models.Operation)
+            .outerjoin(sql_models.Bid, sql_models.Bid.operation_id == sql_models.Operation.id)
+            .group_by(sql_models.Operation.id)
         )
+        clear = delete(stats)
+        if operation_ids is not None:
+            query = query.where(sql_models.Operation.id.in_(operation_ids))
+            clear = clear.where(stats.operation_id.in_(operation_ids))
+
+        await db.execute(clear)
+        await db.execute(insert(stats).from_select(
+            ["operation_id", "bid_count", "total_amount", "weighted_rate_sum", "best_rate", "distinct_investors"],
+            query,
+        ))
+        await db.commit()
+    except SQLAlchemyError as e:
+        print(f"Error rebuilding the bid statistics: {str(e)}")
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}.")
+
+# --- Resumen de operaciones por operador --- #
+# operator_summaries guarda por operador los totales de su panel (operaciones, abiertas, monto
+# requerido, ofertas). Se mantiene en la misma transacción que cada cambio: las ofertas suman sus
+# deltas junto con operation_bid_stats, la creación de operaciones y el barrido de vencimientos
+# ajustan los contadores, y los cambios poco frecuentes (eliminar o editar una operación)
+# recalculan la fila del operador desde las tablas base. Cubre también las operaciones
+# archivadas: el archivo las mueve sin cambiar los totales.
+# operator_id puede ser el texto del operador o una subconsulta (ver _operation_operator)
+async def _add_to_operator_summary(db: AsyncSession, operator_id, **deltas) -> int:
+    summary = sql_models.OperatorSummary
+    result = await db.execute(
+        update(summary)
+        .where(summary.operator_id == operator_id)
+        .values(**{name: getattr(summary, name) + delta for name, delta in deltas.items()})
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+# Operador de una operación como subconsulta escalar, para actualizar su resumen sin leerlo antes
+def _operation_operator(operation_id: int):
+    return select(sql_models.Operation.operator_id).where(sql_models.Operation.id == operation_id).scalar_subquery()
+
+# Suma una operación nueva al resumen de su operador, creando la fila si es la primera
+async def _add_operation_to_summary(db: AsyncSession, operator_id: str, amount_required: Decimal) -> None:
+    deltas = {"operation_count": 1, "open_operations": 1, "amount_required": amount_required}
+    if await _add_to_operator_summary(db, operator_id, **deltas):
+        return
+    try:
+        async with db.begin_nested():
+            await db.execute(insert(sql_models.OperatorSummary).values(
+                operator_id=operator_id, bid_count=0, total_amount=0, weighted_rate_sum=0, **deltas
+            ))
+    except IntegrityError:
+        # Otra transacción creó la fila a la vez: sumar sobre ella
+        await _add_to_operator_summary(db, operator_id, **deltas)
+
+# Agregado por operador calculado desde las tablas operations y bids y desde el archivo, en el
+# orden de columnas de operator_summaries. Lo usan la reconstrucción y la comprobación de
+# consistencia. Cada par de tablas se agrega por separado (las ofertas solo se unen con las
+# operaciones de su misma tabla) y los dos resultados se suman por operador.
+OPERATOR_SUMMARY_COLUMNS = [
+    "operator_id", "operation_count", "open_operations", "amount_required", "bid_count", "total_amount", "weighted_rate_sum",
+]
+
+def _operator_summary_part(operation, bid, operator_ids: Optional[List[str]] = None):
+    bids = (
+        select(
+            bid.operation_id,
+            func.count(bid.id).label("bid_count"),
+            func.sum(bid.amount).label("total_amount"),
+            func.sum(bid.amount * bid.interest_rate).label("weighted_rate_sum"),
+        )
+        .group_by(bid.operation_id)
+    )
+    if operator_ids is not None:
+        bids = bids.join(operation, operation.id == bid.operation_id).where(operation.operator_id.in_(operator_ids))
+    bids = bids.subquery()
+
+    query = (
+        select(
+            operation.operator_id.label("operator_id"),
+            func.count(operation.id).label("operation_count"),
+            func.sum(case((operation.is_closed == False, 1), else_=0)).label("open_operations"),
+            func.sum(operation.amount_required).label("amount_required"),
+            func.coalesce(func.sum(bids.c.bid_count), 0).label("bid_count"),
+            func.coalesce(func.sum(bids.c.total_amount), 0).label("total_amount"),
+            func.coalesce(func.sum(bids.c.weighted_rate_sum), 0).label("weighted_rate_sum"),
+        )
+        .select_from(operation)
+        .outerjoin(bids, bids.c.operation_id == operation.id)
+        .group_by(operation.operator_id)
+    )
+    if operator_ids is not None:
+        query = query.where(operation.operator_id.in_(operator_ids))
+    return query
+
+def _operator_summary_query(operator_ids: Optional[List[str]] = None):
+    parts = union_all(
+        _operator_summary_part(sql_models.Operation, sql_models.Bid, operator_ids),
+        _operator_summary_part(sql_models.ArchivedOperation, sql_models.ArchivedBid, operator_ids),
+    ).subquery()
+    return (
+        select(parts.c.operator_id, *(func.sum(parts.c[name]) for name in OPERATOR_SUMMARY_COLUMNS[1:]))
+        .group_by(parts.c.operator_id)
+    )
+
+# Reemplaza las filas de los operadores indicados (o de todos) sin confirmar la transacción
+async def _rebuild_operator_summaries(db: AsyncSession, operator_ids: Optional[List[str]] = None) -> None:
+    summary = sql_models.OperatorSummary
+    clear = delete(summary)
+    if operator_ids is not None:
+        operator_ids = [str(operator_id) for operator_id in operator_ids]
+        clear = clear.where(summary.operator_id.in_(operator_ids))
+    await db.execute(clear)
+    await db.execute(insert(summary).from_select(OPERATOR_SUMMARY_COLUMNS, _operator_summary_query(operator_ids)))
+
+# Recalcula desde las tablas base el resumen de los operadores indicados (o de todos).
+# Se usa tras cargas masivas y desde `python -m database.summaries rebuild`.
+async def rebuild_operator_summaries(db: AsyncSession, operator_ids: Optional[List[str]] = None) -> None:
+    try:
+        await _rebuild_operator_summaries(db, operator_ids)
+        await db.commit()
+    except SQLAlchemyError as e:
+        print(f"Error rebuilding the operator summaries: {str(e)}")
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}.")
+
+async def create_bid(db: AsyncSession, data: py_schemas.BidCreate, current_user: py_schemas.User) -> py_schemas.Bid:
+    try:
+        new_bid = sql_models.Bid(**_bid_values(data, current_user.id, datetime.now(timezone.utc)))
+        await _add_bids_to_stats(db, new_bid.operation_id, new_bid.investor_id, [(new_bid.amount, new_bid.interest_rate)])
         db.add(new_bid)
         await db.commit()
         await db.refresh(new_bid)
+        operation_cache.invalidate_operation(new_bid.operation_id)
+        operation_events.notify(new_bid.operation_id)
         return new_bid
     except SQLAlchemyError as e:
         print(f"Error creating the bid: {str(e)}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}.")
 
+# Aceptación atómica de ofertas: reserva el cupo y crea la oferta en una sola transacción.
+# Devuelve None si la operación no admite la oferta (no existe, cerrada, vencida o sin cupo).
+async def accept_bid(db: AsyncSession, data: py_schemas.BidCreate, current_user: py_schemas.User) -> Optional[py_schemas.Bid]:
+    try:
+        amount = Decimal(str(data.amount))
+        now = datetime.now(timezone.utc)
+
+        # UPDATE condicional: la base de datos decide si hay cupo, sin leer la operación antes
+        result = await db.execute(
+            update(sql_models.Operation)
+            .where(
+                sql_models.Operation.id == data.operation_id,
+                sql_models.Operation.is_closed == False,
+                _not_expired(now.date()),
+                sql_models.Operation.amount_collected + amount <= sql_models.Operation.amount_required,
+            )
+            .values(amount_collected=sql_models.Operation.amount_collected + amount)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            await db.rollback()
+            return None
+
+        new_bid = sql_models.Bid(**_bid_values(data, current_user.id, now))
+        await _add_bids_to_stats(db, data.operation_id, new_bid.investor_id, [(amount, data.interest_rate)])
+        db.add(new_bid)
+        await db.flush()
+
+        # Se valida antes del commit para no necesitar un refresh posterior
+        bid = py_schemas.Bid.model_validate(new_bid)
+        await db.commit()
+        operation_cache.invalidate_operation(data.operation_id)
+        operation_events.notify(data.operation_id)
+        return bid
+    except SQLAlchemyError as e:
+        print(f"Error accepting the bid: {str(e)}")
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}.")
+
+# Valida un grupo de ofertas (de uno o varios inversores) en orden contra el cupo restante de
+# sus operaciones, reserva el cupo con una actualización condicional por operación y actualiza
+# sus estadísticas. Devuelve el motivo de rechazo de cada oferta (None si se acepta); no inserta
+# las ofertas ni confirma la transacción. Con lock_operations las operaciones se leen con
+# FOR UPDATE y la actualización no puede fallar por una escritura concurrente.
+async def _reserve_bids(
+    db: AsyncSession, items: List[Tuple[py_schemas.BidCreate, str]], today: date, lock_operations: bool = False
+) -> List[Optional[str]]:
+    operation_ids = {item.operation_id for item, _ in items}
+    query = select(
+        sql_models.Operation.id,
+        sql_models.Operation.amount_required,
+        sql_models.Operation.amount_collected,
+        sql_models.Operation.is_closed,
+        sql_models.Operation.deadline,
+    ).where(sql_models.Operation.id.in_(operation_ids))
+    if lock_operations:
+        query = query.order_by(sql_models.Operation.id).with_for_update()
+    result = await db.execute(query)
+    operations = {row.id: row for row in result}
+
+    available = {}
+    totals = {}
+    details = []
+    for item, _ in items:
+        operation = operations.get(item.operation_id)
+        detail = None
+        if operation is None:
+            detail = "Operation not found."
+        elif operation.is_closed:
+            detail = "Operation is closed"
+        elif today > operation.deadline:
+            detail = "Operation expired by date and time"
+        else:
+            amount = Decimal(str(item.amount))
+            if operation.id not in available:
+                available[operation.id] = Decimal(operation.amount_required) - Decimal(operation.amount_collected or 0)
+            if amount > available[operation.id]:
+                detail = "Amount of the bid exceeds the value"
+            else:
+                available[operation.id] -= amount
+                totals[operation.id] = totals.get(operation.id, Decimal(0)) + amount
+        details.append(detail)
+
+    # Una actualización condicional por operación; si otra transacción consumió el cupo
+    # entre la lectura y la escritura, se rechazan las ofertas de esa operación
+    for operation_id, total in totals.items():
+        update_result = await db.execute(
+            update(sql_models.Operation)
+            .where(
+                sql_models.Operation.id == operation_id,
+                sql_models.Operation.is_closed == False,
+                _not_expired(today),
+                sql_models.Operation.amount_collected + total <= sql_models.Operation.amount_required,
+            )
+            .values(amount_collected=sql_models.Operation.amount_collected + total)
+            .execution_options(synchronize_session=False)
+        )
+        if update_result.rowcount == 0:
+            for index, (item, _) in enumerate(items):
+                if details[index] is None and item.operation_id == operation_id:
+                    details[index] = "Operation changed concurrently, please retry"
+
+    # Estadísticas por operación e inversor, antes de insertar las ofertas
+    accepted = {}
+    for (item, investor_id), detail in zip(items, details):
+        if detail is None:
+            accepted.setdefault((item.operation_id, investor_id), []).append((Decimal(str(item.amount)), item.interest_rate))
+    for (operation_id, investor_id), bids in accepted.items():
+        await _add_bids_to_stats(db, operation_id, investor_id, bids)
+    return details
+
+# Creación de ofertas en lote: una consulta IN para validar, una actualización agregada
+# por operación y un único executemany para insertar las ofertas aceptadas.
+async def create_bids_batch(db: AsyncSession, items: List[py_schemas.BidCreate], current_user: py_schemas.User) -> List[py_schemas.BidBatchResult]:
+    try:
+        now = datetime.now(timezone.utc)
+        details = await _reserve_bids(db, [(item, str(current_user.id)) for item in items], now.date())
+        results = [
+            py_schemas.BidBatchResult(**item.model_dump(), index=index, accepted=detail is None, detail=detail)
+            for index, (item, detail) in enumerate(zip(items, details))
+        ]
+
+        accepted = [_bid_values(item, current_user.id, now) for item, detail in zip(items, details) if detail is None]
+        if accepted:
+            await db.execute(insert(sql_models.Bid), accepted)
+        await db.commit()
+        operation_ids = {values["operation_id"] for values in accepted}
+        operation_cache.invalidate_operation(*operation_ids)
+        for operation_id in operation_ids:
+            operation_events.notify(operation_id)
+        return results
+    except SQLAlchemyError as e:
+        print(f"Error creating the bids batch: {str(e)}")
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}.")
+
+# Escritura agrupada (group commit) de ofertas individuales de varios inversores: una sola
+# transacción con una actualización por operación y una inserción de todas las ofertas aceptadas
+# (multi-fila con RETURNING donde el dialecto lo permite). Devuelve, en el orden de la entrada,
+# la oferta creada o None si la operación no la admite, como accept_bid.
+async def accept_bids_group(db: AsyncSession, items: List[Tuple[py_schemas.BidCreate, str]]) -> List[Optional[py_schemas.Bid]]:
+    try:
+        now = datetime.now(timezone.utc)
+        details = await _reserve_bids(db, items, now.date(), lock_operations=True)
+        new_bids = [
+            sql_models.Bid(**_bid_values(item, investor_id, now)) if detail is None else None
+            for (item, investor_id), detail in zip(items, details)
+        ]
+        db.add_all([bid for bid in new_bids if bid is not None])
+        await db.flush()
+
+        # Se valida antes del commit para no necesitar un refresh posterior
+        results = [py_schemas.Bid.model_validate(bid) if bid is not None else None for bid in new_bids]
+        await db.commit()
+        operation_ids = {item.operation_id for (item, _), detail in zip(items, details) if detail is None}
+        operation_cache.invalidate_operation(*operation_ids)
+        for operation_id in operation_ids:
+            operation_events.notify(operation_id)
+        return results
+    except SQLAlchemyError as e:
+        print(f"Error accepting the bids group: {str(e)}")
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}.")
+
 
 
 # ----- READ -----
@@ -102,33 +546,326 @@ async def get_user_by_username(db: AsyncSession, username: str) -> Optional[py_s
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}.")
 
 # Tabla de operaciones
-async def get_operation_by_id(db: AsyncSession, operation_id: int) -> Optional[py_schemas.Operation]:
+# Si la operación no está en la tabla caliente se busca en el archivo (include_archive=False
+# para las rutas que la modifican)
+async def get_operation_by_id(db: AsyncSession, operation_id: int, include_archive: bool = True) -> Optional[py_schemas.Operation]:
     try:
         result = await db.execute(select(sql_models.Operation).filter(sql_models.Operation.id == operation_id))
-        return result.scalars().first()
+        operation = result.scalars().first()
+        if operation is None and include_archive:
+            result = await db.execute(select(sql_models.ArchivedOperation).filter(sql_models.ArchivedOperation.id == operation_id))
+            operation = result.scalars().first()
+        return operation
     except SQLAlchemyError as e:
         print(f"Error getting operation information: {str(e)}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}.")
     
-async def get_active_operations(db: AsyncSession) -> List[sql_models.Operation]:
+# Columnas que necesita py_schemas.Operation: consultarlas como filas evita construir entidades ORM
+OPERATION_COLUMNS = (
+    sql_models.Operation.id,
+    sql_models.Operation.operator_id,
+    sql_models.Operation.amount_required,
+    sql_models.Operation.interest_rate,
+    sql_models.Operation.deadline,
+    sql_models.Operation.amount_collected,
+    sql_models.Operation.is_closed,
+    sql_models.Operation.created_at,
+)
+
+def _active_operations_query(columns_only: bool = False):
+    entities = OPERATION_COLUMNS if columns_only else (sql_models.Operation,)
+    return select(*entities).where(
+        sql_models.Operation.is_closed == False,
+        _not_expired(),
+    )
+
+# Con columns_only=True devuelve filas con las columnas de OPERATION_COLUMNS en lugar de entidades
+async def get_active_operations(db: AsyncSession, columns_only: bool = False) -> List[sql_models.Operation]:
     try:
-        query = select(sql_models.Operation).where(
-            sql_models.Operation.is_closed == False, 
-            sql_models.Operation.deadline > datetime.now(timezone.utc)
-        )
+        query = _active_operations_query(columns_only)
         result = await db.execute(query)
-        operations = result.scalars().all()
+        operations = result.all() if columns_only else result.scalars().all()
         return operations
 
     except SQLAlchemyError as e:
         print(f"Error getting operation information: {str(e)}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}.")
 
+# Página de operaciones activas ordenadas por (deadline, id), a partir de la última fila entregada.
+# Devuelve también la clave de la última fila si quedan más resultados.
+async def get_active_operations_page(
+    db: AsyncSession, limit: int, after: Optional[Tuple[date, int]] = None, columns_only: bool = False
+) -> Tuple[List[sql_models.Operation], Optional[Tuple[date, int]]]:
+    try:
+        query = _active_operations_query(columns_only).order_by(sql_models.Operation.deadline, sql_models.Operation.id)
+        if after is not None:
+            after_deadline, after_id = after
+            query = query.where(or_(
+                sql_models.Operation.deadline > after_deadline,
+                and_(sql_models.Operation.deadline == after_deadline, sql_models.Operation.id > after_id),
+            ))
+        result = await db.execute(query.limit(limit + 1))
+        operations = result.all() if columns_only else result.scalars().all()
+
+        if len(operations) > limit:
+            operations = operations[:limit]
+            return operations, (operations[-1].deadline, operations[-1].id)
+        return operations, None
+
+    except SQLAlchemyError as e:
+        print(f"Error getting operation information: {str(e)}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}.")
+
+# Recorre las operaciones activas con un cursor del lado del servidor, en lotes de batch_size
+async def stream_active_operations(db: AsyncSession, batch_size: int = 1000) -> AsyncIterator[sql_models.Operation]:
+    try:
+        query = (
+            _active_operations_query()
+            .order_by(sql_models.Operation.deadline, sql_models.Operation.id)
+            .execution_options(yield_per=batch_size)
+        )
+        result = await db.stream(query)
+        async for operation in result.scalars():
+            yield operation
+
+    except SQLAlchemyError as e:
+        print(f"Error streaming operations: {str(e)}")
+        raise
+
+# Fechas límite distintas de las operaciones abiertas (para el programador de vencimientos)
+async def get_open_operation_deadlines(db: AsyncSession) -> List[date]:
+    try:
+        result = await db.execute(
+            select(sql_models.Operation.deadline)
+            .where(sql_models.Operation.is_closed == False)
+            .distinct()
+        )
+        return result.scalars().all()
+    except SQLAlchemyError as e:
+        print(f"Error getting operation deadlines: {str(e)}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}.")
+
 # Tabla de pujas
+# Página de ofertas de una operación ordenadas por (interest_rate, id), usando el índice
+# (operation_id, interest_rate). Devuelve también la clave de la última fila si quedan más.
+# Las ofertas de una operación archivada se leen de bids_archive, con el mismo orden y cursor
+async def get_operation_bids_page(
+    db: AsyncSession, operation_id: int, limit: int, after: Optional[Tuple[float, int]] = None
+) -> Tuple[List[sql_models.Bid], Optional[Tuple[float, int]]]:
+    try:
+        for model in (sql_models.Bid, sql_models.ArchivedBid):
+            query = (
+                select(model)
+                .where(model.operation_id == operation_id)
+                .order_by(model.interest_rate, model.id)
+            )
+            if after is not None:
+                after_rate, after_id = after
+                query = query.where(or_(
+                    model.interest_rate > after_rate,
+                    and_(model.interest_rate == after_rate, model.id > after_id),
+                ))
+            result = await db.execute(query.limit(limit + 1))
+            bids = result.scalars().all()
+            if bids:
+                break
+
+        if len(bids) > limit:
+            bids = bids[:limit]
+            return bids, (bids[-1].interest_rate, bids[-1].id)
+        return bids, None
+
+    except SQLAlchemyError as e:
+        print(f"Error getting bid information: {str(e)}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}.")
+
+# Cartera de un inversor: una página de sus ofertas (más recientes primero) con la operación de
+# cada una en la misma consulta mediante JOIN, sin consultas por oferta. Las ofertas archivadas
+# se leen de bids_archive y operations_archive: cada par de tablas aporta su página por el índice
+# (investor_id, bid_date) y la página final sale de unir las dos en una sola consulta.
+def _investor_positions_query(investor_id: str, archived: bool = False, after: Optional[Tuple[datetime, int]] = None):
+    bid, operation = (sql_models.ArchivedBid, sql_models.ArchivedOperation) if archived else (sql_models.Bid, sql_models.Operation)
+    query = (
+        select(
+            bid.id, bid.amount, bid.interest_rate, bid.bid_date,
+            operation.id.label("operation_id"),
+            operation.amount_required,
+            operation.amount_collected,
+            operation.interest_rate.label("operation_interest_rate"),
+            operation.deadline,
+            operation.is_closed,
+        )
+        .join(operation, operation.id == bid.operation_id)
+        .where(bid.investor_id == investor_id)
+        .order_by(bid.bid_date.desc(), bid.id.desc())
+    )
+    if after is not None:
+        after_date, after_id = after
+        query = query.where(or_(bid.bid_date < after_date, and_(bid.bid_date == after_date, bid.id < after_id)))
+    return query
+
+async def get_investor_positions_page(
+    db: AsyncSession, investor_id: str, limit: int, after: Optional[Tuple[datetime, int]] = None
+) -> Tuple[List[dict], Optional[Tuple[datetime, int]]]:
+    try:
+        pages = union_all(*(
+            select(_investor_positions_query(investor_id, archived, after).limit(limit + 1).subquery())
+            for archived in (False, True)
+        )).subquery()
+        result = await db.execute(select(pages).order_by(pages.c.bid_date.desc(), pages.c.id.desc()).limit(limit + 1))
+        rows = result.all()
+
+        positions = [{
+            "id": row.id,
+            "amount": row.amount,
+            "interest_rate": row.interest_rate,
+            "bid_date": row.bid_date,
+            "operation": {
+                "id": row.operation_id,
+                "amount_required": row.amount_required,
+                "amount_collected": row.amount_collected,
+                "interest_rate": row.operation_interest_rate,
+                "deadline": row.deadline,
+                "is_closed": row.is_closed,
+            },
+        } for row in rows[:limit]]
+        if len(rows) > limit:
+            return positions, (positions[-1]["bid_date"], positions[-1]["id"])
+        return positions, None
+
+    except SQLAlchemyError as e:
+        print(f"Error getting the portfolio positions: {str(e)}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}.")
+
+# Totales de la cartera en una sola consulta agregada, sumando las ofertas archivadas. Una
+# operación cuenta como cerrada si está marcada como cerrada o si ya pasó su fecha límite aunque
+# el barrido aún no la haya cerrado; las archivadas siempre están cerradas.
+def _portfolio_totals_part(investor_id: str, archived: bool):
+    bid, operation = (sql_models.ArchivedBid, sql_models.ArchivedOperation) if archived else (sql_models.Bid, sql_models.Operation)
+    closed = operation.is_closed == True if archived else or_(operation.is_closed == True, _expired())
+    return (
+        select(
+            func.count(bid.id).label("bid_count"),
+            func.coalesce(func.sum(bid.amount), 0).label("committed"),
+            func.coalesce(func.sum(bid.amount * bid.interest_rate), 0).label("weighted_rate_sum"),
+            func.coalesce(func.sum(case((closed, bid.amount), else_=0)), 0).label("closed_amount"),
+        )
+        .select_from(bid)
+        .join(operation, operation.id == bid.operation_id)
+        .where(bid.investor_id == investor_id)
+    )
+
+async def get_investor_portfolio_totals(db: AsyncSession, investor_id: str) -> py_schemas.PortfolioTotals:
+    try:
+        parts = union_all(_portfolio_totals_part(investor_id, False), _portfolio_totals_part(investor_id, True)).subquery()
+        result = await db.execute(select(*(func.coalesce(func.sum(column), 0) for column in parts.c)))
+        bid_count, committed, weighted_rate_sum, closed_amount = result.one()
+        committed = Decimal(committed)
+        closed_amount = Decimal(closed_amount)
+        return py_schemas.PortfolioTotals(
+            bid_count=bid_count,
+            committed_amount=committed,
+            average_interest_rate=float(Decimal(weighted_rate_sum) / committed) if committed else None,
+            open_exposure=committed - closed_amount,
+            closed_exposure=closed_amount,
+        )
+
+    except SQLAlchemyError as e:
+        print(f"Error getting the portfolio totals: {str(e)}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}.")
+
+# Panel del operador: una página de sus operaciones (más recientes primero, con el índice
+# (operator_id, id)) junto con las estadísticas de ofertas de cada una en la misma consulta. Las
+# operaciones archivadas conservan sus estadísticas y se unen a la página igual que en la cartera.
+OPERATOR_OPERATION_COLUMNS = [column.name for column in sql_models.Operation.__table__.c]
+
+def _operator_operations_query(operator_id: str, archived: bool = False, after: Optional[int] = None):
+    operation = sql_models.ArchivedOperation if archived else sql_models.Operation
+    stats = sql_models.OperationBidStats
+    query = (
+        select(
+            *(getattr(operation, name) for name in OPERATOR_OPERATION_COLUMNS),
+            stats.bid_count, stats.total_amount, stats.weighted_rate_sum, stats.best_rate,
+        )
+        .outerjoin(stats, stats.operation_id == operation.id)
+        .where(operation.operator_id == operator_id)
+        .order_by(operation.id.desc())
+    )
+    if after is not None:
+        query = query.where(operation.id < after)
+    return query
+
+async def get_operator_operations_page(
+    db: AsyncSession, operator_id: str, limit: int, after: Optional[int] = None
+) -> Tuple[List[py_schemas.OperatorOperation], Optional[int]]:
+    try:
+        pages = union_all(*(
+            select(_operator_operations_query(operator_id, archived, after).limit(limit + 1).subquery())
+            for archived in (False, True)
+        )).subquery()
+        result = await db.execute(select(pages).order_by(pages.c.id.desc()).limit(limit + 1))
+        rows = result.mappings().all()
+
+        operations = []
+        for row in rows[:limit]:
+            total = Decimal(row["total_amount"] or 0)
+            operations.append(py_schemas.OperatorOperation.model_validate({
+                **row,
+                "bid_count": row["bid_count"] or 0,
+                "average_interest_rate": float(Decimal(row["weighted_rate_sum"]) / total) if total else None,
+                "best_interest_rate": row["best_rate"],
+            }))
+        return operations, operations[-1].id if len(rows) > limit else None
+
+    except SQLAlchemyError as e:
+        print(f"Error getting the operator operations: {str(e)}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}.")
+
+# Totales del panel leídos de operator_summaries: una búsqueda por clave primaria
+async def get_operator_summary(db: AsyncSession, operator_id: str) -> py_schemas.OperatorSummary:
+    try:
+        result = await db.execute(
+            select(sql_models.OperatorSummary).where(sql_models.OperatorSummary.operator_id == operator_id)
+        )
+        summary = result.scalars().first()
+        if summary is None:
+            return py_schemas.OperatorSummary()
+
+        amount_required = Decimal(summary.amount_required)
+        total = Decimal(summary.total_amount)
+        return py_schemas.OperatorSummary(
+            operation_count=summary.operation_count,
+            open_operations=summary.open_operations,
+            closed_operations=summary.operation_count - summary.open_operations,
+            amount_required=amount_required,
+            bid_count=summary.bid_count,
+            amount_bid=total,
+            funding_percentage=float(total * 100 / amount_required) if amount_required else 0.0,
+            average_interest_rate=float(Decimal(summary.weighted_rate_sum) / total) if total else None,
+        )
+
+    except SQLAlchemyError as e:
+        print(f"Error getting the operator summary: {str(e)}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}.")
+
+async def get_operation_bid_stats(db: AsyncSession, operation_id: int) -> Optional[sql_models.OperationBidStats]:
+    try:
+        result = await db.execute(
+            select(sql_models.OperationBidStats).where(sql_models.OperationBidStats.operation_id == operation_id)
+        )
+        return result.scalars().first()
+    except SQLAlchemyError as e:
+        print(f"Error getting bid statistics: {str(e)}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}.")
+
 async def get_bid_by_id(db: AsyncSession, bid_id: int) -> Optional[py_schemas.Bid]:
     try:
         result = await db.execute(select(sql_models.Bid).filter(sql_models.Bid.id == bid_id))
-        return result.scalars().first()
+        bid = result.scalars().first()
+        if bid is None:
+            result = await db.execute(select(sql_models.ArchivedBid).filter(sql_models.ArchivedBid.id == bid_id))
+            bid = result.scalars().first()
+        return bid
     except SQLAlchemyError as e:
         print(f"Error getting bid information: {str(e)}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}.")
@@ -143,8 +880,10 @@ async def delete_user_by_id(db: AsyncSession, user_id: str) -> bool:
         user = result.scalars().first()
         if user is None:
             return False
+        username = user.username
         await db.delete(user)
         await db.commit()
+        principal_cache.invalidate(username)
         return True
     except SQLAlchemyError as e:
         print(f"Error deleting user: {str(e)}")
@@ -157,8 +896,14 @@ async def delete_operation_by_id(db: AsyncSession, operation_id: int) -> bool:
         operation = result.scalars().first()
         if operation is None:
             return False
+        operator_id = operation.operator_id
         await db.delete(operation)
+        await db.execute(delete(sql_models.OperationBidStats).where(sql_models.OperationBidStats.operation_id == operation_id))
+        await db.flush()
+        await _rebuild_operator_summaries(db, [operator_id])
         await db.commit()
+        operation_cache.invalidate_operation(operation_id)
+        operation_events.notify(operation_id)
         return True
     except SQLAlchemyError as e:
         print(f"Error deleting operation: {str(e)}")
@@ -167,11 +912,12 @@ async def delete_operation_by_id(db: AsyncSession, operation_id: int) -> bool:
 # Tabla de pujas
 async def delete_bid_by_id(db: AsyncSession, bid_id: int) -> bool:
     try:
-        result = await db.execute(select(sql_models.Bid).filter(sql_models.Bid.id == bid_id))
+        # Bloquear la oferta antes que las estadísticas, en el mismo orden que patch_bid
+        result = await db.execute(select(sql_models.Bid).filter(sql_models.Bid.id == bid_id).with_for_update())
         bid = result.scalars().first()
         if bid is None:
             return False
-        await db.delete(bid)
+        await _remove_bid_from_stats(db, bid)
         await db.commit()
         return True
     except SQLAlchemyError as e:
@@ -187,9 +933,11 @@ async def update_user_by_id(db: AsyncSession, user_id: int, property_name: str,
         result = await db.execute(select(sql_models.User).filter(sql_models.User.id == user_id))
         user = result.scalars().first()
         if user and hasattr(user, property_name):
+            username = user.username
             setattr(user, property_name, value)
             await db.commit()
             await db.refresh(user)
+            principal_cache.invalidate(username, user.username)
             return True
         return False
     except SQLAlchemyError as e:
@@ -202,9 +950,18 @@ async def update_operation_by_id(db: AsyncSession, operation_id: int, property_n
         result = await db.execute(select(sql_models.Operation).filter(sql_models.Operation.id == operation_id))
         operation = result.scalars().first()
         if operation and hasattr(operation, property_name):
+            operator_id = operation.operator_id
             setattr(operation, property_name, value)
+            if property_name == "is_closed":
+                operation.closed_at = _utc_now() if operation.is_closed else None
+            # Cambios en los campos del resumen: recalcular el operador (y el nuevo, si cambia)
+            if property_name in ("operator_id", "amount_required", "is_closed"):
+                await db.flush()
+                await _rebuild_operator_summaries(db, list({operator_id, str(operation.operator_id)}))
             await db.commit()
             await db.refresh(operation)
+            operation_cache.invalidate_operation(operation_id)
+            operation_events.notify(operation_id)
             return True
         return False
     except SQLAlchemyError as e:
@@ -217,7 +974,16 @@ async def update_bid_by_id(db: AsyncSession, bid_id: int, property_name: str, va
         result = await db.execute(select(sql_models.Bid).filter(sql_models.Bid.id == bid_id))
         bid = result.scalars().first()
         if bid and hasattr(bid, property_name):
-            setattr(bid, property_name, value)
+            # Mantener las estadísticas de la operación si cambia el monto o la tasa
+            if property_name in ("amount", "interest_rate"):
+                old_amount, old_rate = Decimal(bid.amount), bid.interest_rate
+                setattr(bid, property_name, value)
+                await db.flush()
+                await _change_bid_in_stats(
+                    db, bid.operation_id, old_amount, old_rate, Decimal(str(bid.amount)), float(bid.interest_rate)
+                )
+            else:
+                setattr(bid, property_name, value)
             await db.commit()
             await db.refresh(bid)
             return True
@@ -227,6 +993,142 @@ async def update_bid_by_id(db: AsyncSession, bid_id: int, property_name: str, va
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}.")
 
 
+# --- Actualizaciones parciales (PATCH) --- #
+# Campos enviados en un esquema de actualización (los omitidos o nulos no se modifican)
+def _patch_values(data) -> dict:
+    return data.model_dump(exclude_unset=True, exclude_none=True)
+
+# Ejecuta un UPDATE y devuelve la fila resultante: con RETURNING si el dialecto lo soporta
+# (SQLite, PostgreSQL) y si no (MySQL) con un SELECT por clave primaria en la misma transacción.
+# Devuelve None si ninguna fila cumplió las condiciones.
+async def _update_returning(db: AsyncSession, model, key, values: dict, *conditions):
+    statement = (
+        update(model)
+        .where(key, *conditions)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    columns = model.__table__.c
+    if db.bind.dialect.update_returning:
+        result = await db.execute(statement.returning(*columns))
+        return result.first()
+    result = await db.execute(statement)
+    if result.rowcount == 0:
+        return None
+    result = await db.execute(select(*columns).where(key))
+    return result.first()
+
+# Tabla de usuarios
+async def patch_user(db: AsyncSession, user_id: str, data: py_schemas.UserUpdate) -> Optional[py_schemas.User]:
+    values = _patch_values(data)
+    password = values.pop("password", None)
+    if password is not None:
+        values["password_hash"] = await password_hasher.hash(password)
+    try:
+        row = await _update_returning(db, sql_models.User, sql_models.User.id == str(user_id), values)
+        user = py_schemas.User.model_validate(row) if row is not None else None
+        await db.commit()
+        # El cambio puede afectar al usuario cacheado con su nombre anterior
+        principal_cache.invalidate_user(user_id)
+        return user
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="This username is already registered.")
+    except SQLAlchemyError as e:
+        print(f"Error updating user information: {str(e)}")
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}.")
+
+# Tabla de operaciones
+# Solo la actualiza su operador, y el monto requerido no puede quedar por debajo del recaudado.
+# Devuelve None si la operación no cumple esas condiciones (o no existe).
+async def patch_operation(
+    db: AsyncSession, operation_id: int, data: py_schemas.OperationUpdate, current_user: py_schemas.User
+) -> Optional[py_schemas.Operation]:
+    values = _patch_values(data)
+    conditions = [sql_models.Operation.operator_id == str(current_user.id)]
+    if "amount_required" in values:
+        values["amount_required"] = Decimal(str(values["amount_required"]))
+        conditions.append(sql_models.Operation.amount_collected <= values["amount_required"])
+    if "is_closed" in values:
+        values["closed_at"] = _utc_now() if values["is_closed"] else None
+    try:
+        row = await _update_returning(db, sql_models.Operation, sql_models.Operation.id == operation_id, values, *conditions)
+        operation = py_schemas.Operation.model_validate(row) if row is not None else None
+        if operation is not None and ("amount_required" in values or "is_closed" in values):
+            await _rebuild_operator_summaries(db, [str(current_user.id)])
+        await db.commit()
+        if operation is not None:
+            operation_cache.invalidate_operation(operation_id)
+            operation_events.notify(operation_id)
+        return operation
+    except SQLAlchemyError as e:
+        print(f"Error updating operation information: {str(e)}")
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}.")
+
+# Tabla de pujas
+# Solo la actualiza su inversor y mientras la operación admita ofertas; un cambio de monto
+# ajusta amount_collected con el mismo UPDATE condicional que la aceptación de ofertas.
+# Devuelve None si la oferta no cumple esas condiciones (o no existe).
+async def patch_bid(
+    db: AsyncSession, bid_id: int, data: py_schemas.BidUpdate, current_user: py_schemas.User
+) -> Optional[py_schemas.Bid]:
+    values = _patch_values(data)
+    try:
+        # Los valores anteriores son necesarios para ajustar la operación y las estadísticas
+        result = await db.execute(
+            select(
+                sql_models.Bid.operation_id,
+                sql_models.Bid.amount,
+                sql_models.Bid.interest_rate,
+                sql_models.Bid.bid_date,
+            )
+            .where(sql_models.Bid.id == bid_id, sql_models.Bid.investor_id == str(current_user.id))
+            .with_for_update()
+        )
+        old = result.first()
+        if old is None:
+            await db.rollback()
+            return None
+
+        old_amount = Decimal(old.amount)
+        new_amount = Decimal(str(values["amount"])) if "amount" in values else old_amount
+        new_rate = values.get("interest_rate", old.interest_rate)
+        delta = new_amount - old_amount
+
+        result = await db.execute(
+            update(sql_models.Operation)
+            .where(
+                sql_models.Operation.id == old.operation_id,
+                sql_models.Operation.is_closed == False,
+                _not_expired(),
+                sql_models.Operation.amount_collected + delta <= sql_models.Operation.amount_required,
+            )
+            .values(amount_collected=sql_models.Operation.amount_collected + delta)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            await db.rollback()
+            return None
+
+        await db.execute(
+            update(sql_models.Bid)
+            .where(sql_models.Bid.id == bid_id)
+            .values(amount=new_amount, interest_rate=new_rate)
+            .execution_options(synchronize_session=False)
+        )
+        await _change_bid_in_stats(db, old.operation_id, old_amount, old.interest_rate, new_amount, new_rate)
+        await db.commit()
+        operation_cache.invalidate_operation(old.operation_id)
+        operation_events.notify(old.operation_id)
+        return py_schemas.Bid(id=bid_id, amount=float(new_amount), interest_rate=new_rate, bid_date=old.bid_date)
+    except SQLAlchemyError as e:
+        print(f"Error updating bid information: {str(e)}")
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}.")
+
+
 async def update_operation_amount_collected(db: AsyncSession, operation_id: int, bid_amount: Decimal) -> None:
     try:
         # Obtener la operación
@@ -246,6 +1148,8 @@ async def update_operation_amount_collected(db: AsyncSession, operation_id: int,
             .values(amount_collected=new_amount_collected)
         )
         await db.commit()
+        operation_cache.invalidate_operation(operation_id)
+        operation_events.notify(operation_id)
 
     except SQLAlchemyError as e:
         print(f"Error updating the operation's amount_collected: {str(e)}")
@@ -257,25 +1161,325 @@ async def update_operation_amount_collected(db: AsyncSession, operation_id: int,
         raise e
     
 
-async def update_expired_operations(db: AsyncSession) -> bool:
+# Cierra las operaciones vencidas con UPDATE por lotes de chunk_size filas, cada lote en su
+# propia transacción corta. Las filas se bloquean con SKIP LOCKED, así que varios workers pueden
+# ejecutar el barrido a la vez sin cerrar dos veces la misma operación. Devuelve cuántas cerró.
+# Con settle=True asigna las ofertas de cada operación cerrada (ver settle_operation) en la misma
+# transacción que la cierra: si la asignación falla, el lote se deshace y sigue abierto y
+# vencido, así que el siguiente barrido lo vuelve a cerrar y asignar.
+async def update_expired_operations(db: AsyncSession, chunk_size: int = 500, settle: bool = False) -> int:
     try:
-        # Seleccionar todas las operaciones que aún no están cerradas y cuya fecha límite ha pasado
-        result = await db.execute(select(sql_models.Operation).where(
-            sql_models.Operation.is_closed == False,
-            sql_models.Operation.deadline <= datetime.now(timezone.utc)
-        ))
-        
-        expired_operations = result.scalars().all()
+        closed = 0
+        operation = sql_models.Operation
+        while True:
+            # Seleccionar un lote de operaciones abiertas cuya fecha límite ya pasó
+            result = await db.execute(
+                select(operation.id)
+                .where(operation.is_closed == False, _expired())
+                .order_by(operation.id)
+                .limit(chunk_size)
+                .with_for_update(skip_locked=True)
+            )
+            operation_ids = result.scalars().all()
+            if not operation_ids:
+                break
+
+            # Cerrar el lote completo con una sola sentencia. Solo cuentan (y se notifican) las
+            # operaciones que cerró esta sentencia: con RETURNING las devuelve el propio UPDATE; sin
+            # él (MySQL) las filas del lote están bloqueadas por esta transacción (FOR UPDATE), así
+            # que el UPDATE cambia exactamente las que se leen abiertas antes de ejecutarlo.
+            close = (
+                update(operation)
+                .where(operation.id.in_(operation_ids), operation.is_closed == False)
+                .values(is_closed=True, closed_at=_utc_now())
+                .execution_options(synchronize_session=False)
+            )
+            if db.get_bind().dialect.update_returning:
+                rows = (await db.execute(close.returning(operation.id, operation.operator_id))).all()
+            else:
+                rows = (await db.execute(
+                    select(operation.id, operation.operator_id)
+                    .where(operation.id.in_(operation_ids), operation.is_closed == False)
+                )).all()
+                await db.execute(close)
+            closed_ids = [row.id for row in rows]
+
+            # Las operaciones cerradas dejan de contar como abiertas en el resumen de su operador
+            per_operator = {}
+            for row in rows:
+                per_operator[row.operator_id] = per_operator.get(row.operator_id, 0) + 1
+            for operator_id, count in per_operator.items():
+                await _add_to_operator_summary(db, operator_id, open_operations=-count)
+            if settle:
+                for operation_id in closed_ids:
+                    await _allocate_operation(db, operation_id)
 
-        # Actualizar el estado de cada operación para cerrarla
-        for operation in expired_operations:
-            operation.is_closed = True
             await db.commit()
-            await db.refresh(operation)
+            closed += len(closed_ids)
+            operation_cache.invalidate_operation(*closed_ids)
+            for operation_id in closed_ids:
+                operation_events.notify(operation_id, EXPIRED)
 
-        return True
+            if len(operation_ids) < chunk_size:
+                break
+
+        return closed
 
     except SQLAlchemyError as e:
         print(f"Error updating expired operations: {str(e)}")
         await db.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}")
+
+
+# Asigna el monto requerido de una operación entre sus ofertas (menor tasa primero, prorrateo en
+# la tasa marginal) y guarda en allocations las ofertas ganadoras. Es idempotente: reemplaza la
+# asignación anterior de la operación. Devuelve cuántas ofertas recibieron algún monto.
+ALLOCATION_INSERT_CHUNK = 10000
+
+async def settle_operation(db: AsyncSession, operation_id: int) -> int:
+    try:
+        allocated = await _allocate_operation(db, operation_id)
+        await db.commit()
+        return allocated
+
+    except SQLAlchemyError as e:
+        print(f"Error settling operation {operation_id}: {str(e)}")
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}")
+
+# Reemplaza la asignación guardada de la operación sin confirmar la transacción
+async def _allocate_operation(db: AsyncSession, operation_id: int) -> int:
+    # numpy solo se carga cuando se asigna la primera operación
+    import numpy as np
+    from services.allocation import allocate
+
+    result = await db.execute(
+        select(sql_models.Operation.amount_required).where(sql_models.Operation.id == operation_id)
+    )
+    amount_required = result.scalar_one_or_none()
+    if amount_required is None:
+        return 0
+
+    # Montos en centavos calculados por la base de datos, sin crear objetos Decimal por fila
+    result = await db.execute(
+        select(
+            sql_models.Bid.id,
+            sql_models.Bid.investor_id,
+            cast(func.round(sql_models.Bid.amount * 100), BigInteger),
+            sql_models.Bid.interest_rate,
+        ).where(sql_models.Bid.operation_id == operation_id)
+    )
+    rows = result.all()
+    bid_ids, investor_ids, amounts, rates = zip(*rows) if rows else ((), (), (), ())
+    bid_ids = np.array(bid_ids, dtype=np.int64)
+    allocated = allocate(
+        bid_ids,
+        np.array(amounts, dtype=np.int64),
+        np.array(rates, dtype=np.float64),
+        int(Decimal(amount_required) * 100),
+    )
+
+    await db.execute(delete(sql_models.Allocation).where(sql_models.Allocation.operation_id == operation_id))
+    winners = np.flatnonzero(allocated).tolist()
+    allocated_ids = bid_ids.tolist()
+    allocated_cents = allocated.tolist()
+    for start in range(0, len(winners), ALLOCATION_INSERT_CHUNK):
+        await db.execute(insert(sql_models.Allocation), [{
+            "operation_id": operation_id,
+            "bid_id": allocated_ids[index],
+            "investor_id": investor_ids[index],
+            "interest_rate": rates[index],
+            "amount_allocated": Decimal(allocated_cents[index]).scaleb(-2),
+        } for index in winners[start:start + ALLOCATION_INSERT_CHUNK]])
+    return len(winners)
+
+
+# --- Archivo de operaciones cerradas --- #
+# Mueve a operations_archive y bids_archive las operaciones cerradas hace más de `retention`,
+# con sus ofertas, en lotes de batch_size operaciones. Cada lote es una transacción corta que
+# copia y borra las operaciones; si el proceso se interrumpe, el lote en curso se deshace y la
+# siguiente ejecución continúa por donde quedó. Las filas se bloquean con SKIP LOCKED, así que
+# varios workers pueden archivar a la vez. Las estadísticas de ofertas, las asignaciones y el
+# resumen del operador (que ya cuenta el archivo) no cambian. Devuelve cuántas movió.
+OPERATION_ARCHIVE_COLUMNS = [
+    "id", "operator_id", "amount_required", "interest_rate", "deadline", "amount_collected", "is_closed", "created_at", "closed_at",
+]
+BID_ARCHIVE_COLUMNS = ["id", "operation_id", "investor_id", "amount", "interest_rate", "bid_date"]
+
+# MySQL antes de 8.0 no guarda el contador AUTO_INCREMENT: al reiniciar lo recalcula como
+# MAX(id) + 1 y volvería a entregar el id de la última operación u oferta si se archivaran.
+# SQLite usa AUTOINCREMENT (migración 0009) y MySQL 8 persiste el contador.
+def _reuses_max_ids(dialect) -> bool:
+    return dialect.name == "mysql" and (dialect.server_version_info or (0,)) < (8,)
+
+# Operaciones cerradas antes de `cutoff`, en el orden del índice (is_closed, closed_at). Con
+# keep_max_ids (ver _reuses_max_ids) la última operación y la de la última oferta se quedan en
+# las tablas calientes.
+def _archivable_operations_query(cutoff: datetime, keep_max_ids: bool = False):
+    operation, bid = sql_models.Operation, sql_models.Bid
+    query = (
+        select(operation.id)
+        .where(operation.is_closed == True, operation.closed_at <= cutoff)
+        .order_by(operation.closed_at, operation.id)
+    )
+    if keep_max_ids:
+        query = query.where(
+            operation.id < select(func.max(operation.id)).scalar_subquery(),
+            operation.id != func.coalesce(
+                select(bid.operation_id).where(bid.id == select(func.max(bid.id)).scalar_subquery()).scalar_subquery(), 0
+            ),
+        )
+    return query
+
+async def archive_closed_operations(
+    db: AsyncSession, retention: timedelta, batch_size: int = 200, max_batches: Optional[int] = None
+) -> int:
+    operation, bid = sql_models.Operation, sql_models.Bid
+    cutoff = _utc_now() - retention
+    try:
+        archived = 0
+        batches = 0
+        keep_max_ids = _reuses_max_ids((await db.connection()).dialect)
+        while max_batches is None or batches < max_batches:
+            result = await db.execute(
+                _archivable_operations_query(cutoff, keep_max_ids).limit(batch_size).with_for_update(skip_locked=True)
+            )
+            operation_ids = result.scalars().all()
+            if not operation_ids:
+                break
+
+            await db.execute(insert(sql_models.ArchivedOperation).from_select(
+                OPERATION_ARCHIVE_COLUMNS,
+                select(*(getattr(operation, name) for name in OPERATION_ARCHIVE_COLUMNS)).where(operation.id.in_(operation_ids)),
+            ))
+            await db.execute(insert(sql_models.ArchivedBid).from_select(
+                BID_ARCHIVE_COLUMNS,
+                select(*(getattr(bid, name) for name in BID_ARCHIVE_COLUMNS)).where(bid.operation_id.in_(operation_ids)),
+            ))
+            await db.execute(delete(bid).where(bid.operation_id.in_(operation_ids)))
+            await db.execute(delete(operation).where(operation.id.in_(operation_ids)))
+            await db.commit()
+
+            archived += len(operation_ids)
+            batches += 1
+            if len(operation_ids) < batch_size:
+                break
+
+        return archived
+
+    except SQLAlchemyError as e:
+        print(f"Error archiving closed operations: {str(e)}")
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}")
+
+# Operaciones y ofertas en las tablas calientes y en el archivo
+async def get_archive_status(db: AsyncSession) -> dict:
+    try:
+        counts = {}
+        for name, model in (
+            ("operations", sql_models.Operation),
+            ("bids", sql_models.Bid),
+            ("archived_operations", sql_models.ArchivedOperation),
+            ("archived_bids", sql_models.ArchivedBid),
+        ):
+            counts[name] = (await db.execute(select(func.count()).select_from(model))).scalar()
+        return counts
+    except SQLAlchemyError as e:
+        print(f"Error getting the archive status: {str(e)}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}.")
+
+
+# --- Claves de idempotencia --- #
+# Las fechas se guardan en UTC sin zona horaria, igual en MySQL y en SQLite
+def _utc_now() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+# Reserva la clave dentro de la transacción de `db`, antes de la escritura que protege: se
+# confirma con ella o desaparece con su rollback. Si otra transacción ya insertó la misma clave,
+# la base de datos espera a que termine y la inserción falla con IntegrityError. Devuelve None si
+# la clave quedó reservada o la fila existente (ya confirmada) si no. Una clave vencida se reutiliza.
+async def claim_idempotency_key(
+    db: AsyncSession, user_id: str, key: str, fingerprint: str, ttl_seconds: int
+) -> Optional[sql_models.IdempotencyKey]:
+    try:
+        existing = None
+        for _ in range(2):
+            now = _utc_now()
+            db.add(sql_models.IdempotencyKey(
+                user_id=user_id, key=key, fingerprint=fingerprint, expires_at=now + timedelta(seconds=ttl_seconds)
+            ))
+            try:
+                await db.flush()
+                return None
+            except IntegrityError:
+                await db.rollback()
+
+            existing = await get_idempotency_key(db, user_id, key)
+            if existing is not None and existing.expires_at > now:
+                return existing
+            await db.execute(
+                delete(sql_models.IdempotencyKey).where(
+                    sql_models.IdempotencyKey.user_id == user_id,
+                    sql_models.IdempotencyKey.key == key,
+                    sql_models.IdempotencyKey.expires_at <= now,
+                )
+            )
+            await db.commit()
+        return existing
+    except SQLAlchemyError as e:
+        print(f"Error claiming the idempotency key: {str(e)}")
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}.")
+
+async def get_idempotency_key(db: AsyncSession, user_id: str, key: str) -> Optional[sql_models.IdempotencyKey]:
+    result = await db.execute(
+        select(sql_models.IdempotencyKey)
+        .where(sql_models.IdempotencyKey.user_id == user_id, sql_models.IdempotencyKey.key == key)
+        .execution_options(populate_existing=True)
+    )
+    return result.scalar_one_or_none()
+
+# Guarda la respuesta de la petición original. La escritura ya está confirmada, así que un error
+# aquí no se propaga: la clave queda en curso hasta vencer y los reintentos reciben 409.
+async def complete_idempotency_key(db: AsyncSession, user_id: str, key: str, status_code: int, body: str) -> bool:
+    try:
+        await db.execute(
+            update(sql_models.IdempotencyKey)
+            .where(sql_models.IdempotencyKey.user_id == user_id, sql_models.IdempotencyKey.key == key)
+            .values(status_code=status_code, response_body=body)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        return True
+    except SQLAlchemyError as e:
+        print(f"Error storing the idempotent response: {str(e)}")
+        await db.rollback()
+        return False
+
+# Elimina las claves vencidas por lotes de chunk_size filas. Devuelve cuántas eliminó.
+async def purge_expired_idempotency_keys(db: AsyncSession, chunk_size: int = 1000) -> int:
+    try:
+        purged = 0
+        while True:
+            result = await db.execute(
+                select(sql_models.IdempotencyKey.user_id, sql_models.IdempotencyKey.key)
+                .where(sql_models.IdempotencyKey.expires_at <= _utc_now())
+                .limit(chunk_size)
+            )
+            keys = [tuple(row) for row in result.all()]
+            if not keys:
+                break
+            await db.execute(
+                delete(sql_models.IdempotencyKey)
+                .where(tuple_(sql_models.IdempotencyKey.user_id, sql_models.IdempotencyKey.key).in_(keys))
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+            purged += len(keys)
+            if len(keys) < chunk_size:
+                break
+        return purged
+    except SQLAlchemyError as e:
+        print(f"Error purging idempotency keys: {str(e)}")
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}")
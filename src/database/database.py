@@ -1,6 +1,10 @@
+import asyncio
 import os
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
+from services.metrics import InstrumentedQueuePool, instrument_engine
 
 # Conexion red
 # connection_string = os.environ.get("DB_INSTANCE_KLIMB_MYSQL")
@@ -10,12 +14,34 @@ connection_string = os.environ.get(
     "DB_INSTANCE_KLIMB_MYSQL", default="mysql+asyncmy://root:@localhost/klimb_challenge"
 )
 
+# Réplica de lectura opcional; si no se configura, las lecturas van al primario
+replica_connection_string = os.environ.get("DB_INSTANCE_KLIMB_MYSQL_REPLICA")
+
+# Tamaño del pool de conexiones (por motor y por worker)
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = int(os.environ.get("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", 3600))
+# Conexiones que cada worker abre en segundo plano al arrancar
+DB_POOL_WARM_CONNECTIONS = int(os.environ.get("DB_POOL_WARM_CONNECTIONS", 2))
+
+
+def _engine_options(url: str) -> dict:
+    options = {"pool_recycle": DB_POOL_RECYCLE, "pool_pre_ping": True}
+    # SQLite usa sus propios pools (sin espera de checkout que medir)
+    if make_url(url).get_backend_name() != "sqlite":
+        options.update(
+            poolclass=InstrumentedQueuePool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+        )
+    return options
+
+
 # Crear el motor asíncrono para conectar a la base de datos
-engine = create_async_engine(
-    connection_string,
-    pool_recycle=3600,
-    pool_pre_ping=True,
-)
+engine = create_async_engine(connection_string, **_engine_options(connection_string))
+instrument_engine(engine)
 
 # Crear la clase SessionLocal para manejar las sesiones con la base de datos
 SessionLocal = sessionmaker(
@@ -25,4 +51,32 @@ SessionLocal = sessionmaker(
     autoflush=False,
 )
 
-Base = declarative_base()
\ No newline at end of file
+# Motor y sesiones de solo lectura
+if replica_connection_string:
+    read_engine = create_async_engine(replica_connection_string, **_engine_options(replica_connection_string))
+    instrument_engine(read_engine, "replica")
+    ReadSessionLocal = sessionmaker(
+        bind=read_engine,
+        class_=AsyncSession,
+        autocommit=False,
+        autoflush=False,
+    )
+else:
+    read_engine = engine
+    ReadSessionLocal = SessionLocal
+
+Base = declarative_base()
+
+# Abre en paralelo hasta `connections` conexiones por motor y las devuelve al pool, para que
+# las primeras peticiones no paguen el establecimiento de la conexión (TCP, TLS, autenticación).
+async def warm_pools(connections: int = DB_POOL_WARM_CONNECTIONS) -> None:
+    async def checkout(target) -> None:
+        async with target.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    engines = {engine, read_engine}
+    count = min(connections, DB_POOL_SIZE)
+    try:
+        await asyncio.gather(*(checkout(target) for target in engines for _ in range(count)))
+    except Exception as e:
+        print(f"Error warming the connection pool: {str(e)}")
@@ -0,0 +1,109 @@
+# Verifica con EXPLAIN que las consultas frecuentes usan los índices esperados.
+# Uso: python -m database.explain_check  (devuelve código 1 si alguna consulta no usa su índice)
+# Ejecutar contra una base con datos representativos: con tablas vacías MySQL puede
+# preferir un recorrido completo aunque el índice exista.
+import asyncio
+import sys
+from datetime import datetime, timezone
+from typing import List, Tuple
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+import database.crud as crud
+import database.sql_models as sql_models
+from database.database import engine
+
+
+def hot_queries() -> List[Tuple[str, object, str]]:
+    today = datetime.now(timezone.utc).date()
+    return [
+        (
+            "active operations",
+            crud._active_operations_query(),
+            "ix_operations_is_closed_deadline",
+        ),
+        (
+            "expired operations sweep",
+            select(sql_models.Operation.id).where(sql_models.Operation.is_closed == False, crud._expired(today)),
+            "ix_operations_is_closed_deadline",
+        ),
+        (
+            "closed operations to archive",
+            crud._archivable_operations_query(datetime.now(timezone.utc).replace(tzinfo=None)).limit(200),
+            "ix_operations_is_closed_closed_at",
+        ),
+        (
+            "bids by operation",
+            select(sql_models.Bid)
+            .where(sql_models.Bid.operation_id == 1)
+            .order_by(sql_models.Bid.interest_rate),
+            "ix_bids_operation_id_interest_rate",
+        ),
+        (
+            "bids by investor",
+            select(sql_models.Bid)
+            .where(sql_models.Bid.investor_id == "00000000-0000-0000-0000-000000000000")
+            .order_by(sql_models.Bid.bid_date),
+            "ix_bids_investor_id_bid_date",
+        ),
+        (
+            "investor portfolio page",
+            crud._investor_positions_query("00000000-0000-0000-0000-000000000000").limit(100),
+            "ix_bids_investor_id_bid_date",
+        ),
+        (
+            "investor portfolio page (archive)",
+            crud._investor_positions_query("00000000-0000-0000-0000-000000000000", archived=True).limit(100),
+            "ix_bids_archive_investor_id_bid_date",
+        ),
+        (
+            "operator operations page",
+            crud._operator_operations_query("00000000-0000-0000-0000-000000000000").limit(100),
+            "ix_operations_operator_id_id",
+        ),
+        (
+            "operator operations page (archive)",
+            crud._operator_operations_query("00000000-0000-0000-0000-000000000000", archived=True).limit(100),
+            "ix_operations_archive_operator_id_id",
+        ),
+        (
+            "first bid of an investor in an operation",
+            select(sql_models.Bid.id).where(
+                sql_models.Bid.operation_id == 1,
+                sql_models.Bid.investor_id == "00000000-0000-0000-0000-000000000000",
+            ),
+            "ix_bids_operation_id_investor_id",
+        ),
+    ]
+
+
+# Devuelve el plan de ejecución de la consulta como una lista de líneas de texto
+async def explain(conn: AsyncConnection, query) -> List[str]:
+    compiled = query.compile(dialect=conn.dialect)
+    if compiled.positional:
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+    else:
+        params = compiled.params
+
+    prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+    result = await conn.exec_driver_sql(prefix + str(compiled), params)
+    return [" ".join(str(value) for value in row) for row in result]
+
+
+async def check() -> bool:
+    ok = True
+    async with engine.connect() as conn:
+        for name, query, index in hot_queries():
+            plan = await explain(conn, query)
+            uses_index = any(index in line for line in plan)
+            ok = ok and uses_index
+            print(f"[{'OK' if uses_index else 'FAIL'}] {name}: expected {index}")
+            if not uses_index:
+                for line in plan:
+                    print(f"    {line}")
+    await engine.dispose()
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(check()) else 1)
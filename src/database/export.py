@@ -0,0 +1,243 @@
+# Exportación masiva de operations, bids y users (sin password_hash) a CSV o Parquet.
+# operations y bids incluyen las filas movidas a su tabla de archivo.
+# Las filas se leen con un cursor del lado del servidor (stream_results + yield_per) y se
+# escriben por bloques de tamaño fijo, así que la memoria no depende del tamaño de la tabla.
+# Uso: python -m database.export bids [--format csv|parquet] [--start 2026-01-01] [--end 2026-12-31]
+#                                [--operation ID ...] [--chunk-size 10000] --output bids.csv
+import argparse
+import asyncio
+import csv
+import io
+import sys
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+from sqlalchemy import select, union_all
+
+import database.sql_models as sql_models
+
+EXPORT_CHUNK_SIZE = 10000
+EXPORT_FORMATS = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+# Columnas exportadas de cada tabla, la columna de fecha por la que se filtra y la tabla de
+# archivo con las mismas columnas, si la tiene
+EXPORT_TABLES = {
+    "operations": (
+        sql_models.Operation,
+        ["id", "operator_id", "amount_required", "interest_rate", "deadline", "amount_collected", "is_closed", "created_at", "closed_at"],
+        "created_at",
+        sql_models.ArchivedOperation,
+    ),
+    "bids": (
+        sql_models.Bid,
+        ["id", "operation_id", "investor_id", "amount", "interest_rate", "bid_date"],
+        "bid_date",
+        sql_models.ArchivedBid,
+    ),
+    "users": (
+        sql_models.User,
+        ["id", "username", "role", "created_at"],
+        "created_at",
+        None,
+    ),
+}
+
+
+def _export_part(model, table: str, columns: List[str], date_column: str, start: Optional[date], end: Optional[date], operation_ids: Optional[List[int]]):
+    query = select(*(getattr(model, name) for name in columns))
+    if start is not None:
+        query = query.where(getattr(model, date_column) >= datetime.combine(start, datetime.min.time()))
+    if end is not None:
+        query = query.where(getattr(model, date_column) < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+    if operation_ids:
+        query = query.where((model.id if table == "operations" else model.operation_id).in_(operation_ids))
+    return query
+
+
+# Consulta de la exportación: rango de fechas [start, end] sobre la columna de fecha de la tabla
+# y, para operations y bids, filtro por operaciones. Las tablas con archivo se leen con UNION ALL
+# de la tabla caliente y el archivo (los ids no se repiten entre ambas). Ordenada por id para
+# que sea reproducible.
+def export_query(table: str, start: Optional[date] = None, end: Optional[date] = None, operation_ids: Optional[List[int]] = None):
+    if table not in EXPORT_TABLES:
+        raise ValueError(f"Unknown table: {table}. Use one of: {', '.join(EXPORT_TABLES)}.")
+    model, columns, date_column, archive = EXPORT_TABLES[table]
+    if operation_ids and table == "users":
+        raise ValueError("The operation filter does not apply to users.")
+
+    if archive is None:
+        return _export_part(model, table, columns, date_column, start, end, operation_ids).order_by(model.id)
+    parts = union_all(*(
+        _export_part(source, table, columns, date_column, start, end, operation_ids) for source in (model, archive)
+    )).subquery()
+    return select(parts).order_by(parts.c.id)
+
+
+# Filas de la consulta por bloques de chunk_size, con un cursor del lado del servidor
+async def stream_chunks(conn, query, chunk_size: int = EXPORT_CHUNK_SIZE) -> AsyncIterator[Sequence[Any]]:
+    result = await conn.stream(query.execution_options(yield_per=chunk_size))
+    async for partition in result.partitions(chunk_size):
+        yield partition
+
+
+# --- Escritores por bloques --- #
+# Cada escritor recibe los bloques de filas y devuelve los bytes de cada uno, listos para enviar
+class CsvChunkWriter:
+    def __init__(self, columns: List[str]):
+        self.columns = columns
+        self._header = True
+
+    def write(self, rows: Sequence[Any]) -> bytes:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        if self._header:
+            writer.writerow(self.columns)
+            self._header = False
+        writer.writerows(rows)
+        return buffer.getvalue().encode()
+
+    def close(self) -> bytes:
+        # Una exportación vacía lleva al menos la cabecera
+        return self.write([]) if self._header else b""
+
+
+# Archivo de solo escritura que acumula lo que pyarrow escribe hasta que se recoge
+class _ChunkSink(io.RawIOBase):
+    def __init__(self):
+        self._parts: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+# Un row group de Parquet por bloque. pyarrow se importa con la primera exportación en Parquet.
+class ParquetChunkWriter:
+    def __init__(self, table: str, columns: List[str]):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        model = EXPORT_TABLES[table][0]
+        self._pa = pa
+        self.columns = columns
+        self.schema = pa.schema([(name, _arrow_type(pa, model.__table__.c[name].type)) for name in columns])
+        self._sink = _ChunkSink()
+        self._writer = pq.ParquetWriter(self._sink, self.schema, compression="snappy")
+
+    def write(self, rows: Sequence[Any]) -> bytes:
+        arrays = [
+            self._pa.array([row[index] for row in rows], type=field.type)
+            for index, field in enumerate(self.schema)
+        ]
+        self._writer.write_table(self._pa.Table.from_arrays(arrays, schema=self.schema))
+        return self._sink.drain()
+
+    def close(self) -> bytes:
+        self._writer.close()
+        return self._sink.drain()
+
+
+def _arrow_type(pa, column_type):
+    from sqlalchemy import Boolean, Date, DECIMAL, Float, Integer, TIMESTAMP
+
+    if isinstance(column_type, Boolean):
+        return pa.bool_()
+    if isinstance(column_type, Integer):
+        return pa.int64()
+    if isinstance(column_type, DECIMAL):
+        return pa.decimal128(column_type.precision, column_type.scale)
+    if isinstance(column_type, Float):
+        return pa.float64()
+    if isinstance(column_type, TIMESTAMP):
+        return pa.timestamp("us")
+    if isinstance(column_type, Date):
+        return pa.date32()
+    return pa.string()
+
+
+def chunk_writer(table: str, export_format: str):
+    columns = EXPORT_TABLES[table][1]
+    if export_format == "csv":
+        return CsvChunkWriter(columns)
+    if export_format == "parquet":
+        return ParquetChunkWriter(table, columns)
+    raise ValueError(f"Unknown format: {export_format}. Use one of: {', '.join(EXPORT_FORMATS)}.")
+
+
+# Exportación completa como flujo de bytes. Abre su propia conexión (por defecto a la réplica de
+# lectura), porque una respuesta en streaming sigue enviándose después de que la ruta retorna.
+async def export_stream(
+    table: str,
+    export_format: str,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    operation_ids: Optional[List[int]] = None,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+    engine=None,
+) -> AsyncIterator[bytes]:
+    if engine is None:
+        from database.database import read_engine as engine
+
+    query = export_query(table, start, end, operation_ids)
+    writer = chunk_writer(table, export_format)
+    async with engine.connect() as conn:
+        async for rows in stream_chunks(conn, query, chunk_size):
+            yield writer.write(rows)
+    yield writer.close()
+
+
+async def export_to_file(path: str, table: str, export_format: str, **filters) -> Dict[str, Any]:
+    start = time.perf_counter()
+    written = 0
+    with open(path, "wb") as file:
+        async for data in export_stream(table, export_format, **filters):
+            file.write(data)
+            written += len(data)
+    return {"table": table, "format": export_format, "bytes": written, "elapsed_s": time.perf_counter() - start}
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m database.export", description="Stream a table to CSV or Parquet.")
+    parser.add_argument("table", choices=list(EXPORT_TABLES))
+    parser.add_argument("--format", choices=list(EXPORT_FORMATS), default="csv")
+    parser.add_argument("--start", type=date.fromisoformat, help="first day included (by created_at, or bid_date for bids)")
+    parser.add_argument("--end", type=date.fromisoformat, help="last day included")
+    parser.add_argument("--operation", type=int, action="append", dest="operation_ids", help="only this operation (repeatable)")
+    parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE, help="rows fetched and written per chunk")
+    parser.add_argument("--output", required=True, help="file to write")
+    args = parser.parse_args(argv)
+
+    async def run() -> Dict[str, Any]:
+        from database.database import engine, read_engine
+        try:
+            return await export_to_file(
+                args.output, args.table, args.format,
+                start=args.start, end=args.end, operation_ids=args.operation_ids, chunk_size=args.chunk_size,
+            )
+        finally:
+            await read_engine.dispose()
+            await engine.dispose()
+
+    try:
+        report = asyncio.run(run())
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(2)
+    print(f"Exported {args.table} to {args.output} ({report['bytes']} bytes in {report['elapsed_s']:.1f} s).")
+
+
+if __name__ == "__main__":
+    main()
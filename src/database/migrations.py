@@ -0,0 +1,106 @@
+import os
+import re
+from typing import TYPE_CHECKING, Optional
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+# alembic se importa solo cuando hay que migrar: cargarlo cuesta más que todo el arranque
+if TYPE_CHECKING:
+    from alembic.config import Config
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini")
+VERSIONS_DIR = os.path.join(os.path.dirname(ALEMBIC_INI), "migrations", "versions")
+
+# Revisión que corresponde al esquema creado antes con Base.metadata.create_all
+BASELINE_REVISION = "0001"
+
+# Nombre del lock de MySQL que evita que varios workers migren a la vez
+MIGRATION_LOCK_NAME = "klimb_challenge_migrations"
+MIGRATION_LOCK_TIMEOUT = 120
+
+# Qué hace cada worker con el esquema al arrancar:
+#   "check"   (por defecto) compara la revisión de la base con la última y solo migra si difieren
+#   "upgrade" ejecuta siempre alembic upgrade head
+#   "skip"    no toca el esquema (las migraciones se aplican en el despliegue)
+DB_MIGRATIONS_ON_STARTUP = os.environ.get("DB_MIGRATIONS_ON_STARTUP", "check")
+
+_REVISION_PATTERN = re.compile(r"^(revision|down_revision)\s*=\s*['\"]?(\w*)", re.MULTILINE)
+
+
+def get_alembic_config(connection: Connection = None) -> "Config":
+    from alembic.config import Config
+
+    config = Config(ALEMBIC_INI)
+    if connection is not None:
+        config.attributes["connection"] = connection
+    return config
+
+
+# Última revisión según los archivos de migraciones, leída sin importar alembic.
+# Devuelve None si no hay una única cabeza (por ejemplo, ramas sin fusionar).
+def head_revision() -> Optional[str]:
+    revisions, parents = set(), set()
+    for name in os.listdir(VERSIONS_DIR):
+        if not name.endswith(".py"):
+            continue
+        with open(os.path.join(VERSIONS_DIR, name)) as file:
+            values = dict(_REVISION_PATTERN.findall(file.read()))
+        if values.get("revision"):
+            revisions.add(values["revision"])
+        if values.get("down_revision") not in (None, "", "None"):
+            parents.add(values["down_revision"])
+    heads = revisions - parents
+    return heads.pop() if len(heads) == 1 else None
+
+
+# Revisión aplicada en la base de datos (None si nunca se migró con alembic)
+async def current_revision(conn: AsyncConnection) -> Optional[str]:
+    try:
+        result = await conn.execute(text("SELECT version_num FROM alembic_version"))
+        return result.scalar()
+    except SQLAlchemyError:
+        await conn.rollback()
+        return None
+
+
+def _upgrade(connection: Connection) -> None:
+    from alembic import command
+
+    config = get_alembic_config(connection)
+
+    # Bases de datos creadas con create_all: se marcan con la revisión base antes de migrar
+    tables = inspect(connection).get_table_names()
+    if "alembic_version" not in tables and "operations" in tables:
+        command.stamp(config, BASELINE_REVISION)
+
+    command.upgrade(config, "head")
+
+
+# Lleva el esquema a la última revisión usando una conexión del motor de la aplicación.
+# En modo "check" solo ejecuta DDL si la base no está en la última revisión.
+# Devuelve True si se ejecutaron las migraciones.
+async def upgrade_database(engine: AsyncEngine, mode: str = DB_MIGRATIONS_ON_STARTUP) -> bool:
+    if mode == "skip":
+        return False
+
+    async with engine.connect() as conn:
+        if mode == "check":
+            head = head_revision()
+            if head is not None and await current_revision(conn) == head:
+                return False
+
+        is_mysql = conn.dialect.name == "mysql"
+        if is_mysql:
+            await conn.execute(
+                text("SELECT GET_LOCK(:name, :timeout)"),
+                {"name": MIGRATION_LOCK_NAME, "timeout": MIGRATION_LOCK_TIMEOUT},
+            )
+        try:
+            await conn.run_sync(_upgrade)
+            await conn.commit()
+        finally:
+            if is_mysql:
+                await conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": MIGRATION_LOCK_NAME})
+    return True
@@ -0,0 +1,20 @@
+import base64
+import json
+from typing import Any, List
+
+
+# --- Cursores opacos para paginación por keyset --- #
+# El cursor codifica los valores de la última fila entregada (por ejemplo deadline e id)
+def encode_cursor(*values: Any) -> str:
+    raw = json.dumps([str(value) if not isinstance(value, (int, float)) else value for value in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor.")
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid cursor.")
+    return values
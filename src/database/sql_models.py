@@ -9,6 +9,9 @@ from sqlalchemy import (
     TIMESTAMP,
     Boolean,
     VARCHAR,
+    Index,
+    Text,
+    text,
 )
 from sqlalchemy.orm import relationship
 from database.database import Base  
@@ -21,13 +24,20 @@ class User(Base):
     username = Column(String(100), nullable=False, unique=True)
     password_hash = Column(String(255), nullable=False)  
     role = Column(String(20), nullable=False)  
-    created_at = Column(TIMESTAMP, server_default="CURRENT_TIMESTAMP")
+    created_at = Column(TIMESTAMP, server_default=text("CURRENT_TIMESTAMP"))
 
     bids = relationship("Bid", back_populates="user")
 
 # Tabla de operaciones financieras creadas por los operadores
 class Operation(Base):
     __tablename__ = "operations"
+    __table_args__ = (
+        Index("ix_operations_is_closed_deadline", "is_closed", "deadline"),
+        Index("ix_operations_operator_id_id", "operator_id", "id"),
+        Index("ix_operations_is_closed_closed_at", "is_closed", "closed_at"),
+        # Sin AUTOINCREMENT, SQLite reutilizaría el id de la última operación si se archiva
+        {"sqlite_autoincrement": True},
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     operator_id = Column(String(36), ForeignKey("users.id"), nullable=False) 
@@ -36,20 +46,113 @@ class Operation(Base):
     deadline = Column(Date, nullable=False)  
     amount_collected = Column(DECIMAL(15, 2), default=0)  
     is_closed = Column(Boolean, default=False)  
-    created_at = Column(TIMESTAMP, server_default="CURRENT_TIMESTAMP")
+    created_at = Column(TIMESTAMP, server_default=text("CURRENT_TIMESTAMP"))
+    closed_at = Column(TIMESTAMP, nullable=True)  # cuándo se cerró; el archivo mueve las cerradas hace tiempo
 
     bids = relationship("Bid", back_populates="operation")
 
 # Tabla de pujas realizadas por los inversores
 class Bid(Base):
     __tablename__ = "bids"
+    __table_args__ = (
+        Index("ix_bids_operation_id_interest_rate", "operation_id", "interest_rate"),
+        Index("ix_bids_investor_id_bid_date", "investor_id", "bid_date"),
+        Index("ix_bids_operation_id_investor_id", "operation_id", "investor_id"),
+        {"sqlite_autoincrement": True},
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     operation_id = Column(Integer, ForeignKey("operations.id"), nullable=False)  
     investor_id = Column(String(36), ForeignKey("users.id"), nullable=False)  
     amount = Column(DECIMAL(15, 2), nullable=False)  
     interest_rate = Column(Float, nullable=False)  
-    bid_date = Column(TIMESTAMP, server_default="CURRENT_TIMESTAMP")
+    bid_date = Column(TIMESTAMP, server_default=text("CURRENT_TIMESTAMP"))
 
     user = relationship("User", back_populates="bids")
     operation = relationship("Operation", back_populates="bids")
+
+# --- Archivo de operaciones cerradas --- #
+# Operaciones cerradas hace más que el periodo de retención, con sus ofertas, movidas fuera de
+# las tablas calientes. Tienen las mismas columnas y conservan sus ids; solo se leen.
+class ArchivedOperation(Base):
+    __tablename__ = "operations_archive"
+    __table_args__ = (
+        Index("ix_operations_archive_operator_id_id", "operator_id", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    operator_id = Column(String(36), nullable=False)
+    amount_required = Column(DECIMAL(15, 2), nullable=False)
+    interest_rate = Column(Float, nullable=False)
+    deadline = Column(Date, nullable=False)
+    amount_collected = Column(DECIMAL(15, 2), default=0)
+    is_closed = Column(Boolean, default=True)
+    created_at = Column(TIMESTAMP, nullable=True)
+    closed_at = Column(TIMESTAMP, nullable=True)
+    archived_at = Column(TIMESTAMP, server_default=text("CURRENT_TIMESTAMP"))
+
+class ArchivedBid(Base):
+    __tablename__ = "bids_archive"
+    __table_args__ = (
+        Index("ix_bids_archive_operation_id_interest_rate", "operation_id", "interest_rate"),
+        Index("ix_bids_archive_investor_id_bid_date", "investor_id", "bid_date"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    operation_id = Column(Integer, nullable=False)
+    investor_id = Column(String(36), nullable=False)
+    amount = Column(DECIMAL(15, 2), nullable=False)
+    interest_rate = Column(Float, nullable=False)
+    bid_date = Column(TIMESTAMP, nullable=True)
+
+# Estadísticas de las ofertas de cada operación, mantenidas de forma incremental en cada
+# oferta aceptada o eliminada para no recorrer la tabla bids al consultarlas
+class OperationBidStats(Base):
+    __tablename__ = "operation_bid_stats"
+
+    operation_id = Column(Integer, primary_key=True, autoincrement=False)
+    bid_count = Column(Integer, nullable=False, default=0)
+    total_amount = Column(DECIMAL(15, 2), nullable=False, default=0)
+    weighted_rate_sum = Column(DECIMAL(24, 6), nullable=False, default=0)  # suma de amount * interest_rate
+    best_rate = Column(Float, nullable=True)  # tasa más baja ofrecida
+    distinct_investors = Column(Integer, nullable=False, default=0)
+
+# Resumen de las operaciones de cada operador para su panel, mantenido de forma incremental:
+# las ofertas lo actualizan junto con operation_bid_stats y el barrido de vencimientos al cerrar
+class OperatorSummary(Base):
+    __tablename__ = "operator_summaries"
+
+    operator_id = Column(String(36), primary_key=True)
+    operation_count = Column(Integer, nullable=False, default=0)
+    open_operations = Column(Integer, nullable=False, default=0)
+    amount_required = Column(DECIMAL(17, 2), nullable=False, default=0)
+    bid_count = Column(Integer, nullable=False, default=0)
+    total_amount = Column(DECIMAL(17, 2), nullable=False, default=0)  # suma de las ofertas
+    weighted_rate_sum = Column(DECIMAL(26, 6), nullable=False, default=0)  # suma de amount * interest_rate
+
+# Resultado de la asignación de una operación al cerrarse: monto asignado a cada oferta ganadora
+class Allocation(Base):
+    __tablename__ = "allocations"
+
+    operation_id = Column(Integer, primary_key=True, autoincrement=False)
+    bid_id = Column(Integer, primary_key=True, autoincrement=False)
+    investor_id = Column(String(36), nullable=False)
+    interest_rate = Column(Float, nullable=False)
+    amount_allocated = Column(DECIMAL(15, 2), nullable=False)
+    allocated_at = Column(TIMESTAMP, server_default=text("CURRENT_TIMESTAMP"))
+
+# Claves de idempotencia de las peticiones de creación: guarda la respuesta original de cada
+# (usuario, clave) para devolverla en los reintentos sin repetir la escritura
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        Index("ix_idempotency_keys_expires_at", "expires_at"),
+    )
+
+    user_id = Column(String(36), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    fingerprint = Column(String(64), nullable=False)  # sha256 de la ruta y el cuerpo de la petición
+    status_code = Column(Integer, nullable=True)  # None mientras la petición original está en curso
+    response_body = Column(Text, nullable=True)
+    created_at = Column(TIMESTAMP, server_default=text("CURRENT_TIMESTAMP"))
+    expires_at = Column(TIMESTAMP, nullable=False)
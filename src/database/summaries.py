@@ -0,0 +1,80 @@
+# Mantenimiento de operator_summaries, el resumen por operador del panel de operaciones.
+# Uso: python -m database.summaries rebuild [--operator ID]  (recalcula desde las tablas base)
+#      python -m database.summaries check [--operator ID]    (código 1 si alguna fila no coincide)
+import argparse
+import asyncio
+import sys
+from decimal import Decimal
+from typing import Dict, List, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import database.crud as crud
+import database.sql_models as sql_models
+from database.database import SessionLocal, engine
+
+# Los montos se comparan al centavo; la suma ponderada de tasas admite el redondeo de las
+# tasas (float) que se acumula con cada oferta
+AMOUNT_TOLERANCE = Decimal("0.01")
+WEIGHTED_RATE_TOLERANCE = Decimal("0.01")
+
+
+# Compara las filas guardadas con el agregado de las tablas base.
+# Devuelve una línea de texto por cada operador que no coincide.
+async def find_mismatches(db: AsyncSession, operator_ids: Optional[List[str]] = None) -> List[str]:
+    columns = crud.OPERATOR_SUMMARY_COLUMNS
+    query = select(*(getattr(sql_models.OperatorSummary, name) for name in columns))
+    if operator_ids is not None:
+        query = query.where(sql_models.OperatorSummary.operator_id.in_(operator_ids))
+    stored: Dict[str, tuple] = {row[0]: tuple(row) for row in (await db.execute(query)).all()}
+    expected: Dict[str, tuple] = {
+        row[0]: tuple(row) for row in (await db.execute(crud._operator_summary_query(operator_ids))).all()
+    }
+
+    mismatches = []
+    for operator_id in sorted(set(stored) | set(expected)):
+        if operator_id not in stored:
+            mismatches.append(f"{operator_id}: missing summary row")
+            continue
+        if operator_id not in expected:
+            mismatches.append(f"{operator_id}: summary row without operations")
+            continue
+        for name, value, actual in zip(columns[1:], stored[operator_id][1:], expected[operator_id][1:]):
+            if name in ("operation_count", "open_operations", "bid_count"):
+                equal = int(value) == int(actual)
+            else:
+                tolerance = WEIGHTED_RATE_TOLERANCE if name == "weighted_rate_sum" else AMOUNT_TOLERANCE
+                equal = abs(Decimal(str(value)) - Decimal(str(actual))) <= tolerance
+            if not equal:
+                mismatches.append(f"{operator_id}: {name} is {value}, expected {actual}")
+    return mismatches
+
+
+async def run(command: str, operator_ids: Optional[List[str]]) -> bool:
+    try:
+        async with SessionLocal() as db:
+            if command == "rebuild":
+                await crud.rebuild_operator_summaries(db, operator_ids)
+                print("Operator summaries rebuilt.")
+                return True
+
+            mismatches = await find_mismatches(db, operator_ids)
+            for line in mismatches:
+                print(f"[FAIL] {line}")
+            if not mismatches:
+                print("[OK] operator summaries match the operations and bids tables")
+            return not mismatches
+    finally:
+        await engine.dispose()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m database.summaries", description="Operator summary maintenance.")
+    parser.add_argument("command", choices=("rebuild", "check"))
+    parser.add_argument("--operator", action="append", dest="operators", help="limit to this operator id (repeatable)")
+    args = parser.parse_args(argv)
+    sys.exit(0 if asyncio.run(run(args.command, args.operators)) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,16 @@
 import os
+import time
 import uuid
 from typing import AsyncGenerator
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
-from jose import JWTError, jwt
 import database.crud as crud
 import models.py_schemas as py_schemas
-from database.database import SessionLocal
+from database.database import SessionLocal, ReadSessionLocal, read_engine
+from services.principal_cache import principal_cache
 
 
 # --- Manejo de Base de Datos --- #
@@ -20,6 +23,51 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
             await db.close()
 
 
+# --- Réplica de lectura --- #
+# Si una lectura en la réplica falla, se marca como caída y las lecturas vuelven al primario;
+# se vuelve a probar como mucho cada DB_REPLICA_PROBE_SECONDS segundos.
+DB_REPLICA_PROBE_SECONDS = int(os.environ.get("DB_REPLICA_PROBE_SECONDS", 30))
+_replica_state = {"healthy": True, "checked_at": 0.0}
+
+async def _replica_available() -> bool:
+    if ReadSessionLocal is SessionLocal:
+        return False
+    if _replica_state["healthy"]:
+        return True
+    if time.monotonic() - _replica_state["checked_at"] < DB_REPLICA_PROBE_SECONDS:
+        return False
+
+    _replica_state["checked_at"] = time.monotonic()
+    try:
+        async with read_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        _replica_state["healthy"] = True
+    except Exception as e:
+        print(f"Read replica unavailable: {str(e)}")
+    return _replica_state["healthy"]
+
+def _mark_replica_failed() -> None:
+    _replica_state["healthy"] = False
+    _replica_state["checked_at"] = 0.0
+
+# Dependencia para las rutas de solo lectura: usa la réplica si está disponible
+async def get_read_db() -> AsyncGenerator[AsyncSession, None]:
+    if not await _replica_available():
+        async with SessionLocal() as db:
+            yield db
+        return
+
+    async with ReadSessionLocal() as db:
+        try:
+            yield db
+        except (SQLAlchemyError, HTTPException) as e:
+            if not isinstance(e, HTTPException) or e.status_code >= 500:
+                _mark_replica_failed()
+            raise
+        finally:
+            await db.close()
+
+
 # --- Generación de UUID --- #
 # Genera un UUID para identificar la ejecución
 def get_execution_id() -> uuid.UUID:
@@ -48,6 +96,9 @@ async def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
 
+    # python-jose se importa con la primera petición autenticada, no al arrancar el worker
+    from jose import JWTError, jwt
+
     try:
         # Decodificar el token JWT para extraer la información del usuario
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
@@ -57,9 +108,22 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
 
-    # Obtener el usuario desde la base de datos
-    user = await crud.get_user_by_username(db, username)
-    if user is None:
+    # Obtener el usuario desde la caché o, si no está, desde la base de datos
+    user = principal_cache.get(username)
+    if user is not None:
+        return user
+
+    db_user = await crud.get_user_by_username(db, username)
+    if db_user is None:
         raise credentials_exception
 
+    user = py_schemas.User.model_validate(db_user)
+    principal_cache.set(username, user)
     return user
+
+# El usuario se resuelve con una sesión propia que se cierra al terminar, no con la de get_db, que
+# FastAPI solo cierra al terminar la respuesta. Lo usan las respuestas en streaming (para no
+# retener la conexión mientras se transmite) y el control de admisión (mientras se espera turno).
+async def get_current_user_short_session(token: str = Depends(oauth2_scheme)) -> py_schemas.User:
+    async with SessionLocal() as db:
+        return await get_current_user(token, db)
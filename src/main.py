@@ -1,26 +1,49 @@
+import asyncio
 import os
 from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from database.database import SessionLocal, engine, Base
-from routers import users, operations, bids
+from database.database import SessionLocal, engine, read_engine, Base, warm_pools
+from database.migrations import upgrade_database
+from routers import users, operations, bids, metrics, admin
+from services.metrics import MetricsMiddleware, mark_process_dead
+from services.hashing import bulk_password_hasher, password_hasher
+from services.bid_writer import bid_writer
+from services.expiry_scheduler import expiry_scheduler, EXPIRY_SCHEDULER_ENABLED
+from services.operation_events import operation_events
 
 os.environ["REPOSITORY"] = "klimb-challenge"
 os.environ["FOLDER"] = ""
 
 app = FastAPI()
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(users.router)
 app.include_router(operations.router)
 app.include_router(bids.router)
+app.include_router(metrics.router)
+app.include_router(admin.router)
 
 
 
-# Crear las tablas asíncronamente en el evento de inicio de la app
+# Aplicar las migraciones pendientes (solo si el esquema no está al día) en el evento de inicio de la app
 @app.on_event("startup")
 async def on_startup():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    await upgrade_database(engine)
+    # El pool se calienta en segundo plano: el worker atiende sin esperar esas conexiones
+    app.state.pool_warmup = asyncio.create_task(warm_pools())
+    if EXPIRY_SCHEDULER_ENABLED:
+        expiry_scheduler.start()
+    if bid_writer.enabled:
+        bid_writer.start()
 
 @app.on_event("shutdown")
 async def on_shutdown():
+    app.state.pool_warmup.cancel()
+    await expiry_scheduler.stop()
+    await bid_writer.stop()
+    await operation_events.stop()
+    password_hasher.shutdown()
+    bulk_password_hasher.shutdown()
+    await read_engine.dispose()
     await engine.dispose()
+    mark_process_dead()
@@ -0,0 +1,51 @@
+"""baseline: users, operations y bids
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "users",
+        sa.Column("id", sa.String(36), primary_key=True),
+        sa.Column("username", sa.String(100), nullable=False, unique=True),
+        sa.Column("password_hash", sa.String(255), nullable=False),
+        sa.Column("role", sa.String(20), nullable=False),
+        sa.Column("created_at", sa.TIMESTAMP, server_default=sa.text("CURRENT_TIMESTAMP")),
+    )
+    op.create_table(
+        "operations",
+        sa.Column("id", sa.Integer, primary_key=True, autoincrement=True),
+        sa.Column("operator_id", sa.String(36), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("amount_required", sa.DECIMAL(15, 2), nullable=False),
+        sa.Column("interest_rate", sa.Float, nullable=False),
+        sa.Column("deadline", sa.Date, nullable=False),
+        sa.Column("amount_collected", sa.DECIMAL(15, 2)),
+        sa.Column("is_closed", sa.Boolean),
+        sa.Column("created_at", sa.TIMESTAMP, server_default=sa.text("CURRENT_TIMESTAMP")),
+    )
+    op.create_table(
+        "bids",
+        sa.Column("id", sa.Integer, primary_key=True, autoincrement=True),
+        sa.Column("operation_id", sa.Integer, sa.ForeignKey("operations.id"), nullable=False),
+        sa.Column("investor_id", sa.String(36), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("amount", sa.DECIMAL(15, 2), nullable=False),
+        sa.Column("interest_rate", sa.Float, nullable=False),
+        sa.Column("bid_date", sa.TIMESTAMP, server_default=sa.text("CURRENT_TIMESTAMP")),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("bids")
+    op.drop_table("operations")
+    op.drop_table("users")
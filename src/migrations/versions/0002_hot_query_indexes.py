@@ -0,0 +1,28 @@
+"""índices para las consultas frecuentes
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Listado de operaciones activas y barrido de operaciones vencidas
+    op.create_index("ix_operations_is_closed_deadline", "operations", ["is_closed", "deadline"])
+    # Ofertas de una operación ordenadas por tasa
+    op.create_index("ix_bids_operation_id_interest_rate", "bids", ["operation_id", "interest_rate"])
+    # Ofertas de un inversor ordenadas por fecha
+    op.create_index("ix_bids_investor_id_bid_date", "bids", ["investor_id", "bid_date"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_bids_investor_id_bid_date", table_name="bids")
+    op.drop_index("ix_bids_operation_id_interest_rate", table_name="bids")
+    op.drop_index("ix_operations_is_closed_deadline", table_name="operations")
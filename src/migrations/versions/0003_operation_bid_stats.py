@@ -0,0 +1,43 @@
+"""estadísticas incrementales de ofertas por operación
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "operation_bid_stats",
+        sa.Column("operation_id", sa.Integer, primary_key=True, autoincrement=False),
+        sa.Column("bid_count", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("total_amount", sa.DECIMAL(15, 2), nullable=False, server_default="0"),
+        sa.Column("weighted_rate_sum", sa.DECIMAL(24, 6), nullable=False, server_default="0"),
+        sa.Column("best_rate", sa.Float, nullable=True),
+        sa.Column("distinct_investors", sa.Integer, nullable=False, server_default="0"),
+    )
+    # Comprobar si un inversor ya tiene ofertas en la operación
+    op.create_index("ix_bids_operation_id_investor_id", "bids", ["operation_id", "investor_id"])
+
+    # Calcular las estadísticas de las operaciones existentes
+    op.execute(
+        "INSERT INTO operation_bid_stats "
+        "(operation_id, bid_count, total_amount, weighted_rate_sum, best_rate, distinct_investors) "
+        "SELECT o.id, COUNT(b.id), COALESCE(SUM(b.amount), 0), COALESCE(SUM(b.amount * b.interest_rate), 0), "
+        "MIN(b.interest_rate), COUNT(DISTINCT b.investor_id) "
+        "FROM operations o LEFT JOIN bids b ON b.operation_id = o.id "
+        "GROUP BY o.id"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_bids_operation_id_investor_id", table_name="bids")
+    op.drop_table("operation_bid_stats")
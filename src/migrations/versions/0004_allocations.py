@@ -0,0 +1,30 @@
+"""asignación de ofertas al cerrar una operación
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "allocations",
+        sa.Column("operation_id", sa.Integer, primary_key=True, autoincrement=False),
+        sa.Column("bid_id", sa.Integer, primary_key=True, autoincrement=False),
+        sa.Column("investor_id", sa.String(36), nullable=False),
+        sa.Column("interest_rate", sa.Float, nullable=False),
+        sa.Column("amount_allocated", sa.DECIMAL(15, 2), nullable=False),
+        sa.Column("allocated_at", sa.TIMESTAMP, server_default=sa.text("CURRENT_TIMESTAMP")),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("allocations")
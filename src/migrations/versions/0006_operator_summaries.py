@@ -0,0 +1,47 @@
+"""resumen de operaciones por operador
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "operator_summaries",
+        sa.Column("operator_id", sa.String(36), primary_key=True),
+        sa.Column("operation_count", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("open_operations", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("amount_required", sa.DECIMAL(17, 2), nullable=False, server_default="0"),
+        sa.Column("bid_count", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("total_amount", sa.DECIMAL(17, 2), nullable=False, server_default="0"),
+        sa.Column("weighted_rate_sum", sa.DECIMAL(26, 6), nullable=False, server_default="0"),
+    )
+    # Operaciones de un operador en orden de creación (panel del operador)
+    op.create_index("ix_operations_operator_id_id", "operations", ["operator_id", "id"])
+
+    # Calcular el resumen de los operadores existentes desde las tablas base
+    op.execute(
+        "INSERT INTO operator_summaries "
+        "(operator_id, operation_count, open_operations, amount_required, bid_count, total_amount, weighted_rate_sum) "
+        "SELECT o.operator_id, COUNT(*), SUM(CASE WHEN o.is_closed THEN 0 ELSE 1 END), SUM(o.amount_required), "
+        "COALESCE(SUM(b.bid_count), 0), COALESCE(SUM(b.total_amount), 0), COALESCE(SUM(b.weighted_rate_sum), 0) "
+        "FROM operations o LEFT JOIN ("
+        "SELECT operation_id, COUNT(*) AS bid_count, SUM(amount) AS total_amount, "
+        "SUM(amount * interest_rate) AS weighted_rate_sum FROM bids GROUP BY operation_id"
+        ") b ON b.operation_id = o.id "
+        "GROUP BY o.operator_id"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_operations_operator_id_id", table_name="operations")
+    op.drop_table("operator_summaries")
@@ -0,0 +1,58 @@
+"""archivo de operaciones cerradas y sus ofertas
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("operations", sa.Column("closed_at", sa.TIMESTAMP, nullable=True))
+    # Las operaciones ya cerradas no guardaban cuándo: se toma su fecha límite
+    op.execute("UPDATE operations SET closed_at = deadline WHERE is_closed = 1")
+    op.create_index("ix_operations_is_closed_closed_at", "operations", ["is_closed", "closed_at"])
+
+    op.create_table(
+        "operations_archive",
+        sa.Column("id", sa.Integer, primary_key=True, autoincrement=False),
+        sa.Column("operator_id", sa.String(36), nullable=False),
+        sa.Column("amount_required", sa.DECIMAL(15, 2), nullable=False),
+        sa.Column("interest_rate", sa.Float, nullable=False),
+        sa.Column("deadline", sa.Date, nullable=False),
+        sa.Column("amount_collected", sa.DECIMAL(15, 2)),
+        sa.Column("is_closed", sa.Boolean),
+        sa.Column("created_at", sa.TIMESTAMP, nullable=True),
+        sa.Column("closed_at", sa.TIMESTAMP, nullable=True),
+        sa.Column("archived_at", sa.TIMESTAMP, server_default=sa.text("CURRENT_TIMESTAMP")),
+    )
+    op.create_index("ix_operations_archive_operator_id_id", "operations_archive", ["operator_id", "id"])
+
+    op.create_table(
+        "bids_archive",
+        sa.Column("id", sa.Integer, primary_key=True, autoincrement=False),
+        sa.Column("operation_id", sa.Integer, nullable=False),
+        sa.Column("investor_id", sa.String(36), nullable=False),
+        sa.Column("amount", sa.DECIMAL(15, 2), nullable=False),
+        sa.Column("interest_rate", sa.Float, nullable=False),
+        sa.Column("bid_date", sa.TIMESTAMP, nullable=True),
+    )
+    op.create_index("ix_bids_archive_operation_id_interest_rate", "bids_archive", ["operation_id", "interest_rate"])
+    op.create_index("ix_bids_archive_investor_id_bid_date", "bids_archive", ["investor_id", "bid_date"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_bids_archive_investor_id_bid_date", table_name="bids_archive")
+    op.drop_index("ix_bids_archive_operation_id_interest_rate", table_name="bids_archive")
+    op.drop_table("bids_archive")
+    op.drop_index("ix_operations_archive_operator_id_id", table_name="operations_archive")
+    op.drop_table("operations_archive")
+    op.drop_index("ix_operations_is_closed_closed_at", table_name="operations")
+    op.drop_column("operations", "closed_at")
@@ -0,0 +1,52 @@
+"""el resumen por operador cuenta también las operaciones archivadas
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+# Agregado de un par de tablas de operaciones y ofertas, por operador
+def _summary_part(operations: str, bids: str) -> str:
+    return (
+        "SELECT o.operator_id AS operator_id, COUNT(*) AS operation_count, "
+        "SUM(CASE WHEN o.is_closed THEN 0 ELSE 1 END) AS open_operations, SUM(o.amount_required) AS amount_required, "
+        "COALESCE(SUM(b.bid_count), 0) AS bid_count, COALESCE(SUM(b.total_amount), 0) AS total_amount, "
+        "COALESCE(SUM(b.weighted_rate_sum), 0) AS weighted_rate_sum "
+        f"FROM {operations} o LEFT JOIN ("
+        "SELECT operation_id, COUNT(*) AS bid_count, SUM(amount) AS total_amount, "
+        f"SUM(amount * interest_rate) AS weighted_rate_sum FROM {bids} GROUP BY operation_id"
+        ") b ON b.operation_id = o.id "
+        "GROUP BY o.operator_id"
+    )
+
+
+def _rebuild(query: str) -> None:
+    op.execute("DELETE FROM operator_summaries")
+    op.execute(
+        "INSERT INTO operator_summaries "
+        "(operator_id, operation_count, open_operations, amount_required, bid_count, total_amount, weighted_rate_sum) "
+        + query
+    )
+
+
+def upgrade() -> None:
+    # Hasta ahora el archivo restaba del resumen las operaciones que movía: se recalcula
+    # sumando las tablas calientes y el archivo
+    _rebuild(
+        "SELECT operator_id, SUM(operation_count), SUM(open_operations), SUM(amount_required), "
+        "SUM(bid_count), SUM(total_amount), SUM(weighted_rate_sum) FROM ("
+        + _summary_part("operations", "bids") + " UNION ALL " + _summary_part("operations_archive", "bids_archive")
+        + ") parts GROUP BY operator_id"
+    )
+
+
+def downgrade() -> None:
+    _rebuild(_summary_part("operations", "bids"))
@@ -0,0 +1,43 @@
+"""ids de operations y bids sin reutilizar en SQLite (AUTOINCREMENT)
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+# Tablas calientes y su archivo: los ids archivados tampoco se pueden volver a entregar
+TABLES = (("operations", "operations_archive"), ("bids", "bids_archive"))
+
+
+def upgrade() -> None:
+    # Sin AUTOINCREMENT, SQLite entrega MAX(id) + 1 y reutilizaría el id de la última fila si se
+    # archiva. MySQL 8 guarda el contador AUTO_INCREMENT y no necesita cambios (ver
+    # crud._reuses_max_ids para versiones anteriores).
+    if op.get_bind().dialect.name != "sqlite":
+        return
+
+    for table, archive in TABLES:
+        with op.batch_alter_table(table, recreate="always", table_kwargs={"sqlite_autoincrement": True}):
+            pass
+        # El contador empieza por encima del mayor id entregado, esté en la tabla o en el archivo
+        op.execute(f"DELETE FROM sqlite_sequence WHERE name = '{table}'")
+        op.execute(
+            f"INSERT INTO sqlite_sequence (name, seq) SELECT '{table}', MAX(id) FROM "
+            f"(SELECT COALESCE(MAX(id), 0) AS id FROM {table} UNION ALL SELECT COALESCE(MAX(id), 0) FROM {archive})"
+        )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "sqlite":
+        return
+
+    for table, _ in reversed(TABLES):
+        with op.batch_alter_table(table, recreate="always", table_kwargs={"sqlite_autoincrement": False}):
+            pass
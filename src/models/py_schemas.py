@@ -1,6 +1,7 @@
 from pydantic import BaseModel
 from datetime import date, datetime
 from typing import Optional, List
+from typing_extensions import TypedDict
 import uuid
 
 
@@ -43,6 +44,18 @@ class Operation(OperationBase):
 
 
 
+# Fila de operación para la serialización rápida de listados: produce el mismo JSON que
+# Operation, pero operator_id se toma como el texto guardado en la base de datos
+class OperationRow(TypedDict):
+    amount_required: float
+    interest_rate: float
+    deadline: date
+    id: int
+    operator_id: str
+    amount_collected: float
+    is_closed: bool
+    created_at: datetime
+
 # --- Esquema para la tabla Bids ---
 class BidBase(BaseModel):
     amount: float
@@ -58,6 +71,86 @@ class Bid(BidBase):
     class Config:
         from_attributes = True
 
+# Resultado individual de una oferta enviada en lote
+class BidBatchResult(BidCreate):
+    index: int
+    accepted: bool
+    detail: Optional[str] = None
+
+# --- Cartera de un inversor ---
+# Estado de la operación de cada posición
+class PortfolioOperation(BaseModel):
+    id: int
+    amount_required: float
+    amount_collected: float
+    interest_rate: float
+    deadline: date
+    is_closed: bool
+
+    class Config:
+        from_attributes = True
+
+# Oferta del inversor junto con su operación
+class PortfolioPosition(Bid):
+    operation: PortfolioOperation
+
+# Totales de la cartera (la tasa media está ponderada por el monto)
+class PortfolioTotals(BaseModel):
+    bid_count: int = 0
+    committed_amount: float = 0.0
+    average_interest_rate: Optional[float] = None
+    open_exposure: float = 0.0
+    closed_exposure: float = 0.0
+
+class Portfolio(BaseModel):
+    user_id: uuid.UUID
+    totals: PortfolioTotals
+    positions: List[PortfolioPosition]
+
+# --- Panel del operador ---
+# Totales de las operaciones de un operador (la tasa media está ponderada por el monto)
+class OperatorSummary(BaseModel):
+    operation_count: int = 0
+    open_operations: int = 0
+    closed_operations: int = 0
+    amount_required: float = 0.0
+    bid_count: int = 0
+    amount_bid: float = 0.0
+    funding_percentage: float = 0.0
+    average_interest_rate: Optional[float] = None
+
+# Operación del operador junto con las estadísticas de sus ofertas
+class OperatorOperation(Operation):
+    bid_count: int = 0
+    average_interest_rate: Optional[float] = None
+    best_interest_rate: Optional[float] = None
+
+class OperatorDashboard(BaseModel):
+    operator_id: uuid.UUID
+    summary: OperatorSummary
+    operations: List[OperatorOperation]
+
+# Resumen de las ofertas de una operación
+class BidSummary(BaseModel):
+    operation_id: int
+    bid_count: int = 0
+    total_amount: float = 0.0
+    average_interest_rate: Optional[float] = None  # promedio ponderado por monto
+    best_interest_rate: Optional[float] = None  # tasa más baja ofrecida
+    distinct_investors: int = 0
+
+# --- Importación masiva ---
+# Fila que no se importó: línea del archivo (la cabecera del CSV es la línea 1) y el motivo
+class ImportRowError(BaseModel):
+    line: int
+    error: str
+
+class ImportReport(BaseModel):
+    kind: str
+    rows: int = 0
+    imported: int = 0
+    errors: List[ImportRowError] = []
+
 
 
 # --- Esquemas para actualización ---
@@ -0,0 +1,92 @@
+import io
+from datetime import date
+from typing import List, Optional
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+import models.py_schemas as py_schemas
+from database.bulk_import import IMPORT_BATCH_SIZE, IMPORT_FORMATS, IMPORT_KINDS, detect_format, import_records, read_records
+from database.export import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, EXPORT_TABLES, export_query, export_stream
+from dependencies import get_current_user, get_current_user_short_session, get_db
+from services.expiry_scheduler import expiry_scheduler
+
+router = APIRouter(tags=["Administración"])
+
+# Rol con acceso a las exportaciones; no se puede obtener registrándose por POST /user
+ADMIN_ROLE = "admin"
+
+
+# --- Exportar una tabla (solo administradores) ---
+# Transmite operations, bids o users (sin password_hash) en CSV o Parquet, leyendo con un cursor
+# del lado del servidor en la réplica de lectura; la memoria no crece con el tamaño de la tabla.
+# La única conexión ocupada durante la transmisión es la del cursor.
+@router.get("/admin/export/{table}", status_code=status.HTTP_200_OK)
+async def export_table(
+    table: str,
+    format: str = Query("csv"),
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    operation_id: Optional[List[int]] = Query(None),
+    current_user: py_schemas.User = Depends(get_current_user_short_session)
+) -> StreamingResponse:
+
+    # Verificar si el usuario tiene rol de 'admin'
+    if current_user.role != ADMIN_ROLE:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You do not have permission to export data.")
+
+    if table not in EXPORT_TABLES:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Table not found.")
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f"Format must be one of: {', '.join(EXPORT_FORMATS)}.")
+
+    try:
+        # Validar los filtros antes de empezar a transmitir
+        export_query(table, start, end, operation_id)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+
+    return StreamingResponse(
+        export_stream(table, format, start, end, operation_id, EXPORT_CHUNK_SIZE),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{table}.{format}"'},
+    )
+
+
+
+# --- Importar usuarios u operaciones (solo administradores) ---
+# Lee el archivo subido (CSV con cabecera o JSONL) por lotes; las filas inválidas se devuelven en
+# el informe con su línea y el resto se importa. Las contraseñas se hashean en el pool de procesos.
+@router.post("/admin/import/{kind}", response_model=py_schemas.ImportReport, status_code=status.HTTP_200_OK)
+async def import_data(
+    kind: str,
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_db),
+    current_user: py_schemas.User = Depends(get_current_user)
+) -> py_schemas.ImportReport:
+
+    # Verificar si el usuario tiene rol de 'admin'
+    if current_user.role != ADMIN_ROLE:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You do not have permission to import data.")
+
+    if kind not in IMPORT_KINDS:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Import not found.")
+    if format is not None and format not in IMPORT_FORMATS:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f"Format must be one of: {', '.join(IMPORT_FORMATS)}.")
+
+    try:
+        import_format = format or detect_format(file.filename)
+        lines = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+        return await import_records(
+            db, kind, read_records(lines, import_format), IMPORT_BATCH_SIZE, on_deadline=expiry_scheduler.schedule
+        )
+
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    except HTTPException:
+        raise
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal server error: {e}")
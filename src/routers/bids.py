@@ -1,30 +1,60 @@
-from typing import Any, List
-from fastapi import APIRouter, Depends, HTTPException, status
+from decimal import Decimal
+from typing import Any, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 import database.crud as crud
 import database.sql_models as sql_models
 import models.py_schemas as py_schemas
-from dependencies import get_db, get_current_user
+from database.pagination import encode_cursor, decode_cursor
+from dependencies import get_db, get_read_db, get_current_user
 from routers.token_generator import create_access_token
+from services.admission import admission
+from services.bid_writer import bid_writer
+from services.idempotency import IdempotencyClaim, idempotency_store
 from sqlalchemy.exc import SQLAlchemyError
-from datetime import datetime, timezone
-from decimal import Decimal
 
 router = APIRouter(tags=["ofertas"])
 
 
 # --- Crear ofertas (solo inversores) ---
-@router.post("/bid", response_model=py_schemas.Bid, status_code=status.HTTP_201_CREATED)
+@router.post("/bid", response_model=py_schemas.Bid, status_code=status.HTTP_201_CREATED, dependencies=[Depends(admission.guard("POST /bid"))])
 async def create_bid(
     bid_data: py_schemas.BidCreate,
     db: AsyncSession = Depends(get_db),
-    current_user: py_schemas.User = Depends(get_current_user)
+    current_user: py_schemas.User = Depends(get_current_user),
+    claim: IdempotencyClaim = Depends(idempotency_store.guard("POST /bid")),
 ) -> py_schemas.Bid:
     
     # Verificar si el usuario tiene rol de 'inversor'
     if current_user.role != "inversor":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You do not have permission to create a bid.")
 
+    # Un reintento con la misma Idempotency-Key recibe la respuesta original sin crear otra oferta
+    if claim.replay is not None:
+        return claim.replay
+
+    try:
+        # Reservar el cupo y crear la oferta en una sola transacción (junto con la clave). En modo
+        # group commit la oferta se escribe con las demás del grupo; con Idempotency-Key se usa
+        # siempre la transacción de la petición, que es la que tiene reservada la clave.
+        if bid_writer.enabled and claim.key is None:
+            bid = await bid_writer.submit(bid_data, current_user)
+        else:
+            bid = await crud.accept_bid(db, bid_data, current_user)
+        if bid is not None:
+            await claim.complete(db, status.HTTP_201_CREATED, bid)
+            return bid
+
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    except HTTPException:
+        raise
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal server error: {e}")
+
+    # La oferta fue rechazada: se consulta la operación solo para informar el motivo
     operation = await crud.get_operation_by_id(db, bid_data.operation_id)
 
     #verifica si existe la operación
@@ -36,25 +66,156 @@ async def create_bid(
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Operation is closed")
     
     # Verifica si la fecha y hora actual permite hacer la oferta 
-    if datetime.now(timezone.utc).date() > operation.deadline:
+    if crud.utc_today() > operation.deadline:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Operation expired by date and time")
     
-    # Verifica si la operacion tiene saldo para ofertar 
-    if Decimal(operation.amount_required) < Decimal(bid_data.amount) + Decimal(operation.amount_collected):
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Amount of the bid exceeds the value")
-    
+    # La operación no tiene saldo para la oferta
+    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Amount of the bid exceeds the value")
+
+
+
+# --- Actualizar oferta (solo su inversor) ---
+# Ajusta el monto recaudado de la operación en la misma transacción
+@router.patch("/bid/{bid_id}", response_model=py_schemas.Bid, status_code=status.HTTP_200_OK, dependencies=[Depends(admission.guard("PATCH /bid"))])
+async def update_bid(
+    bid_id: int,
+    bid_update_data: py_schemas.BidUpdate,
+    db: AsyncSession = Depends(get_db),
+    current_user: py_schemas.User = Depends(get_current_user)
+) -> py_schemas.Bid:
+
+    # Verificar si el usuario tiene rol de 'inversor'
+    if current_user.role != "inversor":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You do not have permission to update a bid.")
+
+    if not crud._patch_values(bid_update_data):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No fields to update.")
+
     try:
-        # Crear oferta
-        bid = await crud.create_bid(db, bid_data, current_user)
-        
-        # Actualizar el valor de amount_collected en la operación
-        await crud.update_operation_amount_collected(db, bid_data.operation_id, bid_data.amount)
+        bid = await crud.patch_bid(db, bid_id, bid_update_data, current_user)
+        if bid is not None:
+            return bid
 
-        return bid
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    except HTTPException:
+        raise
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal server error: {e}")
+
+    # La actualización fue rechazada: se consultan la oferta y la operación para informar el motivo
+    existing = await crud.get_bid_by_id(db, bid_id)
+    if not existing:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Bid not found.")
+    if existing.investor_id != str(current_user.id):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You do not have permission to update this bid.")
+
+    operation = await crud.get_operation_by_id(db, existing.operation_id)
+    if operation.is_closed == True:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Operation is closed")
+    if crud.utc_today() > operation.deadline:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Operation expired by date and time")
+    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Amount of the bid exceeds the value")
+
+
+
+# --- Crear ofertas en lote (solo inversores) ---
+MAX_BATCH_BIDS = 1000
+
+@router.post("/bids/batch", response_model=List[py_schemas.BidBatchResult], status_code=status.HTTP_200_OK, dependencies=[Depends(admission.guard("POST /bids/batch"))])
+async def create_bids_batch(
+    bids_data: List[py_schemas.BidCreate],
+    db: AsyncSession = Depends(get_db),
+    current_user: py_schemas.User = Depends(get_current_user)
+) -> List[py_schemas.BidBatchResult]:
+
+    # Verificar si el usuario tiene rol de 'inversor'
+    if current_user.role != "inversor":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You do not have permission to create a bid.")
+
+    if not bids_data:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="The batch is empty.")
+    if len(bids_data) > MAX_BATCH_BIDS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"A batch can contain at most {MAX_BATCH_BIDS} bids.")
+
+    try:
+        # Validar, reservar cupo e insertar todas las ofertas en una sola transacción
+        return await crud.create_bids_batch(db, bids_data, current_user)
 
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    except HTTPException:
+        raise
     except SQLAlchemyError as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}")
     except Exception as e:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal server error: {e}")
\ No newline at end of file
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal server error: {e}")
+
+
+
+# --- Libro de ofertas de una operación ---
+# Ofertas ordenadas por tasa de interés (la más baja primero), paginadas por (interest_rate, id);
+# el cursor de la siguiente página queda en el encabezado X-Next-Cursor.
+@router.get("/operation/{operation_id}/bids", response_model=List[py_schemas.Bid], status_code=status.HTTP_200_OK)
+async def list_operation_bids(
+    operation_id: int,
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db)
+) -> List[py_schemas.Bid]:
+
+    # Verificar si la operación existe
+    operation = await crud.get_operation_by_id(db, operation_id)
+    if not operation:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Operation not found.")
+
+    try:
+        after = None
+        if cursor is not None:
+            after_rate, after_id = decode_cursor(cursor, 2)
+            after = (float(after_rate), int(after_id))
+
+        bids, last_key = await crud.get_operation_bids_page(db, operation_id, limit, after)
+        if last_key is not None:
+            response.headers["X-Next-Cursor"] = encode_cursor(*last_key)
+        return bids
+
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    except HTTPException:
+        raise
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal server error: {e}")
+
+
+
+# --- Resumen de las ofertas de una operación ---
+# Lee las estadísticas mantenidas en cada oferta: no recorre la tabla de ofertas
+@router.get("/operation/{operation_id}/bids/summary", response_model=py_schemas.BidSummary, status_code=status.HTTP_200_OK)
+async def get_operation_bids_summary(
+    operation_id: int,
+    db: AsyncSession = Depends(get_read_db)
+) -> py_schemas.BidSummary:
+
+    stats = await crud.get_operation_bid_stats(db, operation_id)
+    if stats is None:
+        # Verificar si la operación existe (sin ofertas registradas)
+        operation = await crud.get_operation_by_id(db, operation_id)
+        if not operation:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Operation not found.")
+        return py_schemas.BidSummary(operation_id=operation_id)
+
+    total_amount = Decimal(stats.total_amount)
+    return py_schemas.BidSummary(
+        operation_id=operation_id,
+        bid_count=stats.bid_count,
+        total_amount=float(total_amount),
+        average_interest_rate=float(Decimal(stats.weighted_rate_sum) / total_amount) if total_amount > 0 else None,
+        best_interest_rate=stats.best_rate,
+        distinct_investors=stats.distinct_investors,
+    )
@@ -0,0 +1,11 @@
+from fastapi import APIRouter, Response
+from services import metrics
+
+router = APIRouter(tags=["Métricas"])
+
+
+# --- Métricas en formato Prometheus ---
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics() -> Response:
+    content, media_type = metrics.render()
+    return Response(content=content, media_type=media_type)
@@ -1,32 +1,67 @@
-from typing import Any, List
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+import os
+from datetime import date
+from typing import Any, AsyncIterator, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import TypeAdapter
 from sqlalchemy.ext.asyncio import AsyncSession
 import database.crud as crud
 import database.sql_models as sql_models
 import models.py_schemas as py_schemas
-from dependencies import get_db, get_current_user
+from database.database import ReadSessionLocal
+from database.pagination import encode_cursor, decode_cursor
+from dependencies import get_db, get_read_db, get_current_user
+from services.allocation import ALLOCATE_ON_CLOSE
+from services.expiry_scheduler import expiry_scheduler
+from services.idempotency import IdempotencyClaim, idempotency_store
+from services.operation_cache import operation_cache, etag_matches, CachedResponse, LISTING, OPERATION
+from services.operation_events import operation_events, DELETED, EVENTS_HEARTBEAT_SECONDS
 from routers.token_generator import create_access_token
+from services.admission import admission
 from sqlalchemy.exc import SQLAlchemyError
 
 router = APIRouter(tags=["Operaciones"])
 
 
+# Serializa igual que la respuesta JSON por defecto de FastAPI
+def _render_json(content: Any) -> bytes:
+    return JSONResponse(content=jsonable_encoder(content)).body
+
+# Respuesta a partir de la caché: 304 si el cliente ya tiene la versión vigente
+def _cached_response(request: Request, entry: CachedResponse) -> Response:
+    headers = {"ETag": entry.etag, **entry.headers}
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
 
 # --- Crear operación (solo operadores) ---
-@router.post("/operation", response_model=py_schemas.Operation, status_code=status.HTTP_201_CREATED)
+@router.post("/operation", response_model=py_schemas.Operation, status_code=status.HTTP_201_CREATED, dependencies=[Depends(admission.guard("POST /operation"))])
 async def create_operation(
     operation_data: py_schemas.OperationCreate,
     db: AsyncSession = Depends(get_db),
-    current_user: py_schemas.User = Depends(get_current_user)
+    current_user: py_schemas.User = Depends(get_current_user),
+    claim: IdempotencyClaim = Depends(idempotency_store.guard("POST /operation")),
 ) -> py_schemas.Operation:
     
     # Verificar si el usuario tiene rol de 'operador'
     if current_user.role != "operador":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You do not have permission to create an operation.")
 
+    # Un reintento con la misma Idempotency-Key recibe la respuesta original sin crear otra operación
+    if claim.replay is not None:
+        return claim.replay
+
     try:
-        # Crear la operación
-        operation = await crud.create_operation(db, operation_data, current_user)
+        # Crear la operación (la clave se confirma en la misma transacción)
+        operation = py_schemas.Operation.model_validate(await crud.create_operation(db, operation_data, current_user))
+
+        # Programar el cierre de la operación en su fecha límite
+        expiry_scheduler.schedule(operation.deadline)
+        await claim.complete(db, status.HTTP_201_CREATED, operation)
         return operation
 
     except ValueError as e:
@@ -50,8 +85,8 @@ async def delete_operation(
     if current_user.role != "operador":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You do not have permission to delete an operation.")
 
-    # Verificar si la operación existe
-    operation = await crud.get_operation_by_id(db, operation_id)
+    # Verificar si la operación existe (las archivadas no se eliminan)
+    operation = await crud.get_operation_by_id(db, operation_id, include_archive=False)
 
     if not operation:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Operation not found.")
@@ -69,19 +104,115 @@ async def delete_operation(
 
 
 
+# --- Actualizar operación (solo su operador) ---
+# Aplica todos los campos enviados con un único UPDATE condicional
+@router.patch("/operation/{operation_id}", response_model=py_schemas.Operation, status_code=status.HTTP_200_OK, dependencies=[Depends(admission.guard("PATCH /operation"))])
+async def update_operation(
+    operation_id: int,
+    operation_update_data: py_schemas.OperationUpdate,
+    db: AsyncSession = Depends(get_db),
+    current_user: py_schemas.User = Depends(get_current_user)
+) -> py_schemas.Operation:
+
+    # Verificar si el usuario tiene rol de 'operador'
+    if current_user.role != "operador":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You do not have permission to update an operation.")
+
+    if not crud._patch_values(operation_update_data):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No fields to update.")
+
+    try:
+        operation = await crud.patch_operation(db, operation_id, operation_update_data, current_user)
+        if operation is not None:
+            # Programar el cierre en la nueva fecha límite
+            if operation_update_data.deadline is not None:
+                expiry_scheduler.schedule(operation.deadline)
+            return operation
+
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    except HTTPException:
+        raise
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal server error: {e}")
+
+    # La actualización fue rechazada: se consulta la operación solo para informar el motivo
+    existing = await crud.get_operation_by_id(db, operation_id, include_archive=False)
+    if not existing:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Operation not found.")
+    if existing.operator_id != str(current_user.id):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You do not have permission to update this operation.")
+    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="The amount required cannot be lower than the amount collected.")
+
+
+
 # --- Listar operaciones activas ---
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+STREAM_BATCH_SIZE = 1000
+
+# Serialización rápida del listado (opcional): consulta solo las columnas como filas y las
+# valida y serializa de una vez con un TypeAdapter, sin pasar por jsonable_encoder ni json
+FAST_SERIALIZATION = os.environ.get("FAST_SERIALIZATION", "0") == "1"
+OPERATION_LIST_ADAPTER = TypeAdapter(List[py_schemas.OperationRow])
+
+# Serialización por defecto: entidades ORM validadas una a una
+def _render_operations(operations: List[sql_models.Operation]) -> bytes:
+    return _render_json([py_schemas.Operation.model_validate(o) for o in operations])
+
+# Serialización rápida: filas de crud.OPERATION_COLUMNS validadas y convertidas a JSON en Rust
+def _render_operation_rows(rows: List[Any]) -> bytes:
+    return OPERATION_LIST_ADAPTER.dump_json(OPERATION_LIST_ADAPTER.validate_python([row._mapping for row in rows]))
+
+def _render_listing(operations: List[Any]) -> bytes:
+    return _render_operation_rows(operations) if FAST_SERIALIZATION else _render_operations(operations)
+
+# Genera una línea JSON por operación a medida que llegan las filas; usa su propia sesión
+# porque la respuesta se sigue enviando después de que termina el endpoint
+async def _stream_active_operations() -> AsyncIterator[bytes]:
+    async with ReadSessionLocal() as db:
+        async for operation in crud.stream_active_operations(db, STREAM_BATCH_SIZE):
+            yield py_schemas.Operation.model_validate(operation).model_dump_json().encode() + b"\n"
+
+# Sin parámetros devuelve todas las operaciones activas. Con limit y/o cursor pagina por
+# (deadline, id) y deja el cursor de la siguiente página en el encabezado X-Next-Cursor.
+# Con "Accept: application/x-ndjson" transmite las operaciones una por línea.
 @router.get("/operations", response_model=List[py_schemas.Operation], status_code=status.HTTP_200_OK)
 async def list_active_operations(
-    db: AsyncSession = Depends(get_db)
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db)
 ) -> List[py_schemas.Operation]:
     
+    if NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+        return StreamingResponse(_stream_active_operations(), media_type=NDJSON_MEDIA_TYPE)
+
+    # Carga la página pedida desde la base de datos y la serializa para la caché
+    async def load():
+        if limit is None and cursor is None:
+            # Obtener todas las operaciones activas (que no están cerradas y no han alcanzado la fecha límite)
+            operations = await crud.get_active_operations(db, columns_only=FAST_SERIALIZATION)
+            return _render_listing(operations), {}
+
+        after = None
+        if cursor is not None:
+            after_deadline, after_id = decode_cursor(cursor, 2)
+            after = (date.fromisoformat(after_deadline), int(after_id))
+
+        operations, last_key = await crud.get_active_operations_page(db, limit or 100, after, columns_only=FAST_SERIALIZATION)
+        headers = {"X-Next-Cursor": encode_cursor(*last_key)} if last_key is not None else {}
+        return _render_listing(operations), headers
+
     try:
-        # Obtener todas las operaciones activas (que no están cerradas y no han alcanzado la fecha límite)
-        operations = await crud.get_active_operations(db)
-        return operations
+        entry = await operation_cache.get_or_load((LISTING, limit, cursor), load)
+        return _cached_response(request, entry)
 
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    except HTTPException:
+        raise
     except SQLAlchemyError as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}")
     except Exception as e:
@@ -92,17 +223,25 @@ async def list_active_operations(
 # --- Obtener información de una operación ---
 @router.get("/operation/{operation_id}", response_model=py_schemas.Operation, status_code=status.HTTP_200_OK)
 async def get_operation(
-    operation_id = int,
-    db: AsyncSession = Depends(get_db)
+    operation_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_read_db)
 ) -> py_schemas.Operation:
     
+    # Carga la operación desde la base de datos (None si no existe)
+    async def load():
+        operation = await crud.get_operation_by_id(db, operation_id)
+        if not operation:
+            return None
+        return _render_json(py_schemas.Operation.model_validate(operation)), {}
+
     # Verificar si la operación existe
-    operation = await crud.get_operation_by_id(db, operation_id)
-    if not operation:
+    entry = await operation_cache.get_or_load((OPERATION, operation_id), load)
+    if entry is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Operation not found.")
     
     try:
-        return operation
+        return _cached_response(request, entry)
 
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
@@ -113,20 +252,95 @@ async def get_operation(
 
 
 
-# --- Actualizar operaciones expiradas (diariamente) ---
-@router.put("/operations/update-expired", status_code=status.HTTP_204_NO_CONTENT)
+# --- Panel del operador (solo el propio operador) ---
+# Los totales salen de operator_summaries y cada operación trae sus estadísticas de ofertas:
+# la petición no agrega sobre las ofertas, su costo no crece con el número de operaciones
+@router.get("/operator/{operator_id}/operations", response_model=py_schemas.OperatorDashboard, status_code=status.HTTP_200_OK)
+async def get_operator_dashboard(
+    operator_id: str,
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: py_schemas.User = Depends(get_current_user)
+) -> py_schemas.OperatorDashboard:
+
+    # Verificar que el usuario autenticado sea el operador del panel
+    if current_user.role != "operador" or str(current_user.id) != operator_id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You do not have permission to view this dashboard.")
+
+    try:
+        after = int(decode_cursor(cursor, 1)[0]) if cursor is not None else None
+        operations, last_id = await crud.get_operator_operations_page(db, operator_id, limit, after)
+        summary = await crud.get_operator_summary(db, operator_id)
+        if last_id is not None:
+            response.headers["X-Next-Cursor"] = encode_cursor(last_id)
+        return py_schemas.OperatorDashboard(operator_id=current_user.id, summary=summary, operations=operations)
+
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    except HTTPException:
+        raise
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal server error: {e}")
+
+
+
+# --- Eventos en vivo de una operación (Server-Sent Events) ---
+# Emite "funding" con cada cambio de amount_collected, "closed"/"expired" al cerrarse y
+# "deleted" si se elimina (y entonces termina el stream).
+@router.get("/operation/{operation_id}/events", status_code=status.HTTP_200_OK)
+async def operation_events_stream(
+    operation_id: int,
+):
+
+    # Verificar si la operación existe con una sesión propia que se cierra antes de transmitir:
+    # una dependencia con yield mantendría la conexión ocupada mientras dure el stream
+    async with ReadSessionLocal() as db:
+        operation = await crud.get_operation_by_id(db, operation_id)
+    if not operation:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Operation not found.")
+
+    async def stream() -> AsyncIterator[bytes]:
+        async with operation_events.subscribe(operation_id) as queue:
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), EVENTS_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+                    continue
+                yield event.to_sse()
+                if event.kind == DELETED:
+                    break
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+
+# --- Actualizar operaciones expiradas ---
+# El programador de vencimientos las cierra automáticamente; este endpoint fuerza un barrido
+@router.put("/operations/update-expired", status_code=status.HTTP_200_OK)
 async def update_expired_operations(
     db: AsyncSession = Depends(get_db)
 ):
     
     try:
-        # Actualizar operaciones cuya fecha límite ha pasado y devolver las actualizadas
-        await crud.update_expired_operations(db)
+        # Cerrar por lotes las operaciones cuya fecha límite ha pasado (asignando sus ofertas)
+        # e informar cuántas se cerraron
+        closed = await crud.update_expired_operations(db, settle=ALLOCATE_ON_CLOSE)
+        return {"closed_operations": closed}
 
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    except HTTPException:
+        raise
     except SQLAlchemyError as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}")
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal server error: {e}")
-
@@ -1,4 +1,3 @@
-import jwt
 import os
 from datetime import datetime, timedelta, timezone
 
@@ -18,5 +17,8 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     else:
         expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
+    # PyJWT se importa al primer login, no al arrancar el worker
+    import jwt
+
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
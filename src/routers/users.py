@@ -1,16 +1,17 @@
-from typing import Any
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime
+from typing import Any, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 import database.crud as crud
 import database.sql_models as sql_models
 import models.py_schemas as py_schemas
-from dependencies import get_db
-from passlib.context import CryptContext
+from dependencies import get_db, get_read_db, get_current_user
+from database.pagination import encode_cursor, decode_cursor
+from routers.admin import ADMIN_ROLE
 from routers.token_generator import create_access_token
 from sqlalchemy.exc import SQLAlchemyError
 from fastapi.security import OAuth2PasswordRequestForm
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from services.hashing import password_hasher
 
 router = APIRouter(tags=["Usuarios"])
 
@@ -22,6 +23,10 @@ async def create_user(
     db: AsyncSession = Depends(get_db),
 ) -> py_schemas.User:
     
+    # El rol de administrador no se obtiene por registro
+    if user_create_data.role == ADMIN_ROLE:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin users cannot be self-registered.")
+
     # Verificar si el nombre de usuario ya está registrado
     existing_user = await crud.get_user_by_username(db, user_create_data.username)
     if existing_user:
@@ -34,6 +39,8 @@ async def create_user(
 
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    except HTTPException:
+        raise
     except SQLAlchemyError as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Database error.")
     except Exception as e:
@@ -52,7 +59,7 @@ async def login(
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials.")
     
     # Verificar la contraseña
-    if not pwd_context.verify(form_data.password, user.password_hash):  # form_data.password en lugar de password
+    if not await password_hasher.verify(form_data.password, user.password_hash):  # form_data.password en lugar de password
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials.")
         
     try:
@@ -94,7 +101,7 @@ async def delete_user(
 @router.get("/user/{user_id}", status_code=status.HTTP_200_OK)
 async def get_user(
     user_id: str,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     
     # Verificar si el nombre de usuario ya está registrado
@@ -113,3 +120,85 @@ async def get_user(
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}")
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal server error: {e}")
+
+
+
+# --- Cartera del inversor (solo el propio usuario) ---
+# Una página de sus ofertas con el estado de cada operación y los totales de la cartera, en dos
+# consultas sin importar cuántas ofertas tenga. La página siguiente se pide con X-Next-Cursor.
+@router.get("/user/{user_id}/portfolio", response_model=py_schemas.Portfolio, status_code=status.HTTP_200_OK)
+async def get_portfolio(
+    user_id: str,
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: py_schemas.User = Depends(get_current_user)
+) -> py_schemas.Portfolio:
+
+    # Verificar que el usuario autenticado sea el dueño de la cartera
+    if str(current_user.id) != user_id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You do not have permission to view this portfolio.")
+
+    try:
+        after = None
+        if cursor is not None:
+            after_date, after_id = decode_cursor(cursor, 2)
+            after = (datetime.fromisoformat(after_date), int(after_id))
+
+        positions, last_key = await crud.get_investor_positions_page(db, user_id, limit, after)
+        totals = await crud.get_investor_portfolio_totals(db, user_id)
+        if last_key is not None:
+            response.headers["X-Next-Cursor"] = encode_cursor(*last_key)
+        return py_schemas.Portfolio(
+            user_id=current_user.id,
+            totals=totals,
+            positions=[py_schemas.PortfolioPosition.model_validate(position) for position in positions],
+        )
+
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    except HTTPException:
+        raise
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal server error: {e}")
+
+
+# --- Actualizar usuario (solo el propio usuario) ---
+# Aplica todos los campos enviados con un único UPDATE; la contraseña se guarda hasheada
+USER_ROLES = ("operador", "inversor")
+
+@router.patch("/user/{user_id}", response_model=py_schemas.User, status_code=status.HTTP_200_OK)
+async def update_user(
+    user_id: str,
+    user_update_data: py_schemas.UserUpdate,
+    db: AsyncSession = Depends(get_db),
+    current_user: py_schemas.User = Depends(get_current_user)
+) -> py_schemas.User:
+
+    # Verificar que el usuario autenticado sea el que se actualiza
+    if str(current_user.id) != user_id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You do not have permission to update this user.")
+
+    if not crud._patch_values(user_update_data):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No fields to update.")
+    if user_update_data.role is not None and user_update_data.role not in USER_ROLES:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f"Role must be one of: {', '.join(USER_ROLES)}.")
+
+    try:
+        user = await crud.patch_user(db, user_id, user_update_data)
+
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    except HTTPException:
+        raise
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal server error: {e}")
+
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found.")
+    return user
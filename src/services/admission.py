@@ -0,0 +1,174 @@
+import asyncio
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+from cachetools import TTLCache
+from fastapi import Depends, HTTPException, status
+import models.py_schemas as py_schemas
+from dependencies import get_current_user_short_session
+from services.metrics import ADMISSION_IN_FLIGHT, ADMISSION_LIMIT, ADMISSION_QUEUE_DEPTH, ADMISSION_REJECTED
+
+# Configuración del control de admisión de las rutas de escritura (por worker)
+ADMISSION_ENABLED = os.environ.get("ADMISSION_ENABLED", "1") == "1"
+ADMISSION_CONCURRENCY = int(os.environ.get("ADMISSION_CONCURRENCY", 8))
+ADMISSION_QUEUE_SIZE = int(os.environ.get("ADMISSION_QUEUE_SIZE", 32))
+ADMISSION_LATENCY_TARGET_MS = int(os.environ.get("ADMISSION_LATENCY_TARGET_MS", 500))
+RATE_LIMIT_PER_SECOND = float(os.environ.get("RATE_LIMIT_PER_SECOND", 10))
+RATE_LIMIT_BURST = int(os.environ.get("RATE_LIMIT_BURST", 20))
+RATE_LIMIT_MAX_USERS = int(os.environ.get("RATE_LIMIT_MAX_USERS", 10000))
+
+
+# --- Límite de concurrencia por ruta --- #
+# Admite hasta `limit` peticiones simultáneas; las demás esperan en una cola acotada. Rechaza
+# con 503 y Retry-After, sin esperar, si la cola está llena o si la espera estimada (según la
+# duración media de las peticiones recientes) supera el objetivo de latencia.
+class ConcurrencyLimiter:
+    def __init__(self, route: str, limit: int, queue_size: int, latency_target: float):
+        self.route = route
+        self.limit = limit
+        self.queue_size = queue_size
+        self.latency_target = latency_target
+        self.active = 0
+        self.waiting = 0
+        self.service_time = 0.0  # media móvil exponencial de la duración, en segundos
+        self.rejected: Dict[str, int] = {}
+        self._semaphore = asyncio.Semaphore(limit)
+        ADMISSION_LIMIT.labels(route).set(limit)
+
+    def expected_wait(self) -> float:
+        return (self.waiting + 1) * self.service_time / self.limit
+
+    def _reject(self, reason: str) -> HTTPException:
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+        ADMISSION_REJECTED.labels(self.route, reason).inc()
+        retry_after = max(1, math.ceil(self.expected_wait()))
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="The server is busy, please retry later.",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+    @asynccontextmanager
+    async def admit(self) -> AsyncIterator[None]:
+        if self.active >= self.limit:
+            if self.waiting >= self.queue_size:
+                raise self._reject("queue_full")
+            if self.expected_wait() > self.latency_target:
+                raise self._reject("latency_target")
+
+        self.waiting += 1
+        ADMISSION_QUEUE_DEPTH.labels(self.route).inc()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.latency_target)
+        except asyncio.TimeoutError:
+            raise self._reject("timeout")
+        finally:
+            self.waiting -= 1
+            ADMISSION_QUEUE_DEPTH.labels(self.route).dec()
+
+        self.active += 1
+        ADMISSION_IN_FLIGHT.labels(self.route).inc()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.service_time = elapsed if self.service_time == 0 else 0.8 * self.service_time + 0.2 * elapsed
+            self.active -= 1
+            ADMISSION_IN_FLIGHT.labels(self.route).dec()
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "waiting": self.waiting,
+            "service_time_ms": self.service_time * 1000,
+            "rejected": dict(self.rejected),
+        }
+
+
+# --- Límite de peticiones por usuario (token bucket) --- #
+# Cada usuario acumula `rate` fichas por segundo hasta `burst`; cada petición gasta una.
+# Los buckets viven en una caché acotada: uno que no se usa en burst/rate segundos ya estaría
+# lleno, así que expulsarlo no cambia el resultado.
+class TokenBucketLimiter:
+    def __init__(self, rate: float, burst: int, max_keys: int):
+        self.rate = rate
+        self.burst = burst
+        self._buckets = TTLCache(maxsize=max_keys, ttl=max(burst / rate, 1))
+
+    # Devuelve None si la petición se admite o los segundos a esperar por la siguiente ficha
+    def check(self, key: str) -> Optional[float]:
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens < 1:
+            self._buckets[key] = (tokens, now)
+            return (1 - tokens) / self.rate
+        self._buckets[key] = (tokens - 1, now)
+        return None
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+# --- Control de admisión --- #
+class AdmissionController:
+    def __init__(self, concurrency: int, queue_size: int, latency_target_ms: int, rate: float, burst: int, max_users: int):
+        self.enabled = ADMISSION_ENABLED
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.latency_target = latency_target_ms / 1000
+        self.rate_limiter = TokenBucketLimiter(rate, burst, max_users)
+        self.rate_limited = 0
+        self._limiters: Dict[str, ConcurrencyLimiter] = {}
+
+    def limiter(self, route: str) -> ConcurrencyLimiter:
+        if route not in self._limiters:
+            self._limiters[route] = ConcurrencyLimiter(route, self.concurrency, self.queue_size, self.latency_target)
+        return self._limiters[route]
+
+    # Dependencia para una ruta de escritura: primero el límite del usuario autenticado (429)
+    # y luego el de concurrencia de la ruta (503), que se mantiene hasta terminar la petición.
+    # El usuario se resuelve sin la sesión de get_db: las peticiones en cola no retienen conexiones.
+    def guard(self, route: str):
+        async def dependency(current_user: py_schemas.User = Depends(get_current_user_short_session)) -> AsyncIterator[None]:
+            if not self.enabled:
+                yield
+                return
+
+            retry_after = self.rate_limiter.check(str(current_user.id))
+            if retry_after is not None:
+                self.rate_limited += 1
+                ADMISSION_REJECTED.labels(route, "rate_limit").inc()
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Too many requests, please slow down.",
+                    headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+                )
+
+            async with self.limiter(route).admit():
+                yield
+
+        return dependency
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "rate_limited": self.rate_limited,
+            "tracked_users": len(self.rate_limiter),
+            "routes": {route: limiter.stats() for route, limiter in self._limiters.items()},
+        }
+
+
+admission = AdmissionController(
+    ADMISSION_CONCURRENCY,
+    ADMISSION_QUEUE_SIZE,
+    ADMISSION_LATENCY_TARGET_MS,
+    RATE_LIMIT_PER_SECOND,
+    RATE_LIMIT_BURST,
+    RATE_LIMIT_MAX_USERS,
+)
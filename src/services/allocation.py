@@ -0,0 +1,71 @@
+import os
+from typing import TYPE_CHECKING
+
+# numpy se importa al primer uso para no cargarlo en el arranque de cada worker
+if TYPE_CHECKING:
+    import numpy as np
+
+# Asignar las ofertas de cada operación cuando el barrido de vencimientos la cierra
+ALLOCATE_ON_CLOSE = os.environ.get("ALLOCATE_ON_CLOSE", "1") == "1"
+
+# Mayor entero exacto en int64: por encima se calcula el prorrateo con enteros de Python
+_INT64_MAX = 2**63 - 1
+
+
+# --- Motor de asignación de ofertas --- #
+# Asigna el monto requerido (capacity) entre las ofertas por prioridad de tasa: primero las de
+# menor interest_rate, completas, hasta agotar el cupo. Las ofertas de la tasa marginal (la
+# que ya no cabe completa) se reparten el cupo restante a prorrata de su monto; los centavos
+# sobrantes del redondeo van a los mayores restos y, a igualdad, a la oferta más antigua (menor id).
+# Trabaja en centavos enteros para que la suma asignada sea exacta. Devuelve el monto asignado
+# a cada oferta, en centavos y en el mismo orden de la entrada.
+def allocate(bid_ids: "np.ndarray", amounts: "np.ndarray", rates: "np.ndarray", capacity: int) -> "np.ndarray":
+    import numpy as np
+
+    amounts = np.asarray(amounts, dtype=np.int64)
+    allocated = np.zeros(len(amounts), dtype=np.int64)
+    if len(amounts) == 0 or capacity <= 0:
+        return allocated
+
+    # Orden por tasa. El orden dentro de una misma tasa no cambia qué tasa es la marginal,
+    # así que basta un ordenamiento no estable; solo el tramo marginal se ordena por id.
+    order = np.argsort(rates)
+    sorted_amounts = amounts[order]
+    sorted_rates = rates[order]
+    cumulative = np.cumsum(sorted_amounts)
+
+    # Hay cupo para todas las ofertas
+    if cumulative[-1] <= capacity:
+        return amounts.copy()
+
+    # Primera oferta que ya no cabe completa: su tasa es la marginal
+    marginal = int(np.searchsorted(cumulative, capacity, side="right"))
+    marginal_rate = sorted_rates[marginal]
+    tier_start = int(np.searchsorted(sorted_rates, marginal_rate, side="left"))
+    tier_end = int(np.searchsorted(sorted_rates, marginal_rate, side="right"))
+    tier_order = order[tier_start:tier_end]
+    tier_order = tier_order[np.argsort(bid_ids[tier_order], kind="stable")]
+
+    # Las ofertas con tasa menor que la marginal se asignan completas
+    allocated[order[:tier_start]] = sorted_amounts[:tier_start]
+    remaining = capacity - (int(cumulative[tier_start - 1]) if tier_start > 0 else 0)
+
+    # Prorrateo del cupo restante entre las ofertas de la tasa marginal
+    tier = amounts[tier_order]
+    tier_total = int(cumulative[tier_end - 1]) - (int(cumulative[tier_start - 1]) if tier_start > 0 else 0)
+    if int(tier.max()) * remaining <= _INT64_MAX:
+        numerators = tier * remaining
+        shares = numerators // tier_total
+        remainders = numerators - shares * tier_total
+    else:
+        numerators = tier.astype(object) * remaining
+        shares = (numerators // tier_total).astype(np.int64)
+        remainders = (numerators % tier_total).astype(np.float64)
+
+    # Centavos sobrantes: mayores restos primero; lexsort es estable y conserva el orden por id
+    leftover = remaining - int(shares.sum())
+    if leftover > 0:
+        shares[np.lexsort((np.arange(len(tier)), -remainders))[:leftover]] += 1
+
+    allocated[tier_order] = shares
+    return allocated
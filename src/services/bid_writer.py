@@ -0,0 +1,102 @@
+import asyncio
+import os
+from typing import List, Optional, Tuple
+import database.crud as crud
+import models.py_schemas as py_schemas
+from database.database import SessionLocal
+
+# Modo de escritura de POST /bid: "direct" (una transacción por oferta) o "group" (group commit)
+BID_INGESTION_MODE = os.environ.get("BID_INGESTION_MODE", "direct")
+BID_WRITER_MAX_BATCH = int(os.environ.get("BID_WRITER_MAX_BATCH", 200))
+BID_WRITER_LINGER_MS = float(os.environ.get("BID_WRITER_LINGER_MS", 2))
+
+# Oferta en cola: datos, inversor y el futuro que recibe el resultado
+QueuedBid = Tuple[py_schemas.BidCreate, str, asyncio.Future]
+
+
+# --- Escritura agrupada de ofertas (group commit) --- #
+# Las rutas encolan cada oferta y esperan su resultado. Una tarea en segundo plano toma la
+# primera oferta de la cola, espera hasta BID_WRITER_LINGER_MS a que lleguen más (si la cola no
+# tiene ya BID_WRITER_MAX_BATCH) y las escribe todas en una sola transacción con
+# crud.accept_bids_group: un commit por grupo en lugar de uno por oferta. Mientras un grupo se
+# escribe, las ofertas nuevas se acumulan para el siguiente. Hay un escritor por worker.
+class BidWriter:
+    def __init__(self, max_batch: int, linger_ms: float):
+        self.enabled = BID_INGESTION_MODE == "group"
+        self.max_batch = max(max_batch, 1)
+        self.linger = linger_ms / 1000
+        self.batches = 0
+        self.bids = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    # Devuelve la oferta creada o None si la operación no la admite, como crud.accept_bid
+    async def submit(self, data: py_schemas.BidCreate, current_user: py_schemas.User) -> Optional[py_schemas.Bid]:
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((data, str(current_user.id), future))
+        return await future
+
+    async def _next_batch(self) -> List[QueuedBid]:
+        batch = [await self._queue.get()]
+        if self._queue.qsize() < self.max_batch - 1 and self.linger > 0:
+            await asyncio.sleep(self.linger)
+        while len(batch) < self.max_batch and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        # Las peticiones canceladas (cliente desconectado) ya no esperan su oferta
+        return [item for item in batch if not item[2].done()]
+
+    async def _write(self, batch: List[QueuedBid]) -> None:
+        try:
+            async with SessionLocal() as db:
+                results = await crud.accept_bids_group(db, [(data, investor_id) for data, investor_id, _ in batch])
+        except asyncio.CancelledError:
+            for _, _, future in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.bids += len(batch)
+        for (_, _, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._next_batch()
+            if batch:
+                await self._write(batch)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            # Las ofertas que quedaron en cola no se escribieron
+            while not self._queue.empty():
+                _, _, future = self._queue.get_nowait()
+                if not future.done():
+                    future.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "batches": self.batches,
+            "bids": self.bids,
+            "average_batch": self.bids / self.batches if self.batches else 0.0,
+        }
+
+
+bid_writer = BidWriter(BID_WRITER_MAX_BATCH, BID_WRITER_LINGER_MS)
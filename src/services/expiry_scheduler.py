@@ -0,0 +1,131 @@
+import asyncio
+import heapq
+import os
+from datetime import date, datetime, time, timedelta, timezone
+from typing import List, Optional, Set
+
+import database.crud as crud
+from database.database import SessionLocal
+from services.allocation import ALLOCATE_ON_CLOSE
+
+# Configuración del programador de vencimientos
+EXPIRY_SCHEDULER_ENABLED = os.environ.get("EXPIRY_SCHEDULER_ENABLED", "1") == "1"
+EXPIRY_CHUNK_SIZE = int(os.environ.get("EXPIRY_CHUNK_SIZE", 500))
+EXPIRY_REFRESH_SECONDS = int(os.environ.get("EXPIRY_REFRESH_SECONDS", 300))
+EXPIRY_RETRY_SECONDS = 30
+
+# Archivo de operaciones cerradas (opcional): en cada recarga mueve como máximo
+# ARCHIVE_MAX_BATCHES lotes, para no alargar el ciclo del programador
+ARCHIVE_ENABLED = os.environ.get("ARCHIVE_ENABLED", "0") == "1"
+ARCHIVE_RETENTION_DAYS = int(os.environ.get("ARCHIVE_RETENTION_DAYS", 365))
+ARCHIVE_BATCH_SIZE = int(os.environ.get("ARCHIVE_BATCH_SIZE", 200))
+ARCHIVE_MAX_BATCHES = int(os.environ.get("ARCHIVE_MAX_BATCHES", 10))
+
+
+# Momento en que vence una fecha límite: el comienzo del día siguiente en UTC (mismo criterio
+# que crud.update_expired_operations)
+def due_at(deadline: date) -> datetime:
+    return datetime.combine(deadline + timedelta(days=1), time.min, tzinfo=timezone.utc)
+
+
+# --- Programador de vencimientos --- #
+# Mantiene un min-heap con las fechas límite distintas de las operaciones abiertas y ejecuta el
+# barrido por lotes cuando vence la más próxima. Recarga las fechas cada EXPIRY_REFRESH_SECONDS
+# para ver las operaciones creadas en otros workers y, con la misma frecuencia, elimina las
+# claves de idempotencia vencidas y archiva las operaciones cerradas hace tiempo. Cada worker de uvicorn ejecuta su propio
+# programador: el barrido es idempotente y bloquea filas con SKIP LOCKED, por lo que es seguro
+# que varios coincidan.
+class ExpiryScheduler:
+    def __init__(self, chunk_size: int, refresh_seconds: int):
+        self.chunk_size = chunk_size
+        self.refresh_seconds = refresh_seconds
+        self.last_closed = 0
+        self._heap: List[date] = []
+        self._scheduled: Set[date] = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def schedule(self, deadline: date) -> None:
+        if deadline in self._scheduled:
+            return
+        self._scheduled.add(deadline)
+        heapq.heappush(self._heap, deadline)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def sweep(self) -> int:
+        async with SessionLocal() as db:
+            self.last_closed = await crud.update_expired_operations(db, self.chunk_size, settle=ALLOCATE_ON_CLOSE)
+        return self.last_closed
+
+    async def purge_idempotency_keys(self) -> int:
+        async with SessionLocal() as db:
+            return await crud.purge_expired_idempotency_keys(db)
+
+    async def archive(self) -> int:
+        if not ARCHIVE_ENABLED:
+            return 0
+        async with SessionLocal() as db:
+            return await crud.archive_closed_operations(
+                db, timedelta(days=ARCHIVE_RETENTION_DAYS), ARCHIVE_BATCH_SIZE, ARCHIVE_MAX_BATCHES
+            )
+
+    async def _reload(self) -> None:
+        async with SessionLocal() as db:
+            deadlines = await crud.get_open_operation_deadlines(db)
+        self._heap = list(set(deadlines))
+        heapq.heapify(self._heap)
+        self._scheduled = set(self._heap)
+
+    async def _run(self) -> None:
+        next_refresh = datetime.now(timezone.utc)
+        while True:
+            try:
+                now = datetime.now(timezone.utc)
+                if now >= next_refresh:
+                    await self.sweep()
+                    await self._reload()
+                    await self.purge_idempotency_keys()
+                    await self.archive()
+                    next_refresh = now + timedelta(seconds=self.refresh_seconds)
+
+                # Descartar las fechas vencidas y barrer una sola vez por todas ellas
+                due = False
+                while self._heap and due_at(self._heap[0]) <= now:
+                    self._scheduled.discard(heapq.heappop(self._heap))
+                    due = True
+                if due:
+                    await self.sweep()
+                    continue
+
+                wake_at = next_refresh
+                if self._heap:
+                    wake_at = min(wake_at, due_at(self._heap[0]))
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), (wake_at - now).total_seconds())
+                except asyncio.TimeoutError:
+                    pass
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error in expiry scheduler: {str(e)}")
+                await asyncio.sleep(EXPIRY_RETRY_SECONDS)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+expiry_scheduler = ExpiryScheduler(EXPIRY_CHUNK_SIZE, EXPIRY_REFRESH_SECONDS)
@@ -0,0 +1,144 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from fastapi import HTTPException, status
+from services.metrics import BCRYPT_DURATION
+
+# passlib se importa al primer uso (primer registro o login), no al arrancar el worker
+_pwd_context = None
+
+def get_pwd_context():
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _pwd_context
+
+# Configuración del pool de hashing (bcrypt libera el GIL, por lo que un pool de hilos es suficiente).
+# Por defecto deja un núcleo libre para el event loop del worker.
+HASH_POOL_SIZE = int(os.environ.get("HASH_POOL_SIZE", max(1, (os.cpu_count() or 1) - 1)))
+# Prioridad (nice) de los hilos de bcrypt: cuando compiten por la CPU con el event loop, el
+# planificador favorece al event loop y las lecturas no esperan a los logins. 0 la desactiva.
+HASH_THREAD_NICE = int(os.environ.get("HASH_THREAD_NICE", 19))
+HASH_QUEUE_SIZE = int(os.environ.get("HASH_QUEUE_SIZE", 64))
+HASH_RETRY_AFTER = int(os.environ.get("HASH_RETRY_AFTER", 1))
+
+
+# En Linux la prioridad es por hilo (setpriority sobre el id nativo del hilo); en otros
+# sistemas afectaría a todo el proceso, así que no se cambia
+def _lower_thread_priority() -> None:
+    if HASH_THREAD_NICE <= 0 or not hasattr(os, "setpriority") or not os.path.exists("/proc/self/task"):
+        return
+    try:
+        thread_id = threading.get_native_id()
+        os.setpriority(os.PRIO_PROCESS, thread_id, os.getpriority(os.PRIO_PROCESS, thread_id) + HASH_THREAD_NICE)
+    except OSError as e:
+        print(f"Could not lower the bcrypt thread priority: {str(e)}")
+
+
+# --- Servicio de hashing de contraseñas --- #
+# Ejecuta bcrypt fuera del event loop en un pool acotado. Si hay más trabajos pendientes
+# que hilos + cola, rechaza con 503 y Retry-After en lugar de encolar sin límite.
+class PasswordHasher:
+    def __init__(self, pool_size: int, queue_size: int, retry_after: int):
+        self.pool_size = pool_size
+        self.max_pending = pool_size + queue_size
+        self.retry_after = retry_after
+        self.pending = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.pool_size, thread_name_prefix="bcrypt", initializer=_lower_thread_priority
+            )
+        return self._executor
+
+    # Se ejecuta en el hilo del pool y registra la duración de bcrypt
+    @staticmethod
+    def _timed(operation: str, func, *args):
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            BCRYPT_DURATION.labels(operation).observe(time.perf_counter() - start)
+
+    async def _run(self, operation: str, func, *args):
+        if self.pending >= self.max_pending:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Password hashing service is busy, please retry later.",
+                headers={"Retry-After": str(self.retry_after)},
+            )
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), self._timed, operation, func, *args)
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", get_pwd_context().hash, password)
+
+    async def verify(self, password: str, password_hash: str) -> bool:
+        return await self._run("verify", get_pwd_context().verify, password, password_hash)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(HASH_POOL_SIZE, HASH_QUEUE_SIZE, HASH_RETRY_AFTER)
+
+
+# --- Hashing masivo de contraseñas --- #
+# Las importaciones masivas reparten sus hashes en un pool de procesos con un worker por núcleo
+# (IMPORT_HASH_WORKERS), separado del pool acotado de las peticiones. Los workers se crean con
+# "spawn" para no heredar el event loop ni las conexiones del proceso de la app.
+IMPORT_HASH_WORKERS = int(os.environ.get("IMPORT_HASH_WORKERS", os.cpu_count() or 1))
+
+
+# Se ejecuta en un worker del pool: hashea un bloque de contraseñas
+def _hash_many(passwords: List[str]) -> List[str]:
+    context = get_pwd_context()
+    return [context.hash(password) for password in passwords]
+
+
+class BulkPasswordHasher:
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._executor = None
+
+    # concurrent.futures.process y multiprocessing se importan con la primera importación masiva
+    def _get_executor(self):
+        if self._executor is None:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    # Hashes en el mismo orden que las contraseñas. Se envían unos pocos bloques por worker para
+    # repartir la carga sin pagar la comunicación entre procesos por cada contraseña.
+    async def hash_many(self, passwords: List[str]) -> List[str]:
+        if not passwords:
+            return []
+        size = max(1, -(-len(passwords) // (self.workers * 4)))
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        chunks = await asyncio.gather(*(
+            loop.run_in_executor(executor, _hash_many, passwords[index:index + size])
+            for index in range(0, len(passwords), size)
+        ))
+        return [password_hash for chunk in chunks for password_hash in chunk]
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+bulk_password_hasher = BulkPasswordHasher(IMPORT_HASH_WORKERS)
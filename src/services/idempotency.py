@@ -0,0 +1,195 @@
+import asyncio
+import hashlib
+import os
+import time
+from typing import AsyncIterator, Dict, NamedTuple, Optional, Tuple
+from cachetools import TTLCache
+from fastapi import Depends, Header, HTTPException, Request, Response, status
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+import database.crud as crud
+import database.sql_models as sql_models
+import models.py_schemas as py_schemas
+from dependencies import get_db, get_current_user
+
+# Configuración de las claves de idempotencia
+IDEMPOTENCY_TTL_SECONDS = int(os.environ.get("IDEMPOTENCY_TTL_SECONDS", 86400))
+IDEMPOTENCY_CACHE_SIZE = int(os.environ.get("IDEMPOTENCY_CACHE_SIZE", 10000))
+# Espera máxima por una petición original que sigue en curso (por ejemplo, en otro worker)
+IDEMPOTENCY_WAIT_SECONDS = float(os.environ.get("IDEMPOTENCY_WAIT_SECONDS", 5))
+IDEMPOTENCY_POLL_SECONDS = 0.05
+
+# Encabezado que marca las respuestas repetidas
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+# Respuesta original de una petición con clave de idempotencia
+class StoredResponse(NamedTuple):
+    fingerprint: str
+    status_code: int
+    body: str
+
+
+# Huella de la petición: la misma clave con otra ruta u otro cuerpo es un error del cliente
+def request_fingerprint(route: str, body: bytes) -> str:
+    return hashlib.sha256(route.encode() + b"\n" + body).hexdigest()
+
+
+def _check_fingerprint(stored: str, fingerprint: str) -> None:
+    if stored != fingerprint:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="This Idempotency-Key was already used with a different request.",
+        )
+
+
+# Reserva de una clave para la petición en curso. Si la petición ya se había procesado,
+# `replay` contiene la respuesta original y la ruta debe devolverla sin escribir nada.
+class IdempotencyClaim:
+    def __init__(
+        self,
+        store: "IdempotencyStore",
+        user_id: str,
+        key: Optional[str],
+        fingerprint: str,
+        replay: Optional[Response] = None,
+        inflight: Optional[asyncio.Future] = None,
+    ):
+        self.store = store
+        self.user_id = user_id
+        self.key = key
+        self.fingerprint = fingerprint
+        self.replay = replay
+        self._inflight = inflight
+
+    # Guarda la respuesta de la petición original (no hace nada sin clave)
+    async def complete(self, db: AsyncSession, status_code: int, response: BaseModel) -> None:
+        if self.key is None or self.replay is not None:
+            return
+        body = response.model_dump_json()
+        if await crud.complete_idempotency_key(db, self.user_id, self.key, status_code, body):
+            self.store.remember(self.user_id, self.key, StoredResponse(self.fingerprint, status_code, body))
+        self.release()
+
+    # Despierta a los reintentos de este worker que esperan a la petición original
+    def release(self) -> None:
+        if self._inflight is not None:
+            self.store.release(self.user_id, self.key, self._inflight)
+            self._inflight = None
+
+
+# --- Claves de idempotencia --- #
+# Las respuestas originales se guardan en la tabla idempotency_keys, compartida por todos los
+# workers, y en una caché LRU con TTL por worker para repetirlas sin consultar la base de datos.
+# La clave se reserva en la misma transacción que la escritura, así que dos peticiones
+# simultáneas con la misma clave no pueden escribir las dos: la segunda espera a la primera
+# y repite su respuesta. Los reintentos que llegan al mismo worker mientras la original está
+# en curso la esperan en memoria, sin competir por la fila.
+class IdempotencyStore:
+    def __init__(self, maxsize: int, ttl: int):
+        self.ttl = ttl
+        self._cache = TTLCache(maxsize=max(maxsize, 1), ttl=max(ttl, 1))
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+        self.replays = 0
+
+    def remember(self, user_id: str, key: str, stored: StoredResponse) -> None:
+        self._cache[(user_id, key)] = stored
+
+    def release(self, user_id: str, key: str, future: asyncio.Future) -> None:
+        if self._inflight.get((user_id, key)) is future:
+            del self._inflight[(user_id, key)]
+        if not future.done():
+            future.set_result(None)
+
+    async def claim(self, db: AsyncSession, user_id: str, key: Optional[str], route: str, body: bytes) -> IdempotencyClaim:
+        fingerprint = request_fingerprint(route, body)
+        if key is None:
+            return IdempotencyClaim(self, user_id, None, fingerprint)
+
+        # Esperar a la petición original de este worker; si falla sin guardar respuesta,
+        # esta petición pasa a intentar la reserva
+        cache_key = (user_id, key)
+        stored = self._cache.get(cache_key)
+        while stored is None and cache_key in self._inflight:
+            try:
+                await asyncio.wait_for(asyncio.shield(self._inflight[cache_key]), IDEMPOTENCY_WAIT_SECONDS)
+            except asyncio.TimeoutError:
+                raise _in_progress()
+            stored = self._cache.get(cache_key)
+
+        if stored is None:
+            future = asyncio.get_running_loop().create_future()
+            self._inflight[cache_key] = future
+            try:
+                existing = await crud.claim_idempotency_key(db, user_id, key, fingerprint, self.ttl)
+            except BaseException:
+                self.release(user_id, key, future)
+                raise
+            if existing is None:
+                return IdempotencyClaim(self, user_id, key, fingerprint, inflight=future)
+
+            # La clave ya estaba confirmada (otra petición anterior o de otro worker)
+            self.release(user_id, key, future)
+            _check_fingerprint(existing.fingerprint, fingerprint)
+            stored = await self._wait_for_response(db, existing)
+        _check_fingerprint(stored.fingerprint, fingerprint)
+
+        self.replays += 1
+        replay = Response(
+            content=stored.body,
+            status_code=stored.status_code,
+            media_type="application/json",
+            headers={REPLAYED_HEADER: "true"},
+        )
+        return IdempotencyClaim(self, user_id, key, fingerprint, replay)
+
+    # La petición original ya confirmó su escritura pero puede no haber guardado aún la respuesta
+    async def _wait_for_response(self, db: AsyncSession, existing: sql_models.IdempotencyKey) -> StoredResponse:
+        user_id, key = existing.user_id, existing.key
+        deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+        while existing is not None and existing.status_code is None and time.monotonic() < deadline:
+            await asyncio.sleep(IDEMPOTENCY_POLL_SECONDS)
+            # Cerrar la transacción para leer lo confirmado desde entonces
+            await db.rollback()
+            existing = await crud.get_idempotency_key(db, user_id, key)
+
+        if existing is None or existing.status_code is None:
+            raise _in_progress()
+
+        stored = StoredResponse(existing.fingerprint, existing.status_code, existing.response_body)
+        self.remember(user_id, key, stored)
+        return stored
+
+    # Dependencia para las rutas de creación: lee la cabecera Idempotency-Key y entrega la reserva.
+    # Al terminar la petición libera a los reintentos que esperan aunque la ruta haya fallado.
+    def guard(self, route: str):
+        async def dependency(
+            request: Request,
+            idempotency_key: Optional[str] = Header(None, max_length=255),
+            db: AsyncSession = Depends(get_db),
+            current_user: py_schemas.User = Depends(get_current_user),
+        ) -> AsyncIterator[IdempotencyClaim]:
+            claim = await self.claim(db, str(current_user.id), idempotency_key, route, await request.body())
+            try:
+                yield claim
+            finally:
+                claim.release()
+
+        return dependency
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return {"replays": self.replays, "size": len(self._cache), "maxsize": self._cache.maxsize}
+
+
+def _in_progress() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="A request with this Idempotency-Key is still being processed.",
+        headers={"Retry-After": "1"},
+    )
+
+
+idempotency_store = IdempotencyStore(IDEMPOTENCY_CACHE_SIZE, IDEMPOTENCY_TTL_SECONDS)
@@ -0,0 +1,206 @@
+import os
+import re
+import time
+from typing import Tuple
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# Con varios workers de uvicorn, cada proceso escribe sus métricas en este directorio y
+# /metrics las agrega. Debe existir y estar vacío antes de arrancar los workers.
+PROMETHEUS_MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+
+# --- Definición de métricas --- #
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template.",
+    ["method", "route", "status"],
+)
+DB_STATEMENT_DURATION = Histogram(
+    "db_statement_duration_seconds",
+    "Database statement execution time.",
+    ["statement", "table"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out_connections",
+    "Connections currently checked out of the pool.",
+    ["engine"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_OVERFLOW = Gauge(
+    "db_pool_overflow_connections",
+    "Connections open beyond pool_size.",
+    ["engine"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_WAIT = Histogram(
+    "db_pool_wait_seconds",
+    "Time spent waiting to check a connection out of the pool.",
+    ["engine"],
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+)
+BCRYPT_DURATION = Histogram(
+    "bcrypt_duration_seconds",
+    "Time spent hashing or verifying passwords with bcrypt.",
+    ["operation"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 1.0, 2.5),
+)
+PRINCIPAL_CACHE_LOOKUPS = Counter(
+    "principal_cache_lookups",
+    "Authenticated principal lookups in get_current_user, by cache result.",
+    ["result"],
+)
+OPERATION_CACHE_LOOKUPS = Counter(
+    "operation_cache_lookups",
+    "GET /operations and GET /operation/{id} response cache lookups, by cache result.",
+    ["result"],
+)
+
+ADMISSION_IN_FLIGHT = Gauge(
+    "admission_in_flight_requests",
+    "Requests currently admitted by the per-route concurrency limiter.",
+    ["route"],
+    multiprocess_mode="livesum",
+)
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "admission_queue_depth",
+    "Requests waiting for a concurrency slot.",
+    ["route"],
+    multiprocess_mode="livesum",
+)
+ADMISSION_LIMIT = Gauge(
+    "admission_concurrency_limit",
+    "Concurrent requests allowed per route and worker.",
+    ["route"],
+    multiprocess_mode="max",
+)
+ADMISSION_REJECTED = Counter(
+    "admission_rejected_requests",
+    "Requests rejected by admission control.",
+    ["route", "reason"],
+)
+
+
+# Devuelve las métricas de este proceso o, en modo multiproceso, las de todos los workers
+def render() -> Tuple[bytes, str]:
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+def mark_process_dead() -> None:
+    if PROMETHEUS_MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+# --- Latencia por ruta --- #
+# Middleware ASGI que etiqueta cada petición con la plantilla de la ruta (p. ej. /operation/{operation_id})
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status_code[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.labels(
+                scope["method"], getattr(route, "path", "unmatched"), str(status_code[0])
+            ).observe(time.perf_counter() - start)
+
+
+# --- Tiempos de base de datos --- #
+_STATEMENT_PATTERNS = [
+    ("INSERT", re.compile(r"^\s*INSERT\s+INTO\s+[`\"]?(\w+)", re.IGNORECASE)),
+    ("UPDATE", re.compile(r"^\s*UPDATE\s+[`\"]?(\w+)", re.IGNORECASE)),
+    ("DELETE", re.compile(r"^\s*DELETE\s+FROM\s+[`\"]?(\w+)", re.IGNORECASE)),
+    ("SELECT", re.compile(r"^\s*SELECT\s.*?\sFROM\s+[`\"]?(\w+)", re.IGNORECASE | re.DOTALL)),
+]
+
+def classify_statement(statement: str) -> Tuple[str, str]:
+    for verb, pattern in _STATEMENT_PATTERNS:
+        match = pattern.match(statement)
+        if match:
+            return verb, match.group(1)
+    return statement.split(None, 1)[0].upper() if statement.strip() else "OTHER", ""
+
+
+# Pool que mide cuánto espera cada checkout (incluye abrir conexiones nuevas)
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    engine_name = "primary"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_WAIT.labels(self.engine_name).observe(time.perf_counter() - start)
+
+
+# Registra los eventos de SQLAlchemy que alimentan las métricas de sentencias y del pool
+def instrument_engine(engine: AsyncEngine, name: str = "primary") -> None:
+    sync_engine = engine.sync_engine
+
+    # El inicio se guarda en el contexto de ejecución y no en la conexión: after_cursor_execute
+    # no se dispara si la sentencia falla, y una pila por conexión crecería sin límite
+    def observe(statement: str, context) -> None:
+        started = getattr(context, "_query_start_time", None)
+        if started is not None:
+            DB_STATEMENT_DURATION.labels(*classify_statement(statement)).observe(time.perf_counter() - started)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._query_start_time = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        observe(statement, context)
+
+    # Las sentencias fallidas (timeouts, bloqueos) también cuentan en la latencia
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(exception_context):
+        if exception_context.statement is not None:
+            observe(exception_context.statement, exception_context.execution_context)
+
+    pool = sync_engine.pool
+    if isinstance(pool, InstrumentedQueuePool):
+        pool.engine_name = name
+
+    # El evento checkin se dispara antes de que el pool recupere la conexión, por eso se
+    # lleva la cuenta con inc/dec en lugar de leer pool.checkedout()
+    def on_checkout(*args) -> None:
+        DB_POOL_CHECKED_OUT.labels(name).inc()
+        if hasattr(pool, "overflow"):
+            DB_POOL_OVERFLOW.labels(name).set(max(pool.overflow(), 0))
+
+    def on_checkin(*args) -> None:
+        DB_POOL_CHECKED_OUT.labels(name).dec()
+
+    event.listen(pool, "checkout", on_checkout)
+    event.listen(pool, "checkin", on_checkin)
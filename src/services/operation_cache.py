@@ -0,0 +1,109 @@
+import asyncio
+import hashlib
+import os
+from typing import Awaitable, Callable, Dict, Hashable, NamedTuple, Optional, Tuple
+from cachetools import TTLCache
+from services.metrics import OPERATION_CACHE_LOOKUPS
+
+# Configuración de la caché de operaciones
+OPERATION_CACHE_SIZE = int(os.environ.get("OPERATION_CACHE_SIZE", 1024))
+OPERATION_CACHE_TTL = int(os.environ.get("OPERATION_CACHE_TTL", 5))
+
+# Prefijos de las claves: listados de operaciones activas y operaciones individuales
+LISTING = "operations"
+OPERATION = "operation"
+
+
+# Respuesta ya serializada junto con su ETag y encabezados adicionales
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    headers: Dict[str, str]
+
+
+# El ETag se deriva del contenido, así que es el mismo en todos los workers
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return "*" in candidates or any(value.removeprefix("W/") == etag for value in candidates)
+
+
+# --- Caché de lectura para operaciones --- #
+# Guarda las respuestas serializadas de GET /operations y GET /operation/{id} con tamaño
+# acotado y TTL. Las escrituras invalidan las entradas afectadas en este worker; en los demás
+# workers la entrada expira como mucho tras OPERATION_CACHE_TTL segundos.
+class OperationCache:
+    def __init__(self, maxsize: int, ttl: int):
+        self.enabled = maxsize > 0 and ttl > 0
+        self._cache = TTLCache(maxsize=max(maxsize, 1), ttl=max(ttl, 1))
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    async def get_or_load(
+        self, key: Tuple, loader: Callable[[], Awaitable[Optional[Tuple[bytes, Dict[str, str]]]]]
+    ) -> Optional[CachedResponse]:
+        entry = self._cache.get(key) if self.enabled else None
+        if entry is not None:
+            self.hits += 1
+            OPERATION_CACHE_LOOKUPS.labels("hit").inc()
+            return entry
+        self.misses += 1
+        OPERATION_CACHE_LOOKUPS.labels("miss").inc()
+
+        # Si otra petición ya está cargando la misma clave, se espera su resultado
+        if key in self._inflight:
+            return await asyncio.shield(self._inflight[key])
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        generation = self._generation
+        try:
+            loaded = await loader()
+            entry = None
+            if loaded is not None:
+                body, headers = loaded
+                entry = CachedResponse(body, make_etag(body), headers)
+                # No se guarda si hubo una escritura mientras se cargaba
+                if self.enabled and generation == self._generation:
+                    self._cache[key] = entry
+            future.set_result(entry)
+            return entry
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    def invalidate_listings(self) -> None:
+        self._generation += 1
+        for key in [key for key in list(self._cache.keys()) if key[0] == LISTING]:
+            self._cache.pop(key, None)
+
+    def invalidate_operation(self, *operation_ids: int) -> None:
+        for operation_id in operation_ids:
+            self._cache.pop((OPERATION, operation_id), None)
+        self.invalidate_listings()
+
+    def clear(self) -> None:
+        self._generation += 1
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "size": len(self._cache),
+            "maxsize": self._cache.maxsize,
+        }
+
+
+operation_cache = OperationCache(OPERATION_CACHE_SIZE, OPERATION_CACHE_TTL)
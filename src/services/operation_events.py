@@ -0,0 +1,141 @@
+import asyncio
+import json
+import os
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, Optional, Set
+from sqlalchemy import select
+
+import database.sql_models as sql_models
+from database.database import SessionLocal
+
+# Configuración del canal de eventos de operaciones
+EVENTS_QUEUE_SIZE = int(os.environ.get("EVENTS_QUEUE_SIZE", 8))
+EVENTS_POLL_SECONDS = float(os.environ.get("EVENTS_POLL_SECONDS", 5))
+EVENTS_HEARTBEAT_SECONDS = float(os.environ.get("EVENTS_HEARTBEAT_SECONDS", 15))
+
+# Tipos de evento
+FUNDING = "funding"
+CLOSED = "closed"
+EXPIRED = "expired"
+DELETED = "deleted"
+
+
+@dataclass
+class OperationEvent:
+    kind: str
+    data: dict
+
+    def to_sse(self) -> bytes:
+        return f"event: {self.kind}\ndata: {json.dumps(self.data)}\n\n".encode()
+
+
+@dataclass
+class _Watcher:
+    subscribers: Set[asyncio.Queue] = field(default_factory=set)
+    pending: asyncio.Event = field(default_factory=asyncio.Event)
+    hint: Optional[str] = None
+    last: Optional[OperationEvent] = None
+    task: Optional[asyncio.Task] = None
+
+
+# --- Difusión de eventos de operaciones --- #
+# Hay un único observador por operación con suscriptores en este worker: relee la operación
+# cuando una escritura local avisa con notify() (agrupando ráfagas) o cada EVENTS_POLL_SECONDS
+# para ver cambios hechos en otros workers, y reparte el estado a todos los suscriptores.
+# Cada suscriptor tiene una cola acotada; si no consume a tiempo se descartan sus eventos más
+# antiguos, ya que cada evento lleva el estado completo de la operación.
+class OperationEventBroker:
+    def __init__(self, queue_size: int, poll_seconds: float):
+        self.queue_size = queue_size
+        self.poll_seconds = poll_seconds
+        self._watchers: Dict[int, _Watcher] = {}
+
+    def subscriber_count(self) -> int:
+        return sum(len(watcher.subscribers) for watcher in self._watchers.values())
+
+    # Se llama tras confirmar una escritura; no hace nada si nadie observa la operación
+    def notify(self, operation_id: int, hint: Optional[str] = None) -> None:
+        watcher = self._watchers.get(operation_id)
+        if watcher is not None:
+            watcher.hint = hint or watcher.hint
+            watcher.pending.set()
+
+    @asynccontextmanager
+    async def subscribe(self, operation_id: int) -> AsyncIterator[asyncio.Queue]:
+        watcher = self._watchers.get(operation_id)
+        if watcher is None:
+            watcher = self._watchers[operation_id] = _Watcher()
+            watcher.task = asyncio.create_task(self._watch(operation_id, watcher))
+
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        if watcher.last is not None:
+            queue.put_nowait(watcher.last)
+        watcher.subscribers.add(queue)
+        try:
+            yield queue
+        finally:
+            watcher.subscribers.discard(queue)
+            if not watcher.subscribers and self._watchers.get(operation_id) is watcher:
+                del self._watchers[operation_id]
+                watcher.task.cancel()
+
+    def _publish(self, watcher: _Watcher, event: OperationEvent) -> None:
+        watcher.last = event
+        for queue in watcher.subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    # Una operación archivada sigue existiendo (cerrada): se busca en el archivo antes de
+    # darla por eliminada, como crud.get_operation_by_id
+    async def _load(self, operation_id: int, hint: Optional[str]) -> OperationEvent:
+        row = None
+        async with SessionLocal() as db:
+            for model in (sql_models.Operation, sql_models.ArchivedOperation):
+                result = await db.execute(
+                    select(model.amount_collected, model.amount_required, model.is_closed).where(model.id == operation_id)
+                )
+                row = result.first()
+                if row is not None:
+                    break
+
+        if row is None:
+            return OperationEvent(DELETED, {"operation_id": operation_id})
+        data = {
+            "operation_id": operation_id,
+            "amount_collected": float(row.amount_collected or 0),
+            "amount_required": float(row.amount_required),
+            "is_closed": bool(row.is_closed),
+        }
+        if row.is_closed:
+            return OperationEvent(EXPIRED if hint == EXPIRED else CLOSED, data)
+        return OperationEvent(FUNDING, data)
+
+    async def _watch(self, operation_id: int, watcher: _Watcher) -> None:
+        while True:
+            try:
+                watcher.pending.clear()
+                hint, watcher.hint = watcher.hint, None
+                event = await self._load(operation_id, hint)
+                if watcher.last is None or event.data != watcher.last.data:
+                    self._publish(watcher, event)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error loading operation events: {str(e)}")
+
+            try:
+                await asyncio.wait_for(watcher.pending.wait(), self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    async def stop(self) -> None:
+        watchers = list(self._watchers.values())
+        self._watchers.clear()
+        for watcher in watchers:
+            watcher.task.cancel()
+        await asyncio.gather(*(watcher.task for watcher in watchers), return_exceptions=True)
+
+
+operation_events = OperationEventBroker(EVENTS_QUEUE_SIZE, EVENTS_POLL_SECONDS)
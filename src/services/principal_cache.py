@@ -0,0 +1,61 @@
+import os
+from typing import Optional
+from cachetools import TTLCache
+import models.py_schemas as py_schemas
+from services.metrics import PRINCIPAL_CACHE_LOOKUPS
+
+# Configuración de la caché de usuarios autenticados
+PRINCIPAL_CACHE_SIZE = int(os.environ.get("PRINCIPAL_CACHE_SIZE", 10000))
+PRINCIPAL_CACHE_TTL = int(os.environ.get("PRINCIPAL_CACHE_TTL", 60))
+
+
+# --- Caché de usuarios autenticados --- #
+# Caché en proceso, acotada (LRU) y con expiración (TTL), indexada por username.
+# Cada worker tiene su propia copia: un cambio hecho en otro worker se ve como mucho
+# después de PRINCIPAL_CACHE_TTL segundos.
+class PrincipalCache:
+    def __init__(self, maxsize: int, ttl: int):
+        self.enabled = maxsize > 0 and ttl > 0
+        self._cache = TTLCache(maxsize=max(maxsize, 1), ttl=max(ttl, 1))
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, username: str) -> Optional[py_schemas.User]:
+        user = self._cache.get(username) if self.enabled else None
+        if user is None:
+            self.misses += 1
+            PRINCIPAL_CACHE_LOOKUPS.labels("miss").inc()
+        else:
+            self.hits += 1
+            PRINCIPAL_CACHE_LOOKUPS.labels("hit").inc()
+        return user
+
+    def set(self, username: str, user: py_schemas.User) -> None:
+        if self.enabled:
+            self._cache[username] = user
+
+    def invalidate(self, *usernames: str) -> None:
+        for username in usernames:
+            self._cache.pop(username, None)
+
+    # Para cambios en los que no se conoce el username anterior
+    def invalidate_user(self, user_id: str) -> None:
+        for username, user in list(self._cache.items()):
+            if str(user.id) == str(user_id):
+                self._cache.pop(username, None)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "size": len(self._cache),
+            "maxsize": self._cache.maxsize,
+        }
+
+
+principal_cache = PrincipalCache(PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL)
@@ -0,0 +1,158 @@
+# Entorno de las pruebas: una base SQLite temporal migrada con alembic (la primera vez que arranca
+# la app) y vaciada antes de cada prueba. Los usuarios se insertan directamente con un hash
+# calculado una sola vez, para no pagar bcrypt en cada prueba.
+# Uso (desde src): python -m pytest -q tests
+import os
+import sys
+import tempfile
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from typing import Tuple
+
+SOURCE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SOURCE_DIR not in sys.path:
+    sys.path.insert(0, SOURCE_DIR)
+
+# Debe configurarse antes de importar database.database, que lee la URL al importarse. SQLite
+# serializa las escrituras: con cientos de ofertas simultáneas la espera por el bloqueo supera
+# los 5 s por defecto
+_DATABASE_PATH = os.path.join(tempfile.mkdtemp(prefix="klimb-tests-"), "tests.sqlite")
+os.environ["DB_INSTANCE_KLIMB_MYSQL"] = f"sqlite+aiosqlite:///{_DATABASE_PATH}?timeout=60"
+os.environ.pop("DB_INSTANCE_KLIMB_MYSQL_REPLICA", None)
+os.environ["EXPIRY_SCHEDULER_ENABLED"] = "0"
+os.environ["ADMISSION_ENABLED"] = "0"
+
+import asyncio
+
+import httpx
+import pytest
+from sqlalchemy import delete, event
+
+PASSWORD = "tests"
+_password_hash = []
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+# Cliente HTTP contra la app, con la base vacía y las cachés en proceso limpias
+@pytest.fixture
+async def client():
+    import main
+    from database.database import Base, engine
+    from services.idempotency import idempotency_store
+    from services.operation_cache import operation_cache
+    from services.principal_cache import principal_cache
+
+    await main.app.router.startup()
+    async with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            await conn.execute(delete(table))
+    principal_cache.clear()
+    operation_cache.clear()
+    idempotency_store.clear()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as http_client:
+        yield http_client
+    await main.app.router.shutdown()
+
+
+# Crea un usuario y devuelve su id y las cabeceras con su token
+async def create_user(role: str, username: str = None) -> Tuple[str, dict]:
+    import database.sql_models as sql_models
+    from database.crud import get_password_hash
+    from database.database import SessionLocal
+    from routers.token_generator import create_access_token
+
+    if not _password_hash:
+        _password_hash.append(get_password_hash(PASSWORD))
+    user_id = str(uuid.uuid4())
+    username = username or f"{role}-{user_id[:8]}"
+    async with SessionLocal() as db:
+        db.add(sql_models.User(
+            id=user_id, username=username, password_hash=_password_hash[0], role=role, created_at=datetime.now(timezone.utc)
+        ))
+        await db.commit()
+    token = create_access_token(data={"sub": username, "role": role})
+    return user_id, {"Authorization": f"Bearer {token}"}
+
+
+async def create_operation(client: httpx.AsyncClient, headers: dict, amount_required: float, interest_rate: float = 10.0, days: int = 30) -> int:
+    response = await client.post("/operation", headers=headers, json={
+        "amount_required": amount_required,
+        "interest_rate": interest_rate,
+        "deadline": str(date.today() + timedelta(days=days)),
+    })
+    assert response.status_code == 201, response.text
+    return response.json()["id"]
+
+
+# Conexiones de un motor prestadas en este momento (checkouts menos checkins de su pool)
+class CheckedOut:
+    def __init__(self, target):
+        self.pool = target.sync_engine.pool
+        self.count = 0
+
+    def _checkout(self, *args):
+        self.count += 1
+
+    def _checkin(self, *args):
+        self.count -= 1
+
+    def __enter__(self):
+        event.listen(self.pool, "checkout", self._checkout)
+        event.listen(self.pool, "checkin", self._checkin)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.pool, "checkout", self._checkout)
+        event.remove(self.pool, "checkin", self._checkin)
+
+
+# GET llamando a la app ASGI directamente (httpx.ASGITransport espera a que termine la respuesta):
+# guarda lo recibido hasta que el cliente se desconecta. Con pause=True deja de leer tras el
+# primer bloque del cuerpo, como un cliente lento, hasta que se llama a finish() (leer el resto)
+# o a close() (desconectarse).
+class StreamingRequest:
+    def __init__(self, path: str, headers: dict = None, query_string: bytes = b"", pause: bool = False):
+        self.scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+            "path": path, "raw_path": path.encode(), "query_string": query_string,
+            "headers": [(b"host", b"test")] + [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()],
+            "client": ("test", 1), "server": ("test", 80),
+        }
+        self.pause = pause
+        self.requested = False
+        self.disconnected = asyncio.Event()
+        self.resumed = asyncio.Event()
+        self.status = None
+        self.body = b""
+        self.task = None
+
+    async def receive(self):
+        if not self.requested:
+            self.requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await self.disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            self.status = message["status"]
+            return
+        self.body += message.get("body", b"")
+        if self.pause and self.body:
+            await self.resumed.wait()
+
+    def open(self):
+        import main
+        self.task = asyncio.create_task(main.app(self.scope, self.receive, self.send))
+
+    async def finish(self):
+        self.resumed.set()
+        await asyncio.wait_for(self.task, 5)
+
+    async def close(self):
+        self.disconnected.set()
+        await self.finish()
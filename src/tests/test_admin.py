@@ -0,0 +1,47 @@
+import asyncio
+import csv
+import io
+
+import pytest
+
+import routers.admin as admin
+from database.database import read_engine
+from tests.conftest import CheckedOut, StreamingRequest, create_user
+
+pytestmark = pytest.mark.anyio
+
+
+# Mientras se transmite una exportación la única conexión ocupada es la de su cursor: el
+# administrador se resuelve con una sesión que se cierra antes (sin la caché de autenticación)
+async def test_export_holds_only_the_cursor_connection(client, monkeypatch):
+    monkeypatch.setattr(admin, "EXPORT_CHUNK_SIZE", 2)
+    _, headers = await create_user("admin")
+    for _ in range(10):
+        await create_user("inversor")
+
+    with CheckedOut(read_engine) as checked_out:
+        request = StreamingRequest("/admin/export/users", headers=headers, pause=True)
+        request.open()
+        for _ in range(500):
+            if request.body:
+                break
+            await asyncio.sleep(0.01)
+
+        assert request.status == 200
+        assert request.body
+        assert checked_out.count == 1
+        await request.finish()
+        assert checked_out.count == 0
+    assert len(request.body.decode().splitlines()) == 1 + 11
+
+
+async def test_export_requires_the_admin_role(client):
+    _, admin_headers = await create_user("admin")
+    _, headers = await create_user("inversor")
+
+    assert (await client.get("/admin/export/users", headers=headers)).status_code == 403
+    response = await client.get("/admin/export/users", headers=admin_headers)
+    assert response.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == 2
+    assert "password_hash" not in rows[0]
@@ -0,0 +1,42 @@
+import asyncio
+from datetime import date, timedelta
+
+import pytest
+
+from database.database import engine
+from services.admission import admission
+from services.principal_cache import principal_cache
+from tests.conftest import CheckedOut, create_user
+
+pytestmark = pytest.mark.anyio
+
+QUEUED = 5
+
+
+# Las peticiones que esperan turno en el control de admisión no retienen conexiones, aunque
+# el usuario no esté en la caché y haya que leerlo de la base de datos
+async def test_queued_requests_hold_no_connections(client, monkeypatch):
+    monkeypatch.setattr(admission, "enabled", True)
+    monkeypatch.setattr(admission, "concurrency", 1)
+    monkeypatch.setattr(admission, "latency_target", 30)
+    monkeypatch.setattr(admission, "_limiters", {})
+    operators = [(await create_user("operador"))[1] for _ in range(QUEUED)]
+    limiter = admission.limiter("POST /operation")
+    principal_cache.clear()
+
+    with CheckedOut(engine) as checked_out:
+        async with limiter.admit():
+            requests = [asyncio.create_task(client.post("/operation", headers=headers, json={
+                "amount_required": 1000, "interest_rate": 10.0, "deadline": str(date.today() + timedelta(days=30)),
+            })) for headers in operators]
+            for _ in range(500):
+                if limiter.waiting == QUEUED:
+                    break
+                await asyncio.sleep(0.01)
+
+            assert limiter.waiting == QUEUED
+            assert checked_out.count == 0
+        responses = await asyncio.gather(*requests)
+
+    assert [response.status_code for response in responses] == [201] * QUEUED
+    assert checked_out.count == 0
@@ -0,0 +1,126 @@
+from decimal import Decimal
+
+import numpy as np
+import pytest
+from sqlalchemy import select
+
+import database.crud as crud
+import database.sql_models as sql_models
+from database.database import SessionLocal
+from services.allocation import allocate
+from tests.conftest import create_operation, create_user
+
+
+# Implementación de referencia, oferta por oferta y con enteros de Python: las de menor tasa
+# completas; la tasa marginal se reparte a prorrata y los centavos sobrantes van a los mayores
+# restos y, a igualdad, a la oferta de menor id
+def reference_allocation(bid_ids, amounts, rates, capacity):
+    allocated = {bid_id: 0 for bid_id in bid_ids}
+    remaining = max(capacity, 0)
+    bids = sorted(zip(rates, bid_ids, amounts))
+    for rate in sorted(set(rates)):
+        tier = [(bid_id, amount) for bid_rate, bid_id, amount in bids if bid_rate == rate]
+        total = sum(amount for _, amount in tier)
+        if total <= remaining:
+            for bid_id, amount in tier:
+                allocated[bid_id] = amount
+            remaining -= total
+            continue
+        for bid_id, amount in tier:
+            allocated[bid_id] = amount * remaining // total
+        leftover = remaining - sum(allocated[bid_id] for bid_id, _ in tier)
+        by_remainder = sorted(tier, key=lambda bid: (-(bid[1] * remaining % total), bid[0]))
+        for bid_id, _ in by_remainder[:leftover]:
+            allocated[bid_id] += 1
+        break
+    return [allocated[bid_id] for bid_id in bid_ids]
+
+
+def run_allocation(bid_ids, amounts, rates, capacity):
+    return allocate(
+        np.array(bid_ids, dtype=np.int64), np.array(amounts, dtype=np.int64), np.array(rates, dtype=np.float64), capacity
+    ).tolist()
+
+
+@pytest.mark.parametrize("bid_ids, amounts, rates, capacity, expected", [
+    # Sin ofertas o sin cupo
+    ([], [], [], 1000, []),
+    ([1, 2], [500, 500], [5.0, 6.0], 0, [0, 0]),
+    ([1, 2], [500, 500], [5.0, 6.0], -10, [0, 0]),
+    # Cupo para todas
+    ([1, 2], [500, 500], [5.0, 6.0], 5000, [500, 500]),
+    # Llenado exacto: todas las ofertas, o el cupo termina justo al final de una tasa
+    ([1, 2, 3], [300, 300, 400], [5.0, 6.0, 7.0], 1000, [300, 300, 400]),
+    ([1, 2, 3], [300, 300, 400], [5.0, 6.0, 7.0], 600, [300, 300, 0]),
+    ([1, 2, 3], [300, 300, 400], [5.0, 5.0, 7.0], 600, [300, 300, 0]),
+    # Empate en la tasa marginal: prorrateo por monto
+    ([1, 2, 3], [200, 100, 500], [5.0, 5.0, 4.0], 650, [100, 50, 500]),
+    # Centavo sobrante con restos iguales: a la oferta más antigua, sin importar el orden de entrada
+    ([7, 3, 5], [100, 100, 100], [5.0, 5.0, 5.0], 100, [33, 34, 33]),
+    ([3, 5, 7], [100, 100, 100], [5.0, 5.0, 5.0], 200, [67, 67, 66]),
+    # Centavos sobrantes al mayor resto
+    ([1, 2], [1, 2], [5.0, 5.0], 2, [1, 1]),
+    # La tasa menor se asigna completa aunque llegue después en la entrada
+    ([1, 2], [1000, 1000], [9.0, 1.0], 1500, [500, 1000]),
+])
+def test_allocation_edge_cases(bid_ids, amounts, rates, capacity, expected):
+    assert reference_allocation(bid_ids, amounts, rates, capacity) == expected
+    assert run_allocation(bid_ids, amounts, rates, capacity) == expected
+
+
+# Casos aleatorios con muchas ofertas en pocas tasas (empates frecuentes), comparados con la
+# referencia; la suma asignada es siempre exacta y ninguna oferta recibe más que su monto
+@pytest.mark.parametrize("seed", range(30))
+def test_allocation_matches_reference(seed):
+    rng = np.random.default_rng(seed)
+    count = int(rng.integers(1, 300))
+    bid_ids = (rng.permutation(count) + 1).tolist()
+    amounts = rng.integers(1, 10_000, count).tolist()
+    rates = (rng.integers(10, 15, count) / 2).tolist()
+    capacity = int(rng.integers(0, sum(amounts) + 2))
+
+    result = run_allocation(bid_ids, amounts, rates, capacity)
+    assert result == reference_allocation(bid_ids, amounts, rates, capacity)
+    assert sum(result) == min(capacity, sum(amounts))
+    assert all(0 <= share <= amount for share, amount in zip(result, amounts))
+
+
+# Montos que desbordan int64 al multiplicarse por el cupo: se calcula con enteros de Python
+def test_allocation_without_int64_overflow():
+    bid_ids, amounts, rates = [1, 2, 3], [2**40, 2**40 + 1, 3], [5.0, 5.0, 5.0]
+    capacity = 2**40 + 7
+    result = run_allocation(bid_ids, amounts, rates, capacity)
+    assert result == reference_allocation(bid_ids, amounts, rates, capacity)
+    assert sum(result) == capacity
+
+
+# La asignación guardada al cerrar una operación coincide con la referencia
+@pytest.mark.anyio
+async def test_settle_operation_stores_the_reference_allocation(client):
+    _, operator = await create_user("operador")
+    operation_id = await create_operation(client, operator, 100)
+    bids = [(40, 5.0), (30, 6.0), (20, 6.0), (10, 6.0)]
+    for amount, rate in bids:
+        _, investor = await create_user("inversor")
+        response = await client.post("/bid", headers=investor, json={"operation_id": operation_id, "amount": amount, "interest_rate": rate})
+        assert response.status_code == 201, response.text
+
+    async with SessionLocal() as db:
+        rows = (await db.execute(
+            select(sql_models.Bid.id, sql_models.Bid.amount, sql_models.Bid.interest_rate)
+            .where(sql_models.Bid.operation_id == operation_id).order_by(sql_models.Bid.id)
+        )).all()
+        operation = await db.get(sql_models.Operation, operation_id)
+        operation.amount_required = Decimal(75)
+        await db.commit()
+        await crud.settle_operation(db, operation_id)
+        stored = dict((await db.execute(
+            select(sql_models.Allocation.bid_id, sql_models.Allocation.amount_allocated)
+            .where(sql_models.Allocation.operation_id == operation_id)
+        )).all())
+
+    expected = reference_allocation(
+        [row.id for row in rows], [int(row.amount * 100) for row in rows], [row.interest_rate for row in rows], 75 * 100
+    )
+    assert {row.id: round(Decimal(stored.get(row.id, 0)) * 100) for row in rows} == dict(zip([row.id for row in rows], expected))
+    assert sum(expected) == 7500
@@ -0,0 +1,138 @@
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import update
+
+import database.crud as crud
+import database.sql_models as sql_models
+from database.database import SessionLocal
+from database.summaries import find_mismatches
+from tests.conftest import create_operation, create_user
+
+pytestmark = pytest.mark.anyio
+
+RETENTION = timedelta(days=30)
+
+
+async def _archive() -> int:
+    async with SessionLocal() as db:
+        return await crud.archive_closed_operations(db, RETENTION)
+
+
+async def _views(client, operator_id, operator, investors):
+    dashboard = (await client.get(f"/operator/{operator_id}/operations", headers=operator)).json()
+    portfolios = [(await client.get(f"/user/{investor_id}/portfolio", headers=headers)).json() for investor_id, headers in investors]
+    return dashboard, portfolios
+
+
+# Archivar operaciones cerradas no cambia los totales del panel del operador ni los de la
+# cartera de sus inversores, ni las operaciones y posiciones que muestran
+async def test_archiving_keeps_dashboard_and_portfolio_totals(client):
+    operator_id, operator = await create_user("operador")
+    investors = [await create_user("inversor") for _ in range(2)]
+    operation_ids = [await create_operation(client, operator, 1000, interest_rate=8.0 + index) for index in range(4)]
+    for index, operation_id in enumerate(operation_ids):
+        for investor_index, (_, headers) in enumerate(investors):
+            response = await client.post("/bid", headers=headers, json={
+                "operation_id": operation_id, "amount": 100 + 10 * index + investor_index, "interest_rate": 5.0 + index,
+            })
+            assert response.status_code == 201, response.text
+
+    # Las dos primeras se cerraron hace tiempo
+    archived_ids = operation_ids[:2]
+    async with SessionLocal() as db:
+        await db.execute(
+            update(sql_models.Operation)
+            .where(sql_models.Operation.id.in_(archived_ids))
+            .values(deadline=crud.utc_today() - timedelta(days=90))
+        )
+        await db.commit()
+        assert await crud.update_expired_operations(db) == 2
+        await db.execute(
+            update(sql_models.Operation)
+            .where(sql_models.Operation.id.in_(archived_ids))
+            .values(closed_at=crud._utc_now() - 2 * RETENTION)
+        )
+        await db.commit()
+
+    before = await _views(client, operator_id, operator, investors)
+    assert await _archive() == 2
+    async with SessionLocal() as db:
+        status = await crud.get_archive_status(db)
+        assert status["archived_operations"] == 2
+        assert status["archived_bids"] == 4
+        assert await find_mismatches(db) == []
+    after = await _views(client, operator_id, operator, investors)
+
+    assert after == before
+    dashboard, portfolios = after
+    assert dashboard["summary"]["operation_count"] == 4
+    assert dashboard["summary"]["closed_operations"] == 2
+    assert [operation["id"] for operation in dashboard["operations"]] == operation_ids[::-1]
+    for portfolio in portfolios:
+        assert portfolio["totals"]["bid_count"] == 4
+        assert portfolio["totals"]["closed_exposure"] > 0
+        assert {position["operation"]["id"] for position in portfolio["positions"]} == set(operation_ids)
+
+    # Las páginas recorren las tablas calientes y el archivo sin repetir ni saltar filas
+    investor_id, headers = investors[0]
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 1, **({"cursor": cursor} if cursor else {})}
+        response = await client.get(f"/user/{investor_id}/portfolio", params=params, headers=headers)
+        seen += [position["id"] for position in response.json()["positions"]]
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert seen == [position["id"] for position in portfolios[0]["positions"]]
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 1, **({"cursor": cursor} if cursor else {})}
+        response = await client.get(f"/operator/{operator_id}/operations", params=params, headers=operator)
+        seen += [operation["id"] for operation in response.json()["operations"]]
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert seen == operation_ids[::-1]
+
+    # Rehacer el resumen desde las tablas base da los mismos totales
+    async with SessionLocal() as db:
+        await crud.rebuild_operator_summaries(db, [operator_id])
+    assert (await _views(client, operator_id, operator, investors)) == before
+
+
+# La última operación y la de la última oferta también se archivan (AUTOINCREMENT en SQLite), y
+# las nuevas reciben ids que no coinciden con los archivados
+async def test_latest_ids_are_archived_and_not_reused(client):
+    _, operator = await create_user("operador")
+    _, investor = await create_user("inversor")
+    operation_id = await create_operation(client, operator, 1000)
+    bid = await client.post("/bid", headers=investor, json={"operation_id": operation_id, "amount": 100, "interest_rate": 5.0})
+    assert bid.status_code == 201
+    async with SessionLocal() as db:
+        await db.execute(
+            update(sql_models.Operation)
+            .where(sql_models.Operation.id == operation_id)
+            .values(is_closed=True, closed_at=crud._utc_now() - 2 * RETENTION)
+        )
+        await db.commit()
+
+    assert await _archive() == 1
+    new_operation_id = await create_operation(client, operator, 1000)
+    new_bid = await client.post("/bid", headers=investor, json={"operation_id": new_operation_id, "amount": 100, "interest_rate": 5.0})
+    assert new_operation_id > operation_id
+    assert new_bid.json()["id"] > bid.json()["id"]
+    assert (await client.get(f"/operation/{operation_id}")).json()["is_closed"] is True
+    assert (await client.get(f"/operation/{new_operation_id}")).json()["is_closed"] is False
+
+
+@pytest.mark.parametrize("name, version, expected", [
+    ("sqlite", (3, 40, 1), False),
+    ("mysql", (5, 7, 44), True),
+    ("mysql", (8, 0, 36), False),
+])
+def test_max_ids_are_kept_only_where_the_counter_is_not_persisted(name, version, expected):
+    dialect = SimpleNamespace(name=name, server_version_info=version)
+    assert crud._reuses_max_ids(dialect) is expected
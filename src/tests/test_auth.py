@@ -0,0 +1,54 @@
+import pytest
+from sqlalchemy import event
+
+from database.database import SessionLocal, engine
+from dependencies import get_current_user
+from services.principal_cache import principal_cache
+from tests.conftest import create_user
+
+pytestmark = pytest.mark.anyio
+
+
+# Sentencias SQL ejecutadas por get_current_user, sin el resto de la petición
+async def _auth_queries(token: str) -> int:
+    statements = []
+
+    def on_execute(*args) -> None:
+        statements.append(args[2])
+
+    async with SessionLocal() as db:
+        event.listen(engine.sync_engine, "before_cursor_execute", on_execute)
+        try:
+            await get_current_user(token, db)
+        finally:
+            event.remove(engine.sync_engine, "before_cursor_execute", on_execute)
+    return len(statements)
+
+
+async def test_get_current_user_queries_once_then_hits_the_cache(client):
+    _, headers = await create_user("inversor")
+    token = headers["Authorization"].split(" ", 1)[1]
+
+    assert await _auth_queries(token) == 1
+    assert await _auth_queries(token) == 0
+    principal_cache.clear()
+    assert await _auth_queries(token) == 1
+
+
+def _metric(text: str, result: str) -> float:
+    for line in text.splitlines():
+        if line.startswith(f'principal_cache_lookups_total{{result="{result}"}}'):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+async def test_principal_cache_hits_and_misses_are_exported(client):
+    user_id, headers = await create_user("inversor")
+    before = (await client.get("/metrics")).text
+
+    for _ in range(3):
+        assert (await client.get(f"/user/{user_id}/portfolio", headers=headers)).status_code == 200
+
+    after = (await client.get("/metrics")).text
+    assert _metric(after, "miss") - _metric(before, "miss") == 1
+    assert _metric(after, "hit") - _metric(before, "hit") == 2
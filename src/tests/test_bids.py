@@ -0,0 +1,80 @@
+import asyncio
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import func, select
+
+import database.sql_models as sql_models
+from database.database import SessionLocal
+from tests.conftest import create_operation, create_user
+
+pytestmark = pytest.mark.anyio
+
+
+async def _funding(operation_id: int):
+    async with SessionLocal() as db:
+        operation = await db.get(sql_models.Operation, operation_id)
+        bids_total, bid_count = (await db.execute(
+            select(func.coalesce(func.sum(sql_models.Bid.amount), 0), func.count(sql_models.Bid.id))
+            .where(sql_models.Bid.operation_id == operation_id)
+        )).one()
+    return Decimal(operation.amount_required), Decimal(operation.amount_collected), Decimal(bids_total), bid_count
+
+
+# Ofertas simultáneas que suman el doble del monto requerido: se acepta exactamente la mitad,
+# el resto se rechaza y la operación nunca queda sobrefinanciada
+async def test_concurrent_bids_never_over_fund(client):
+    _, operator = await create_user("operador")
+    investors = [(await create_user("inversor"))[1] for _ in range(20)]
+    bids, amount = 300, 10
+    operation_id = await create_operation(client, operator, bids * amount / 2)
+
+    responses = await asyncio.gather(*(
+        client.post("/bid", headers=investors[index % len(investors)], json={
+            "operation_id": operation_id, "amount": amount, "interest_rate": 5.0,
+        }) for index in range(bids)
+    ))
+
+    accepted = [response for response in responses if response.status_code == 201]
+    rejected = [response for response in responses if response.status_code != 201]
+    assert len(accepted) == bids // 2
+    assert {response.status_code for response in rejected} == {400}
+    assert {response.json()["detail"] for response in rejected} == {"Amount of the bid exceeds the value"}
+
+    required, collected, bids_total, bid_count = await _funding(operation_id)
+    accepted_total = sum(Decimal(str(response.json()["amount"])) for response in accepted)
+    assert collected <= required
+    assert collected == required == accepted_total
+    assert bids_total == collected == Decimal(amount) * len(accepted)
+    assert bid_count == len(accepted)
+
+
+# Ofertas simultáneas de montos distintos: lo recaudado coincide con la suma de las aceptadas
+async def test_concurrent_bids_of_mixed_amounts(client):
+    _, operator = await create_user("operador")
+    _, investor = await create_user("inversor")
+    operation_id = await create_operation(client, operator, 1000)
+    amounts = [7, 13, 50, 120, 333, 1, 250, 99, 400, 18] * 3
+
+    responses = await asyncio.gather(*(
+        client.post("/bid", headers=investor, json={"operation_id": operation_id, "amount": amount, "interest_rate": 5.0})
+        for amount in amounts
+    ))
+
+    accepted_total = sum(Decimal(str(response.json()["amount"])) for response in responses if response.status_code == 201)
+    required, collected, bids_total, _ = await _funding(operation_id)
+    assert collected <= required
+    assert collected == bids_total == accepted_total
+
+
+async def test_bid_on_closed_operation_is_rejected(client):
+    _, operator = await create_user("operador")
+    _, investor = await create_user("inversor")
+    operation_id = await create_operation(client, operator, 100)
+    response = await client.patch(f"/operation/{operation_id}", headers=operator, json={"is_closed": True})
+    assert response.status_code == 200
+
+    response = await client.post("/bid", headers=investor, json={"operation_id": operation_id, "amount": 10, "interest_rate": 5.0})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Operation is closed"
+    assert (await _funding(operation_id))[1] == 0
@@ -0,0 +1,71 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import update
+
+import database.crud as crud
+import database.sql_models as sql_models
+from database.database import SessionLocal, read_engine
+from services.operation_events import operation_events
+from tests.conftest import CheckedOut, StreamingRequest, create_operation, create_user
+
+pytestmark = pytest.mark.anyio
+
+SUBSCRIBERS = 20
+
+
+# Los suscriptores abiertos no retienen conexiones: la existencia de la operación se comprueba
+# con una sesión que se cierra antes de empezar a transmitir
+async def test_open_subscribers_hold_no_connections(client):
+    _, operator = await create_user("operador")
+    operation_id = await create_operation(client, operator, 1000)
+    subscribers = [StreamingRequest(f"/operation/{operation_id}/events") for _ in range(SUBSCRIBERS)]
+
+    with CheckedOut(read_engine) as checked_out:
+        for subscriber in subscribers:
+            subscriber.open()
+        for _ in range(500):
+            if all(b"event: funding" in subscriber.body for subscriber in subscribers):
+                break
+            await asyncio.sleep(0.01)
+
+        assert [subscriber.status for subscriber in subscribers] == [200] * SUBSCRIBERS
+        assert all(b"event: funding" in subscriber.body for subscriber in subscribers)
+        assert operation_events.subscriber_count() == SUBSCRIBERS
+        assert checked_out.count == 0
+
+        for subscriber in subscribers:
+            await subscriber.close()
+    assert operation_events.subscriber_count() == 0
+
+
+# Una operación archivada sigue existiendo: sus suscriptores la ven cerrada, no eliminada
+async def test_archived_operation_is_closed_for_subscribers(client):
+    _, operator = await create_user("operador")
+    operation_id = await create_operation(client, operator, 1000)
+    async with SessionLocal() as db:
+        await db.execute(
+            update(sql_models.Operation)
+            .where(sql_models.Operation.id == operation_id)
+            .values(is_closed=True, closed_at=crud._utc_now() - timedelta(days=60))
+        )
+        await db.commit()
+        assert await crud.archive_closed_operations(db, timedelta(days=30)) == 1
+
+    subscriber = StreamingRequest(f"/operation/{operation_id}/events")
+    subscriber.open()
+    for _ in range(500):
+        if b"event: " in subscriber.body:
+            break
+        await asyncio.sleep(0.01)
+    await subscriber.close()
+
+    assert subscriber.status == 200
+    assert subscriber.body.startswith(b"event: closed\n")
+    assert b'"is_closed": true' in subscriber.body
+
+
+async def test_unknown_operation_is_not_found(client):
+    response = await client.get("/operation/999999/events")
+    assert response.status_code == 404
@@ -0,0 +1,123 @@
+from datetime import datetime, time, timedelta, timezone
+
+import pytest
+from sqlalchemy import func, select, update
+
+import database.crud as crud
+import database.sql_models as sql_models
+import services.allocation as allocation
+from database.database import SessionLocal
+from services.operation_events import operation_events
+from services.expiry_scheduler import due_at
+from tests.conftest import create_operation, create_user
+
+pytestmark = pytest.mark.anyio
+
+
+async def _set_deadline(operation_id: int, deadline) -> None:
+    async with SessionLocal() as db:
+        await db.execute(update(sql_models.Operation).where(sql_models.Operation.id == operation_id).values(deadline=deadline))
+        await db.commit()
+
+
+async def _sweep() -> int:
+    async with SessionLocal() as db:
+        return await crud.update_expired_operations(db)
+
+
+@pytest.fixture
+def notified(monkeypatch):
+    events = []
+    monkeypatch.setattr(operation_events, "notify", lambda operation_id, hint=None: events.append((operation_id, hint)))
+    return events
+
+
+# Una operación cuya fecha límite es hoy (UTC) sigue abierta para el barrido, las ofertas, el
+# listado y la cartera; la de ayer se cierra
+async def test_deadline_day_is_open_everywhere(client, notified):
+    _, operator = await create_user("operador")
+    investor_id, investor = await create_user("inversor")
+    today = crud.utc_today()
+    due_today = await create_operation(client, operator, 1000)
+    due_yesterday = await create_operation(client, operator, 1000)
+    await _set_deadline(due_today, today)
+    await _set_deadline(due_yesterday, today - timedelta(days=1))
+
+    assert await _sweep() == 1
+    assert notified == [(due_yesterday, crud.EXPIRED)]
+    notified.clear()
+
+    listing = (await client.get("/operations")).json()
+    assert [operation["id"] for operation in listing] == [due_today]
+
+    response = await client.post("/bid", headers=investor, json={"operation_id": due_today, "amount": 100, "interest_rate": 5.0})
+    assert response.status_code == 201, response.text
+    response = await client.post("/bid", headers=investor, json={"operation_id": due_yesterday, "amount": 100, "interest_rate": 5.0})
+    assert response.status_code == 400
+
+    totals = (await client.get(f"/user/{investor_id}/portfolio", headers=investor)).json()["totals"]
+    assert totals["open_exposure"] == 100
+    assert totals["closed_exposure"] == 0
+
+
+# Solo se notifican las operaciones que cerró el barrido: un segundo barrido no cierra ni
+# notifica nada, y tampoco las que ya se habían cerrado por otro camino
+async def test_sweep_notifies_only_operations_it_closed(client, notified):
+    _, operator = await create_user("operador")
+    yesterday = crud.utc_today() - timedelta(days=1)
+    expired = [await create_operation(client, operator, 1000) for _ in range(3)]
+    for operation_id in expired:
+        await _set_deadline(operation_id, yesterday)
+    async with SessionLocal() as db:
+        await db.execute(update(sql_models.Operation).where(sql_models.Operation.id == expired[0]).values(is_closed=True))
+        await db.commit()
+
+    assert await _sweep() == 2
+    assert sorted(operation_id for operation_id, _ in notified) == expired[1:]
+
+    notified.clear()
+    assert await _sweep() == 0
+    assert notified == []
+
+    async with SessionLocal() as db:
+        summary = await db.get(sql_models.OperatorSummary, (await db.get(sql_models.Operation, expired[0])).operator_id)
+        assert summary.open_operations == 1
+
+
+# Si la asignación falla, el cierre del lote se deshace: la operación sigue abierta y vencida,
+# no se notifica, y el siguiente barrido la cierra y la asigna
+async def test_failed_settlement_is_retried_by_the_next_sweep(client, notified, monkeypatch):
+    _, operator = await create_user("operador")
+    _, investor = await create_user("inversor")
+    operation_id = await create_operation(client, operator, 1000)
+    response = await client.post("/bid", headers=investor, json={"operation_id": operation_id, "amount": 100, "interest_rate": 5.0})
+    assert response.status_code == 201
+    await _set_deadline(operation_id, crud.utc_today() - timedelta(days=1))
+    notified.clear()
+
+    def fail(*args):
+        raise RuntimeError("allocation failed")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(allocation, "allocate", fail)
+        with pytest.raises(RuntimeError):
+            async with SessionLocal() as db:
+                await crud.update_expired_operations(db, settle=True)
+    assert notified == []
+    async with SessionLocal() as db:
+        assert (await db.get(sql_models.Operation, operation_id)).is_closed is False
+
+    async with SessionLocal() as db:
+        assert await crud.update_expired_operations(db, settle=True) == 1
+        allocations = await db.scalar(
+            select(func.count()).select_from(sql_models.Allocation).where(sql_models.Allocation.operation_id == operation_id)
+        )
+    assert allocations == 1
+    assert notified == [(operation_id, "expired")]
+
+
+# El programador despierta al comenzar el día siguiente a la fecha límite
+def test_due_at_is_next_midnight_utc():
+    today = crud.utc_today()
+    assert due_at(today) == datetime.combine(today + timedelta(days=1), time.min, tzinfo=timezone.utc)
+    assert due_at(today) > datetime.now(timezone.utc)
@@ -0,0 +1,89 @@
+import csv
+import io
+import math
+from datetime import date, timedelta
+
+import pyarrow.parquet as pq
+import pytest
+from sqlalchemy import update
+
+import database.crud as crud
+import database.sql_models as sql_models
+from database.database import SessionLocal
+from database.export import EXPORT_TABLES, export_stream
+from tests.conftest import create_operation, create_user
+
+pytestmark = pytest.mark.anyio
+
+CHUNK_SIZE = 2
+
+
+async def _export(table: str, export_format: str = "csv", **filters) -> list:
+    return [part async for part in export_stream(table, export_format, chunk_size=CHUNK_SIZE, **filters)]
+
+
+def _rows(parts: list) -> list:
+    return list(csv.DictReader(io.StringIO(b"".join(parts).decode())))
+
+
+# Las operaciones archivadas y sus ofertas se exportan junto con las de las tablas calientes,
+# ordenadas por id y con los mismos filtros
+async def test_export_includes_the_archive(client):
+    _, operator = await create_user("operador")
+    _, investor = await create_user("inversor")
+    operation_ids = [await create_operation(client, operator, 1000) for _ in range(2)]
+    bid_ids = []
+    for operation_id in operation_ids:
+        for amount in (100, 200):
+            response = await client.post("/bid", headers=investor, json={"operation_id": operation_id, "amount": amount, "interest_rate": 5.0})
+            assert response.status_code == 201
+            bid_ids.append(response.json()["id"])
+    async with SessionLocal() as db:
+        await db.execute(
+            update(sql_models.Operation)
+            .where(sql_models.Operation.id == operation_ids[0])
+            .values(is_closed=True, closed_at=crud._utc_now() - timedelta(days=60))
+        )
+        await db.commit()
+        assert await crud.archive_closed_operations(db, timedelta(days=30)) == 1
+
+    operations = _rows(await _export("operations"))
+    assert [int(row["id"]) for row in operations] == operation_ids
+    assert operations[0]["is_closed"] == "True"
+    bids = _rows(await _export("bids"))
+    assert [int(row["id"]) for row in bids] == bid_ids
+    assert [row["amount"] for row in bids] == ["100.00", "200.00"] * 2
+
+    archived = _rows(await _export("bids", operation_ids=[operation_ids[0]], start=date.today() - timedelta(days=1)))
+    assert [int(row["id"]) for row in archived] == bid_ids[:2]
+
+
+# Un bloque por cada CHUNK_SIZE filas más el cierre: la cantidad de partes crece con las filas
+async def test_export_streams_one_part_per_chunk(client):
+    columns = EXPORT_TABLES["users"][1]
+    for users in (3, 7):
+        while len(_rows(await _export("users"))) < users:
+            await create_user("inversor")
+
+        parts = await _export("users")
+        assert len(parts) == math.ceil(users / CHUNK_SIZE) + 1
+        assert b"".join(parts).decode().splitlines()[0] == ",".join(columns)
+        assert len(_rows(parts)) == users
+
+        parquet = pq.ParquetFile(io.BytesIO(b"".join(await _export("users", "parquet"))))
+        assert parquet.num_row_groups == math.ceil(users / CHUNK_SIZE)
+        assert parquet.metadata.num_rows == users
+        assert parquet.schema_arrow.names == columns
+
+
+# Sin filas, el CSV lleva solo la cabecera y el Parquet es un archivo válido sin row groups
+async def test_empty_export(client):
+    await create_user("inversor")
+    tomorrow = date.today() + timedelta(days=1)
+
+    parts = await _export("bids", start=tomorrow)
+    assert b"".join(parts).decode() == ",".join(EXPORT_TABLES["bids"][1]) + "\n"
+
+    parquet = pq.ParquetFile(io.BytesIO(b"".join(await _export("users", "parquet", start=tomorrow))))
+    assert parquet.num_row_groups == 0
+    assert parquet.metadata.num_rows == 0
@@ -0,0 +1,120 @@
+import asyncio
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import func, select
+
+import database.sql_models as sql_models
+from database.database import SessionLocal
+from services.idempotency import REPLAYED_HEADER, idempotency_store
+from tests.conftest import create_operation, create_user
+
+pytestmark = pytest.mark.anyio
+
+RETRIES = 10
+
+
+async def _count(model, *conditions) -> int:
+    async with SessionLocal() as db:
+        return (await db.execute(select(func.count()).select_from(model).where(*conditions))).scalar()
+
+
+async def _amount_collected(operation_id: int) -> float:
+    async with SessionLocal() as db:
+        return float((await db.get(sql_models.Operation, operation_id)).amount_collected)
+
+
+def _operation_body(amount_required: float) -> dict:
+    return {"amount_required": amount_required, "interest_rate": 10.0, "deadline": str(date.today() + timedelta(days=30))}
+
+
+# Reintentos simultáneos con la misma clave: una sola oferta y todos reciben la misma respuesta
+async def test_concurrent_bid_retries_write_one_bid(client):
+    _, operator = await create_user("operador")
+    _, investor = await create_user("inversor")
+    operation_id = await create_operation(client, operator, 1000)
+    headers = {**investor, "Idempotency-Key": "bid-retry"}
+    body = {"operation_id": operation_id, "amount": 100, "interest_rate": 5.0}
+
+    responses = await asyncio.gather(*(client.post("/bid", headers=headers, json=body) for _ in range(RETRIES)))
+
+    assert [response.status_code for response in responses] == [201] * RETRIES
+    assert len({response.json()["id"] for response in responses}) == 1
+    assert sum(response.headers.get(REPLAYED_HEADER) == "true" for response in responses) == RETRIES - 1
+    assert await _count(sql_models.Bid, sql_models.Bid.operation_id == operation_id) == 1
+    assert await _amount_collected(operation_id) == 100
+
+
+# Un reintento posterior repite la respuesta original desde la caché y, en otro worker (sin
+# caché), desde la tabla idempotency_keys
+async def test_bid_replay_returns_the_original_response(client):
+    _, operator = await create_user("operador")
+    _, investor = await create_user("inversor")
+    operation_id = await create_operation(client, operator, 1000)
+    headers = {**investor, "Idempotency-Key": "bid-replay"}
+    body = {"operation_id": operation_id, "amount": 100, "interest_rate": 5.0}
+
+    original = await client.post("/bid", headers=headers, json=body)
+    assert original.status_code == 201
+    assert REPLAYED_HEADER not in original.headers
+    cached = await client.post("/bid", headers=headers, json=body)
+    idempotency_store.clear()
+    stored = await client.post("/bid", headers=headers, json=body)
+
+    for replay in (cached, stored):
+        assert replay.status_code == 201
+        assert replay.headers[REPLAYED_HEADER] == "true"
+        assert replay.json() == original.json()
+    assert await _count(sql_models.Bid, sql_models.Bid.operation_id == operation_id) == 1
+    assert await _amount_collected(operation_id) == 100
+
+
+# La misma clave con otro cuerpo es un conflicto y no escribe nada; otro usuario puede usarla
+async def test_bid_key_reused_with_another_body_is_a_conflict(client):
+    _, operator = await create_user("operador")
+    _, investor = await create_user("inversor")
+    _, other_investor = await create_user("inversor")
+    operation_id = await create_operation(client, operator, 1000)
+    body = {"operation_id": operation_id, "amount": 100, "interest_rate": 5.0}
+
+    assert (await client.post("/bid", headers={**investor, "Idempotency-Key": "bid-key"}, json=body)).status_code == 201
+    for cache_cleared in (False, True):
+        if cache_cleared:
+            idempotency_store.clear()
+        response = await client.post("/bid", headers={**investor, "Idempotency-Key": "bid-key"}, json={**body, "amount": 200})
+        assert response.status_code == 409
+        assert response.json()["detail"] == "This Idempotency-Key was already used with a different request."
+    assert await _amount_collected(operation_id) == 100
+
+    response = await client.post("/bid", headers={**other_investor, "Idempotency-Key": "bid-key"}, json=body)
+    assert response.status_code == 201
+    assert REPLAYED_HEADER not in response.headers
+    assert await _count(sql_models.Bid, sql_models.Bid.operation_id == operation_id) == 2
+
+
+async def test_concurrent_operation_retries_create_one_operation(client):
+    operator_id, operator = await create_user("operador")
+    headers = {**operator, "Idempotency-Key": "operation-retry"}
+
+    responses = await asyncio.gather(*(client.post("/operation", headers=headers, json=_operation_body(5000)) for _ in range(RETRIES)))
+
+    assert [response.status_code for response in responses] == [201] * RETRIES
+    assert len({response.json()["id"] for response in responses}) == 1
+    assert await _count(sql_models.Operation, sql_models.Operation.operator_id == operator_id) == 1
+
+
+async def test_operation_replay_and_conflict(client):
+    operator_id, operator = await create_user("operador")
+    headers = {**operator, "Idempotency-Key": "operation-key"}
+
+    original = await client.post("/operation", headers=headers, json=_operation_body(5000))
+    assert original.status_code == 201
+    idempotency_store.clear()
+    replay = await client.post("/operation", headers=headers, json=_operation_body(5000))
+    assert replay.status_code == 201
+    assert replay.headers[REPLAYED_HEADER] == "true"
+    assert replay.json() == original.json()
+
+    conflict = await client.post("/operation", headers=headers, json=_operation_body(6000))
+    assert conflict.status_code == 409
+    assert await _count(sql_models.Operation, sql_models.Operation.operator_id == operator_id) == 1
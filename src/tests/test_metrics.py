@@ -0,0 +1,30 @@
+import pytest
+from prometheus_client import REGISTRY
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from database.database import engine
+
+pytestmark = pytest.mark.anyio
+
+
+def _statements(verb: str, table: str) -> float:
+    return REGISTRY.get_sample_value("db_statement_duration_seconds_count", {"statement": verb, "table": table}) or 0.0
+
+
+# Las sentencias que fallan se miden igual que las demás y no dejan tiempos de inicio
+# acumulados en la conexión, que vuelve al pool y se reutiliza
+async def test_failed_statements_are_timed_and_leave_nothing_behind(client):
+    failed, selected = _statements("SELECT", "missing_table"), _statements("SELECT", "users")
+
+    async with engine.connect() as conn:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                await conn.execute(text("SELECT * FROM missing_table"))
+            await conn.rollback()
+        await conn.execute(text("SELECT COUNT(*) FROM users"))
+        info = dict((await conn.get_raw_connection()).info)
+
+    assert _statements("SELECT", "missing_table") - failed == 3
+    assert _statements("SELECT", "users") - selected == 1
+    assert not any(isinstance(value, list) and value for value in info.values())
@@ -0,0 +1,33 @@
+import pytest
+
+from tests.conftest import create_operation, create_user
+
+pytestmark = pytest.mark.anyio
+
+
+def _metric(text: str, result: str) -> float:
+    for line in text.splitlines():
+        if line.startswith(f'operation_cache_lookups_total{{result="{result}"}}'):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+# El primer listado se carga de la base de datos, los siguientes salen de la caché; una
+# escritura invalida el listado y vuelve a contar un fallo
+async def test_operation_cache_hits_and_misses_are_exported(client):
+    _, operator = await create_user("operador")
+    await create_operation(client, operator, 1000)
+    before = (await client.get("/metrics")).text
+
+    for _ in range(3):
+        assert (await client.get("/operations")).status_code == 200
+    middle = (await client.get("/metrics")).text
+    assert _metric(middle, "miss") - _metric(before, "miss") == 1
+    assert _metric(middle, "hit") - _metric(before, "hit") == 2
+
+    await create_operation(client, operator, 500)
+    response = await client.get("/operations")
+    assert len(response.json()) == 2
+    after = (await client.get("/metrics")).text
+    assert _metric(after, "miss") - _metric(middle, "miss") == 1
+    assert _metric(after, "hit") - _metric(middle, "hit") == 0
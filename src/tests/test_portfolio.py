@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import event, insert
+
+import database.sql_models as sql_models
+from database.database import SessionLocal, engine
+from tests.conftest import create_operation, create_user
+
+pytestmark = pytest.mark.anyio
+
+SIZES = (0, 1, 10, 250)
+
+
+# Sentencias SQL ejecutadas durante una petición
+class QueryCounter:
+    def __init__(self):
+        self.statements = []
+
+    def _on_execute(self, *args) -> None:
+        self.statements.append(args[2])
+
+    def __enter__(self):
+        event.listen(engine.sync_engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(engine.sync_engine, "before_cursor_execute", self._on_execute)
+
+
+async def _investor_with_bids(operation_ids, size: int):
+    investor_id, headers = await create_user("inversor")
+    now = datetime.now(timezone.utc)
+    if size:
+        async with SessionLocal() as db:
+            await db.execute(insert(sql_models.Bid), [{
+                "operation_id": operation_ids[index % len(operation_ids)],
+                "investor_id": investor_id,
+                "amount": Decimal(1 + index % 10),
+                "interest_rate": 5.0,
+                "bid_date": now - timedelta(seconds=index),
+            } for index in range(size)])
+            await db.commit()
+    return investor_id, headers
+
+
+# La cartera se arma con el mismo número de consultas sin importar cuántas ofertas tenga el
+# inversor ni la página pedida (sin una consulta por posición para cargar su operación)
+async def test_portfolio_query_count_is_constant(client):
+    _, operator = await create_user("operador")
+    operation_ids = [await create_operation(client, operator, 1_000_000) for _ in range(20)]
+
+    counts = {}
+    for size in SIZES:
+        investor_id, headers = await _investor_with_bids(operation_ids, size)
+        path = f"/user/{investor_id}/portfolio"
+        # Primera petición fuera de la medición (carga el usuario en la caché de autenticación)
+        assert (await client.get(path, headers=headers)).status_code == 200
+
+        with QueryCounter() as counter:
+            response = await client.get(path, params={"limit": 100}, headers=headers)
+        assert response.status_code == 200
+        body = response.json()
+        assert len(body["positions"]) == min(size, 100)
+        assert body["totals"]["bid_count"] == size
+        assert body["totals"]["committed_amount"] == sum(1 + index % 10 for index in range(size))
+        assert all(position["operation"]["id"] in operation_ids for position in body["positions"])
+        counts[size] = len(counter.statements)
+
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is not None:
+            with QueryCounter() as counter:
+                response = await client.get(path, params={"limit": 100, "cursor": cursor}, headers=headers)
+            assert response.status_code == 200
+            assert len(response.json()["positions"]) == min(size - 100, 100)
+            counts[f"{size} (next page)"] = len(counter.statements)
+
+    # Una consulta para la página (ofertas junto con su operación) y otra para los totales
+    assert set(counts.values()) == {2}, counts